@@ -0,0 +1,78 @@
+import numpy as np
+
+# codificação sem perdas do plano alpha, usada no lugar da DCT com a tabela de luminancia. Mascaras de transparencia reais
+# são quase sempre longas sequencias de 0 e 255, então o plano é percorrido linha a linha como um unico vetor e cada sequencia
+# de pixels iguais é escrita como o valor em 8 bits seguido do tamanho da sequencia em exp-golomb. As sequencias são interrompidas
+# no inicio de cada faixa de linhas para que cada faixa possa ser escrita junto com os seus blocos (ver strips.py)
+# o kernel de decodificação é escrito em python puro compativel com numba, assim como os kernels de huffman
+
+# tamanho maximo de uma sequencia, sequencias maiores são divididas para que cada palavra tenha no maximo 8 + 33 bits
+MAX_ALPHA_RUN = 1 << 16
+
+# gera as palavras (valor, tamanho da sequencia) de todas as sequencias do plano alpha de uma vez, com faixas de stripRows linhas
+# retorna as palavras, seus tamanhos em bits e o indice final (exclusivo) das palavras de cada faixa
+# o tamanho n da sequencia é escrito como L - 1 zeros seguidos dos L bits de n, onde L é a quantidade de bits de n
+def alphaEncodeArrays(alpha: np.ndarray, stripRows: int) -> tuple:
+    flat = np.asarray(alpha).astype(np.uint8).ravel()
+    stripPixels = stripRows * alpha.shape[1]
+    # inicio de cada sequencia de valores iguais e seu tamanho, toda faixa começa uma nova sequencia
+    changes = np.ones(len(flat), dtype=bool)
+    changes[1:] = flat[1:] != flat[:-1]
+    changes[::stripPixels] = True
+    starts = np.flatnonzero(changes)
+    runs = np.diff(np.r_[starts, len(flat)])
+
+    # divide as sequencias maiores que MAX_ALPHA_RUN, todas as partes tem o tamanho maximo exceto a ultima
+    pieces = (runs + MAX_ALPHA_RUN - 1) // MAX_ALPHA_RUN
+    values = np.repeat(flat[starts], pieces).astype(np.uint64)
+    lengths = np.full(len(values), MAX_ALPHA_RUN, dtype=np.int64)
+    lengths[np.cumsum(pieces) - 1] = runs - (pieces - 1) * MAX_ALPHA_RUN
+
+    # os zeros do prefixo não alteram o valor da palavra, basta deslocar o valor do pixel para antes dos 2L - 1 bits do tamanho
+    bits = (2 * np.frexp(lengths)[1] - 1).astype(np.uint64)
+    words = (values << bits) | lengths.astype(np.uint64)
+
+    # quantidade de palavras de cada faixa
+    strips = np.repeat(starts // stripPixels, pieces)
+    stripEnds = np.cumsum(np.bincount(strips, minlength=-(-alpha.shape[0] // stripRows)))
+    return words, bits + np.uint64(8), stripEnds
+
+# decodifica as sequencias a partir da posição pos (em bits) preenchendo todo o array out (plano achatado), retorna a posição final
+def alphaDecodeKernel(data, pos, out):
+    total = len(out)
+    filled = 0
+    while filled < total:
+        # janela de 56 bits a partir do byte atual, suficiente para a maior palavra (41 bits) mais o deslocamento no byte
+        byte = pos >> 3
+        offset = pos & 7
+        window = 0
+        for i in range(7):
+            window = (window << 8) | int(data[byte + i])
+
+        value = (window >> (48 - offset)) & 0xFF
+        # conta os zeros do prefixo exp-golomb
+        zeros = 0
+        while (window >> (47 - offset - zeros)) & 1 == 0:
+            zeros += 1
+            if zeros > 16:
+                raise ValueError('Sequencia do canal alpha invalida')
+        run = (window >> (47 - offset - 2 * zeros)) & ((1 << (zeros + 1)) - 1)
+        if filled + run > total:
+            raise ValueError('Sequencia do canal alpha invalida')
+
+        out[filled:filled + run] = value
+        filled += run
+        pos += 8 + 2 * zeros + 1
+
+    return pos
+
+# decodifica o plano alpha com o shape informado a partir da posição atual do reader usando o kernel informado (por padrão o kernel
+# em python puro), retorna o plano em uint8 e avança o reader ate o fim do codigo lido
+def decodeAlpha(reader, shape: tuple, kernel=None) -> np.ndarray:
+    out = np.empty(shape[0] * shape[1], dtype=np.uint8)
+    if kernel is None:
+        # em python puro bytes são bem mais rapidos de indexar do que arrays de numpy
+        reader.pos = alphaDecodeKernel(reader.raw, reader.pos, out)
+    else:
+        reader.pos = kernel(reader.data, reader.pos, out)
+    return out.reshape(shape)
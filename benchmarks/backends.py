@@ -0,0 +1,88 @@
+import sys
+import os
+import io
+import time
+import threading
+import contextlib
+import numpy as np
+from PIL import Image
+
+# permite executar o script de dentro da pasta benchmarks ou da raiz do repositorio
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import codec_mt
+from codecpool import CodecPool, CodecThreads
+
+# compara os backends de processos (CodecPool) e de threads (CodecThreads) do codec_mt em tempo e memoria, com 1, 2 e 4 processos ou threads
+# a memoria é o pico da soma do PSS (paginas compartilhadas divididas entre os processos que as usam) do processo principal e dos processos
+# do pool, amostrado durante a execução. Lê /proc e portanto só funciona no Linux
+# uso: python benchmarks/backends.py [imagem] [repetições da imagem em cada direção] [faixas por segmento]
+
+# gera uma imagem grande repetindo a imagem de entrada em mosaico
+def tiledImage(path:str, tiles:int) -> Image.Image:
+    arr = np.asarray(Image.open(path).convert('RGB'))
+    return Image.fromarray(np.tile(arr, (tiles, tiles, 1)))
+
+# PSS em bytes de um processo, 0 caso ele ja tenha terminado
+def processPss(pid:int) -> int:
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as file:
+            for line in file:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+# soma do PSS do processo atual e de todos os seus descendentes
+def treePss() -> int:
+    pids, total = [os.getpid()], 0
+    while pids:
+        pid = pids.pop()
+        total += processPss(pid)
+        try:
+            for task in os.listdir(f'/proc/{pid}/task'):
+                with open(f'/proc/{pid}/task/{task}/children') as file:
+                    pids.extend(int(child) for child in file.read().split())
+        except OSError:
+            pass
+    return total
+
+# executa function amostrando a memoria em uma thread, retorna o tempo e o pico de memoria acima da memoria antes da execução
+def measure(function) -> tuple:
+    base, peak, running = treePss(), [0], [True]
+    def sample():
+        while running[0]:
+            peak[0] = max(peak[0], treePss())
+            time.sleep(0.005)
+    sampler = threading.Thread(target=sample)
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        function()
+    finally:
+        elapsed = time.perf_counter() - start
+        running[0] = False
+        sampler.join()
+    return elapsed, max(peak[0] - base, 0)
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else 'imgs/lena.bmp'
+    tiles = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    restartInterval = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    image = tiledImage(path, tiles)
+    planes = codec_mt.subSampling(2, 2, codec_mt.toYCrCb(image))
+    print(f'imagem {image.width}x{image.height}, {restartInterval} faixas por segmento, {os.cpu_count()} nucleos')
+    print('backend  workers  compress (s)  pico (MB)  deCompress (s)  pico (MB)')
+    for backend, create in (('process', CodecPool), ('thread', CodecThreads)):
+        for workers in (1, 2, 4):
+            with create(workers) as pool, contextlib.redirect_stdout(io.StringIO()):
+                # a primeira execução aquece o pool (criação dos processos e compilação dos kernels), apenas a segunda é medida
+                code = codec_mt.compress(*planes, codec_mt.QTY, codec_mt.QTC, 2, 2, restartInterval=restartInterval, pool=pool)
+                codec_mt.deCompress(code, pool=pool)
+                encodeTime, encodeMemory = measure(lambda: codec_mt.compress(*planes, codec_mt.QTY, codec_mt.QTC, 2, 2, restartInterval=restartInterval, pool=pool))
+                decodeTime, decodeMemory = measure(lambda: codec_mt.deCompress(code, pool=pool))
+            print(f'{backend:>7}  {workers:>7}  {encodeTime:>12.3f}  {encodeMemory / 2**20:>9.1f}  {decodeTime:>14.3f}  {decodeMemory / 2**20:>9.1f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import sys
+import os
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+from PIL import Image
+
+# permite executar o script de dentro da pasta benchmarks ou da raiz do repositorio
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import codec
+import codec_mt
+from transform import TRANSFORMS, forwardDCT, inverseDCT
+from suite import syntheticImage, psnr
+
+# compara a transformada em ponto flutuante (padrão) com a transformada inteira (transform='integer'): para cada tamanho de imagem mostra
+# a vazão da DCT com quantização e da inversa com desquantização isoladas em um plano de luminancia, o tempo de encode e decode completos,
+# o PSNR, o tamanho do arquivo e a memoria ocupada pelos coeficientes quantizados
+# uso: python benchmarks/integer.py [--sizes 1920x1080,3840x2160] [--repeats 5] [--codecs codec,codec_mt] [--output inteira.json]
+
+# tamanhos medidos por padrão (largura, altura)
+SIZES = [(1920, 1080), (3840, 2160)]
+
+# menor tempo de repeats execuções da função, retorna (resultado, segundos)
+def best(function, repeats:int) -> tuple:
+    result, seconds = None, float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        seconds = min(seconds, time.perf_counter() - start)
+    return result, seconds
+
+# mede as transformadas isoladas em um plano de luminancia com level shift, ja no tamanho dos blocos
+def transforms(image:np.ndarray, integer:bool, repeats:int) -> dict:
+    h, w = image.shape[0] // 8 * 8, image.shape[1] // 8 * 8
+    plane = image[:h, :w, 0].astype(np.float32) - 128
+    blocks, forward = best(lambda: forwardDCT(plane, codec.QTY, integer), repeats)
+    _, inverse = best(lambda: inverseDCT(blocks, codec.QTY, (h, w), integer), repeats)
+    megapixels = h * w / 1e6
+    return {'forward_mpixels_per_second': megapixels / forward, 'inverse_mpixels_per_second': megapixels / inverse, 'coefficient_bytes': blocks.nbytes}
+
+# encode e decode completos da imagem com a transformada escolhida
+def roundtrip(module, image:np.ndarray, transform:str, repeats:int, directory:str) -> dict:
+    target = os.path.join(directory, 'integer')
+    options = {'backend': 'thread'} if module is codec_mt else {}
+    _, encode = best(lambda: module.encode(Image.fromarray(image), outputname=target, transform=transform, **options), repeats)
+    decoded, decode = best(lambda: module.decode(target + '.gpeg', **options), repeats)
+    return {'encode_seconds': encode, 'decode_seconds': decode, 'psnr': psnr(image, decoded), 'bytes': os.path.getsize(target + '.gpeg')}
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara a transformada em ponto flutuante com a transformada inteira')
+    parser.add_argument('--sizes', default=None, help='tamanhos LARGURAxALTURA separados por virgula')
+    parser.add_argument('--repeats', type=int, default=5, help='repetições de cada operação (vale a mais rapida)')
+    parser.add_argument('--codecs', default='codec,codec_mt', help='codecs medidos, separados por virgula')
+    parser.add_argument('--output', default=None, help='arquivo JSON com os resultados')
+    args = parser.parse_args()
+
+    sizes = [tuple(int(n) for n in size.split('x')) for size in args.sizes.split(',')] if args.sizes else SIZES
+    modules = [{'codec': codec, 'codec_mt': codec_mt}[name] for name in args.codecs.split(',')]
+    if codec_mt in modules:
+        codec_mt.warmup(backend='thread')
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for width, height in sizes:
+            image = syntheticImage(width, height)
+            print(f'{width}x{height}')
+            for transform in TRANSFORMS:
+                entry = {'shape': [height, width], 'transform': transform}
+                entry.update(transforms(image, transform == 'integer', args.repeats))
+                print(f'  {transform:<8} dct {entry["forward_mpixels_per_second"]:>7.1f} MP/s  idct {entry["inverse_mpixels_per_second"]:>7.1f} MP/s'
+                      f'  coeficientes {entry["coefficient_bytes"] / 2**20:>6.2f} MB')
+                for module in modules:
+                    data = roundtrip(module, image, transform, args.repeats, directory)
+                    entry[module.__name__] = data
+                    print(f'    {module.__name__:<9} encode {data["encode_seconds"]:>7.3f}s  decode {data["decode_seconds"]:>7.3f}s'
+                          f'  PSNR {data["psnr"]:>6.2f} dB  {data["bytes"]} bytes')
+                results.append(entry)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'results': results}, file, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import sys
+import os
+import json
+import argparse
+import numpy as np
+from PIL import Image
+
+# permite executar o script de dentro da pasta benchmarks ou da raiz do repositorio
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import codec
+import codec_mt
+from stats import Stats
+from suite import syntheticImage
+
+# perfil de memoria do encode e do decode: para cada tamanho de imagem mostra o pico de memoria alocada (tracemalloc, que inclui os buffers
+# do numpy) acima da imagem de entrada, o pico por megapixel, o pico e a memoria liquida de cada etapa e o tamanho dos principais buffers
+# registrados pelos codecs. O codec_mt é medido com o backend de threads, ja que os processos do pool não são vistos pelo tracemalloc
+# termina com erro quando o pico por megapixel de alguma operação passa do orçamento, servindo para dimensionar e vigiar a memoria
+# uso: python benchmarks/memory.py [--sizes 1920x1080,3840x2160] [--budget 60] [--codecs codec,codec_mt] [--output memoria.json]
+
+# tamanhos medidos por padrão (largura, altura)
+SIZES = [(1024, 1024), (1920, 1080), (3840, 2160)]
+# orçamento de pico de memoria em MB por megapixel, valido para encode e decode das imagens RGB
+BUDGET = 60
+
+# executa a operação com um Stats no modo de perfil de memoria, retornando o Stats
+def profile(function) -> Stats:
+    stats = Stats(memory=True)
+    try:
+        function(stats)
+    finally:
+        stats.stop()
+    return stats
+
+def printProfile(label:str, stats:Stats, megapixels:float):
+    memory = stats.asDict()['memory']
+    print(f'  {label:<6} pico {memory["peak"] / 2**20:>8.1f} MB  {memory["peak"] / 2**20 / megapixels:>6.1f} MB/MP')
+    for name, usage in sorted(memory['stages'].items(), key=lambda item: -item[1]['peak']):
+        print(f'    {name:<26} pico {usage["peak"] / 2**20:>8.1f} MB  liquido {usage["net"] / 2**20:>8.1f} MB')
+
+def main():
+    parser = argparse.ArgumentParser(description='Perfil de memoria do encode e do decode')
+    parser.add_argument('--sizes', default=None, help='tamanhos LARGURAxALTURA separados por virgula')
+    parser.add_argument('--budget', type=float, default=BUDGET, help='pico maximo em MB por megapixel')
+    parser.add_argument('--codecs', default='codec,codec_mt', help='codecs medidos, separados por virgula')
+    parser.add_argument('--output', default=None, help='arquivo JSON com os resultados')
+    args = parser.parse_args()
+
+    sizes = [tuple(int(n) for n in size.split('x')) for size in args.sizes.split(',')] if args.sizes else SIZES
+    target = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'memory')
+    results, failures = [], []
+    for width, height in sizes:
+        image = Image.fromarray(syntheticImage(width, height))
+        megapixels = width * height / 1e6
+        for name in args.codecs.split(','):
+            if name == 'codec':
+                encode = lambda stats: codec.encode(image, outputname=target, stats=stats)
+                decode = lambda stats: codec.decode(target + '.gpeg', stats=stats)
+            else:
+                encode = lambda stats: codec_mt.encode(image, outputname=target, backend='thread', stats=stats)
+                decode = lambda stats: codec_mt.decode(target + '.gpeg', backend='thread', stats=stats)
+            print(f'{width}x{height} {name}')
+            entry = {'shape': [height, width], 'codec': name}
+            for operation, function in (('encode', encode), ('decode', decode)):
+                stats = profile(function)
+                printProfile(operation, stats, megapixels)
+                entry[operation] = stats.asDict()
+                perMegapixel = stats.peak / 2**20 / megapixels
+                if perMegapixel > args.budget:
+                    failures.append(f'{width}x{height} {name} {operation}: {perMegapixel:.1f} MB/MP acima do orçamento de {args.budget:.1f} MB/MP')
+            results.append(entry)
+    os.remove(target + '.gpeg')
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'budget': args.budget, 'results': results}, file, indent=2)
+    print('\n'.join(failures) if failures else f'todas as operações dentro do orçamento de {args.budget:.1f} MB/MP')
+    if failures:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import sys
+import os
+import io
+import time
+import contextlib
+import numpy as np
+from PIL import Image
+
+# permite executar o script de dentro da pasta benchmarks ou da raiz do repositorio
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+import codec_mt
+
+# mede o ganho da decodificação paralela dos segmentos (restart intervals) do codec_mt com 1, 2, 4 e 8 processos
+# uso: python benchmarks/restart_speedup.py [imagem] [repetições da imagem em cada direção] [faixas por segmento]
+
+# quantidades de processos medidas
+WORKERS = (1, 2, 4, 8)
+
+# gera uma imagem grande repetindo a imagem de entrada em mosaico
+def tiledImage(path:str, tiles:int) -> Image.Image:
+    arr = np.asarray(Image.open(path).convert('RGB'))
+    return Image.fromarray(np.tile(arr, (tiles, tiles, 1)))
+
+# executa deCompress com a quantidade de processos informada, retornando o tempo total e o tempo da decodificação de huffman
+def timeDecode(code:bytes, workers:int) -> tuple:
+    entropy = []
+    decodeEntropy = codec_mt.decodeEntropy
+
+    # envolve a etapa de decodificação de huffman para medir apenas ela
+    def timedEntropy(*args):
+        start = time.perf_counter()
+        result = decodeEntropy(*args)
+        entropy.append(time.perf_counter() - start)
+        return result
+
+    codec_mt.decodeEntropy = timedEntropy
+    try:
+        start = time.perf_counter()
+        codec_mt.deCompress(code, workers)
+        total = time.perf_counter() - start
+    finally:
+        codec_mt.decodeEntropy = decodeEntropy
+    return total, entropy[0]
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, 'imgs/lena.bmp')
+    tiles = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    restartInterval = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    image = tiledImage(path, tiles)
+    with contextlib.redirect_stdout(io.StringIO()):
+        code = codec_mt.compress(*codec_mt.subSampling(2, 2, codec_mt.toYCrCb(image)), codec_mt.QTY, codec_mt.QTC, 2, 2, restartInterval=restartInterval)
+    cpus = os.cpu_count()
+    print(f'imagem {image.width}x{image.height}, {len(code)} bytes, {restartInterval} faixas por segmento, {cpus} nucleos')
+    # com mais processos que nucleos eles disputam os mesmos nucleos e o tempo passa a medir o custo do pool, não o ganho da decodificação paralela
+    if max(WORKERS) > cpus:
+        print(f'aviso: a maquina tem apenas {cpus} nucleos, as linhas marcadas com * usam mais processos que nucleos e não indicam o ganho real')
+
+    # a primeira execução em sequencia compila os kernels no processo principal, herdados pelos processos do pool
+    timeDecode(code, 1)
+    baseline = None
+    print('processos  total (s)  huffman (s)  speedup huffman')
+    for workers in WORKERS:
+        total, entropy = min(timeDecode(code, workers) for _ in range(3))
+        baseline = baseline or entropy
+        print(f'{workers:>9}  {total:>9.3f}  {entropy:>11.3f}  {baseline / entropy:>15.2f}{" *" if workers > cpus else ""}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+import sys
+import os
+import json
+import time
+import argparse
+import platform
+import tempfile
+import numpy as np
+from PIL import Image
+
+# permite executar o script de dentro da pasta benchmarks ou da raiz do repositorio
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+import codec
+import codec_mt
+from stats import Stats
+
+# suite de benchmarks do codec.py e do codec_mt.py: codifica e decodifica as imagens de imgs/ e imagens sinteticas ate 8K, medindo o tempo
+# de cada etapa, os megapixels por segundo, o tamanho do arquivo e o PSNR. Os resultados são gravados em JSON e comparados com um
+# baseline gravado anteriormente, indicando as regressões de tempo, tamanho e qualidade
+# uso: python benchmarks/suite.py [--output resultados.json] [--baseline baseline.json] [--save-baseline] [--quick]
+
+# imagens do repositorio usadas pela suite
+IMAGES = ['imgs/lena.bmp', 'imgs/bora-bill.bmp', 'imgs/Arara-Azul-png.bmp']
+# imagens sinteticas e seus tamanhos (largura, altura)
+SYNTHETIC = {'sintetica-fullhd': (1920, 1080), 'sintetica-4k': (3840, 2160), 'sintetica-8k': (7680, 4320)}
+# baseline usado por padrão na comparação
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+# variação relativa a partir da qual o tempo de uma operação é considerado uma regressão
+TOLERANCE = 0.15
+# diferença minima de tempo (s) para indicar uma regressão, evita alarmes pelo ruido das imagens pequenas
+MIN_DIFFERENCE = 0.005
+
+# imagem sintetica com gradientes, bordas e ruido, com uma quantidade de simbolos parecida com a de fotos
+def syntheticImage(width:int, height:int) -> np.ndarray:
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    image = np.stack([127 + 100 * np.sin(xx / 37) * np.cos(yy / 23), (xx + yy) * 255 / (width + height), 255 * ((xx // 64 + yy // 64) % 2)], axis=-1)
+    return np.clip(image + np.random.default_rng(width).normal(0, 6, image.shape), 0, 255).astype(np.uint8)
+
+# executa uma operação medindo o tempo total e o de cada etapa registrado pelo codec no stats.Stats passado para function, retorna
+# (resultado, total, etapas). Os dois codecs registram as mesmas etapas (ver stats.Stats), o tempo fora delas fica em 'outros'
+def measure(function) -> tuple:
+    stats = Stats()
+    start = time.perf_counter()
+    result = function(stats)
+    total = time.perf_counter() - start
+    times = dict(stats.stages)
+    times['outros'] = max(total - sum(times.values()), 0.0)
+    return result, total, times
+
+def psnr(original:np.ndarray, decoded:np.ndarray) -> float:
+    mse = np.mean((original.astype(np.float64) - decoded[..., :original.shape[2]].astype(np.float64)) ** 2)
+    return float('inf') if mse == 0 else float(10 * np.log10(255 ** 2 / mse))
+
+# codifica e decodifica uma imagem com um codec, repeats vezes, guardando a execução mais rapida de cada operação
+def benchmark(module, name:str, image:np.ndarray, repeats:int, directory:str) -> dict:
+    target = os.path.join(directory, 'suite')
+    pixels = image.shape[0] * image.shape[1]
+    result = {'image': name, 'codec': module.__name__, 'shape': list(image.shape)}
+    for operation in ('encode', 'decode'):
+        best = None
+        for _ in range(repeats):
+            if operation == 'encode':
+                run = lambda stats: module.encode(Image.fromarray(image), outputname=target, stats=stats)
+            else:
+                run = lambda stats: module.decode(target + '.gpeg', stats=stats)
+            output, total, stages = measure(run)
+            if best is None or total < best[1]:
+                best = (output, total, stages)
+        output, total, stages = best
+        result[operation] = {'seconds': total, 'mpixels_per_second': pixels / total / 1e6, 'stages': stages}
+        if operation == 'decode':
+            result['psnr'] = psnr(image, output)
+    result['bytes'] = os.path.getsize(target + '.gpeg')
+    return result
+
+# compara os resultados com o baseline, retornando uma mensagem para cada regressão: tempo maior que a tolerancia, arquivo maior ou PSNR menor
+def compare(results:list, baseline:list, tolerance:float) -> list:
+    reference = {(entry['image'], entry['codec']): entry for entry in baseline}
+    regressions = []
+    for entry in results:
+        old = reference.get((entry['image'], entry['codec']))
+        if old is None:
+            continue
+        label = f'{entry["image"]} ({entry["codec"]})'
+        for operation in ('encode', 'decode'):
+            ratio = entry[operation]['seconds'] / old[operation]['seconds']
+            if ratio > 1 + tolerance and entry[operation]['seconds'] - old[operation]['seconds'] > MIN_DIFFERENCE:
+                regressions.append(f'{label}: {operation} {ratio:.2f}x mais lento ({old[operation]["seconds"]:.3f}s -> {entry[operation]["seconds"]:.3f}s)')
+        if entry['bytes'] > old['bytes']:
+            regressions.append(f'{label}: arquivo maior ({old["bytes"]} -> {entry["bytes"]} bytes)')
+        if entry['psnr'] < old['psnr'] - 0.01:
+            regressions.append(f'{label}: PSNR menor ({old["psnr"]:.2f} -> {entry["psnr"]:.2f} dB)')
+    return regressions
+
+def printResult(entry:dict):
+    print(f'{entry["image"]} {entry["shape"][1]}x{entry["shape"][0]} {entry["codec"]}: {entry["bytes"]} bytes, PSNR {entry["psnr"]:.2f} dB')
+    for operation in ('encode', 'decode'):
+        data = entry[operation]
+        stages = ', '.join(f'{stage} {seconds:.3f}' for stage, seconds in sorted(data['stages'].items(), key=lambda item: -item[1]))
+        print(f'  {operation:<6} {data["seconds"]:>8.3f}s {data["mpixels_per_second"]:>7.2f} MP/s  [{stages}]')
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks por etapa do codec e do codec_mt')
+    parser.add_argument('--output', default=None, help='arquivo JSON com os resultados')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='resultados anteriores usados na comparação')
+    parser.add_argument('--save-baseline', action='store_true', help='grava os resultados como o novo baseline')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='variação relativa de tempo tolerada')
+    parser.add_argument('--repeats', type=int, default=3, help='repetições de cada operação (vale a mais rapida)')
+    parser.add_argument('--quick', action='store_true', help='apenas as imagens do repositorio e a sintetica Full HD')
+    parser.add_argument('--codecs', default='codec,codec_mt', help='codecs medidos, separados por virgula')
+    args = parser.parse_args()
+
+    images = [(path, np.asarray(Image.open(os.path.join(ROOT, path)).convert('RGB'))) for path in IMAGES]
+    for name, (width, height) in list(SYNTHETIC.items())[:1 if args.quick else None]:
+        images.append((name, syntheticImage(width, height)))
+    modules = [{'codec': codec, 'codec_mt': codec_mt}[name] for name in args.codecs.split(',')]
+
+    # o pool e os kernels do codec_mt são preparados antes, as medições são do regime permanente
+    if codec_mt in modules:
+        codec_mt.warmup()
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for name, image in images:
+            for module in modules:
+                # imagens grandes são medidas uma unica vez
+                repeats = args.repeats if image.shape[0] * image.shape[1] <= 4e6 else 1
+                entry = benchmark(module, name, image, repeats, directory)
+                printResult(entry)
+                results.append(entry)
+
+    report = {'machine': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()}, 'results': results}
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file)['results'], args.tolerance)
+        print('\n'.join(['regressões em relação ao baseline:'] + regressions) if regressions else 'nenhuma regressão em relação ao baseline')
+        if regressions:
+            sys.exit(1)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f'baseline gravado em {args.baseline}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import sys
+import os
+import json
+import tempfile
+import subprocess
+
+# mede a latencia da primeira imagem de um processo novo do codec_mt em relação ao regime permanente, em tres situações:
+# sem cache do numba (compilação na importação), com o cache em disco ja preenchido e com o cache mais codec_mt.warmup() antes da imagem
+# cada situação roda em um interpretador novo, com NUMBA_CACHE_DIR apontando para um diretorio temporario para que a primeira seja fria
+# o cache em disco so elimina a compilação dos kernels, a primeira imagem ainda cria o pool e carrega os kernels nos processos e continua
+# bem mais lenta que as seguintes. Apenas com codec_mt.warmup() ela fica proxima do regime permanente
+# uso: python benchmarks/warmup.py [imagem] [repetições]
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# script executado em cada interpretador novo, imprime em JSON o tempo de importação, do warmup e de cada codificação + decodificação
+SCRIPT = '''
+import sys, io, json, time, contextlib
+start = time.perf_counter()
+import codec_mt
+import numpy as np
+from PIL import Image
+times = {'import': time.perf_counter() - start, 'warmup': 0.0, 'images': []}
+if sys.argv[3] == '1':
+    start = time.perf_counter()
+    codec_mt.warmup()
+    times['warmup'] = time.perf_counter() - start
+# a imagem é carregada antes das medições, o PIL só lê o arquivo no primeiro acesso aos pixels
+image = np.asarray(Image.open(sys.argv[1]).convert('RGB'))
+for _ in range(int(sys.argv[2])):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        code = codec_mt.compress(*codec_mt.subSampling(2, 2, codec_mt.toYCrCb(image)), codec_mt.QTY, codec_mt.QTC, 2, 2)
+        codec_mt.deCompress(code)
+    times['images'].append(time.perf_counter() - start)
+print(json.dumps(times))
+'''
+
+# executa o script em um interpretador novo e retorna os tempos medidos
+def run(path:str, repeats:int, warmup:bool, cacheDir:str) -> dict:
+    env = dict(os.environ, NUMBA_CACHE_DIR=cacheDir, PYTHONPATH=ROOT)
+    output = subprocess.run([sys.executable, '-c', SCRIPT, path, str(repeats), '1' if warmup else '0'], env=env, cwd=ROOT,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    path = os.path.abspath(sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, 'imgs', 'lena.bmp'))
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    with tempfile.TemporaryDirectory() as cacheDir:
+        scenarios = [('sem cache', False), ('so cache em disco', False), ('cache + warmup()', True)]
+        print('situação           importação (s)  warmup (s)  1a imagem (s)  regime (s)  1a / regime')
+        for name, warmup in scenarios:
+            times = run(path, repeats, warmup, cacheDir)
+            first, steady = times['images'][0], min(times['images'][1:])
+            print(f'{name:<17}  {times["import"]:>14.3f}  {times["warmup"]:>10.3f}  {first:>13.3f}  {steady:>10.3f}  {first / steady:>11.2f}')
+        print('o cache em disco sozinho não deixa a primeira imagem proxima do regime permanente, apenas codec_mt.warmup() faz isso')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+import numpy as np
+
+# classes responsaveis por escrever e ler o codigo comprimido bit a bit diretamente em bytes,
+# evitando representar o codigo como uma string de caracteres '0' e '1'
+
+# quantidade de bytes de folga lidos alem da posição atual pelos kernels de decodificação, os arquivos são gravados com esta folga
+# no final para que possam ser lidos direto do disco (mmap) sem copia
+READ_PADDING = 8
+
+# tamanho a partir do qual o buffer de um BitWriter associado a um arquivo é descarregado nele
+SPILL_SIZE = 1 << 20
+
+# escreve bits em um buffer de bytes, os bits são gravados do mais significativo para o menos significativo (big endian)
+# quando um arquivo é informado os bytes completos são descarregados nele aos poucos, mantendo a memoria usada limitada
+class BitWriter:
+    def __init__(self, file=None):
+        # bytes ja completos do codigo
+        self.buffer = bytearray()
+        # acumulador com os bits que ainda não completaram um byte
+        self.acc = 0
+        # quantidade de bits guardados no acumulador
+        self.accBits = 0
+        # arquivo de destino e quantidade de bytes ja escritos nele
+        self.file = file
+        self.written = 0
+
+    # quantidade total de bits escritos
+    def __len__(self) -> int:
+        return (self.written + len(self.buffer)) * 8 + self.accBits
+
+    # escreve os nbits menos significativos de value
+    def write(self, value:int, nbits:int):
+        if nbits == 0:
+            return
+        self.acc = (self.acc << nbits) | (value & ((1 << nbits) - 1))
+        self.accBits += nbits
+        # descarrega os bytes completos do acumulador para o buffer
+        if self.accBits >= 32:
+            self._flush()
+
+    # move todos os bytes completos do acumulador para o buffer
+    def _flush(self):
+        full = self.accBits >> 3
+        if full == 0:
+            return
+        rest = self.accBits & 7
+        self.buffer += (self.acc >> rest).to_bytes(full, byteorder='big')
+        self.acc &= (1 << rest) - 1
+        self.accBits = rest
+        self._spill()
+
+    # descarrega o buffer no arquivo quando ele passa de SPILL_SIZE
+    def _spill(self):
+        if self.file is not None and len(self.buffer) >= SPILL_SIZE:
+            self.file.write(self.buffer)
+            self.written += len(self.buffer)
+            self.buffer = bytearray()
+
+    # escreve os primeiros nbits de um buffer de bytes (vindo por exemplo de outro BitWriter) na posição atual
+    def writeBytes(self, data:bytes, nbits:int):
+        self._flush()
+        full = nbits >> 3
+        if full > 0:
+            if self.accBits == 0:
+                # caso alinhado os bytes são copiados diretamente
+                self.buffer += data[:full]
+            else:
+                # caso desalinhado todos os bytes são deslocados de uma vez com numpy
+                r = self.accBits
+                arr = np.frombuffer(data, dtype=np.uint8, count=full).astype(np.uint16)
+                shifted = (arr >> r)
+                shifted[0] |= self.acc << (8 - r)
+                shifted[1:] |= (arr[:-1] << (8 - r)) & 0xFF
+                self.buffer += shifted.astype(np.uint8).tobytes()
+                self.acc = int(arr[-1]) & ((1 << r) - 1)
+            self._spill()
+        # escreve os bits restantes que não completam um byte
+        rest = nbits & 7
+        if rest:
+            self.write(data[full] >> (8 - rest), rest)
+
+    # completa o byte atual com bits iguais a fill
+    def alignToByte(self, fill:int = 0):
+        pad = (8 - self.accBits % 8) % 8
+        if pad:
+            self.write((1 << pad) - 1 if fill else 0, pad)
+
+    # retorna os bytes escritos, o ultimo byte incompleto é completado com zeros a direita
+    def getBytes(self) -> bytes:
+        self._flush()
+        if self.accBits:
+            return bytes(self.buffer) + bytes([(self.acc << (8 - self.accBits)) & 0xFF])
+        return bytes(self.buffer)
+
+    # escreve no arquivo tudo o que ainda esta no buffer, completando o ultimo byte com zeros, e retorna o total de bytes escritos
+    def finish(self) -> int:
+        data = self.getBytes()
+        self.file.write(data)
+        self.written += len(data)
+        self.buffer = bytearray()
+        self.acc, self.accBits = 0, 0
+        return self.written
+
+# empacota em bytes uma sequencia de palavras de ate 57 bits, cada uma com seu tamanho, na mesma ordem de bits do BitWriter
+# retorna os bytes e a quantidade de bits escritos, usado pelos codificadores vetorizados junto com BitWriter.writeBytes
+def packBits(words: np.ndarray, lengths: np.ndarray) -> tuple:
+    if len(words) == 0:
+        return b'', 0
+    # posição em bits do fim de cada palavra com uma soma acumulada, o inicio é o fim menos o tamanho
+    ends = np.cumsum(lengths, dtype=np.uint64)
+    starts = ends - lengths
+    nbits = int(ends[-1])
+    # alinha cada palavra nos bits mais significativos de um uint64, ja deslocada pela posição dentro do seu primeiro byte,
+    # assim cada palavra ocupa no maximo (tamanho + 7 + 7) // 8 bytes a partir do byte starts >> 3
+    aligned = words << (np.uint64(64) - lengths - (starts & np.uint64(7)))
+    first = (starts >> np.uint64(3)).astype(np.int64)
+    # as palavras que começam no mesmo byte são combinadas com um OR por grupo, como os bits de palavras diferentes nunca
+    # se sobrepõem o OR de cada grupo pode ser aplicado diretamente no buffer de saida
+    heads = np.flatnonzero(np.r_[True, first[1:] != first[:-1]])
+    positions = first[heads]
+    out = np.zeros(((nbits + 7) >> 3) + 7, dtype=np.uint8)
+    for lane in range(min(8, (int(lengths.max()) + 14) >> 3)):
+        laneBytes = (aligned >> np.uint64(56 - 8 * lane)).astype(np.uint8)
+        out[positions + lane] |= np.bitwise_or.reduceat(laneBytes, heads)
+    return out[:(nbits + 7) >> 3].tobytes(), nbits
+
+# operação inversa de packBits para campos de tamanho fixo: le width bits (ate 57) a partir de cada posição em bits informada
+# data é o array de bytes de um BitReader, que ja tem os bytes de folga necessarios para ler 8 bytes a partir de cada posição
+def unpackBits(data: np.ndarray, positions: np.ndarray, width: int) -> np.ndarray:
+    positions = np.asarray(positions, dtype=np.int64)
+    first = positions >> 3
+    window = np.zeros(len(positions), dtype=np.uint64)
+    for lane in range(8):
+        window = (window << np.uint64(8)) | data[first + lane].astype(np.uint64)
+    return (window << (positions & 7).astype(np.uint64)) >> np.uint64(64 - width)
+
+# le bits de um buffer de bytes na mesma ordem em que foram escritos pelo BitWriter
+# padded indica que o buffer (por exemplo um mmap do arquivo) ja termina com READ_PADDING bytes de folga, evitando a copia
+class BitReader:
+    def __init__(self, data:bytes, pos:int = 0, padded:bool = False):
+        # adiciona bytes de folga no final para que leituras proximas ao fim não precisem checar limites
+        self.raw = data if padded else bytes(data) + bytes(READ_PADDING)
+        # visão do buffer como array de numpy, usada pelos kernels de decodificação
+        self.data = np.frombuffer(self.raw, dtype=np.uint8)
+        # quantidade de bits validos no buffer
+        self.length = (len(self.raw) - READ_PADDING) * 8
+        # posição atual de leitura em bits
+        self.pos = pos
+
+    # retorna os proximos nbits sem avançar a posição de leitura
+    def peek(self, nbits:int) -> int:
+        if nbits == 0:
+            return 0
+        start = self.pos >> 3
+        offset = self.pos & 7
+        nbytes = (offset + nbits + 7) >> 3
+        chunk = int.from_bytes(self.raw[start:start + nbytes], byteorder='big')
+        return (chunk >> (nbytes * 8 - offset - nbits)) & ((1 << nbits) - 1)
+
+    # le os proximos nbits como um inteiro sem sinal
+    def read(self, nbits:int) -> int:
+        value = self.peek(nbits)
+        self.pos += nbits
+        return value
+
+    # avança a posição de leitura ate o inicio do proximo byte
+    def alignToByte(self):
+        self.pos = (self.pos + 7) & ~7
@@ -1,8 +1,32 @@
+import mmap
 import numpy as np
 from PIL import Image
-import cv2
-import heapq
-from collections import Counter
+from bitstream import READ_PADDING, BitWriter, BitReader
+from transform import TRANSFORMS, forwardDCT, inverseDCT, zigzagVector, zigzagReconstruct, scaledBlockSize, zigzagPrefix, inverseDCTScaled, downscalePlane
+from strips import stripHeight, stripOrder, stripSymbols, codeBits, encodeStrips, decodeStrips, regionLayout, regionEntries, encodeRegionIndex, decodeRegionIndex
+from alphacoder import decodeAlpha
+from huffman import MAX_VALUE, SYMBOL_COUNT, generateGlobalHuffmanTable, huffmanCodesFromCounts, symbolCounts, encodeHuffmanTable, decodeHuffmanTable, buildDecodeTables, huffmanDecodeArrays, rleEncodeArrays, rleDecodeArrays
+from stats import Stats
+from color import encodePlanes, chromaAxes, decodePixels
+from resample import replicateAxis, interpolate
+
+# flags do cabeçalho indicando quais planos opcionais estão presentes no arquivo
+ALPHA_PLANE = 1
+# indica que o alpha foi codificado sem perdas pelo alphacoder em vez de passar pela DCT
+ALPHA_LOSSLESS = 2
+# indica que o codigo das faixas foi dividido em segmentos alinhados em bytes com as posições gravadas no cabeçalho (ver encodeStrips)
+RESTART_INTERVALS = 4
+# indica que o codigo termina com o indice de regiões (ver encodeRegionIndex), usado por decodeRegion
+REGION_INDEX = 8
+# indica que as chrominancias foram reduzidas pela media de cada celula (downsampling = 'box'), com as amostras no centro das celulas
+# em vez da primeira posição, usado pela ampliação bilinear do decode
+CENTERED_CHROMA = 16
+# indica que os blocos foram transformados pela DCT inteira (transform = 'integer', ver transform.forwardDCTInteger), a decodificação
+# usa a inversa inteira e os coeficientes ficam em int16
+INTEGER_TRANSFORM = 32
+
+# modos de codificação do alpha: 'lossless' (sem perdas pelo alphacoder, padrão) ou 'dct' (com perdas, junto com a luminancia)
+ALPHA_MODES = ('lossless', 'dct')
 
 QTY = np.array([[16, 11, 10, 16, 24, 40, 51, 61],  # Tabela de qunatização da luminancia
                 [12, 12, 14, 19, 26, 58, 60, 55],
@@ -22,16 +46,12 @@ QTC = np.array([[17, 18, 24, 47, 99, 99, 99, 99],  # Tabela de quantização das
                 [99, 99, 99, 99, 99, 99, 99, 99],
                 [99, 99, 99, 99, 99, 99, 99, 99]])
 
-# classes e funções relacionadas com a codificação de huffman
-class Node:
-    def __init__(self, symbol=None, frequency=None):
-        self.symbol = symbol
-        self.frequency = frequency
-        self.left = None
-        self.right = None
-    
-    def __lt__(self, other):
-        return self.frequency < other.frequency
+# confere as opções de codificação comuns a compress, encode e encodeStream dos dois codecs
+def validateOptions(alphaMode:str, transform:str):
+    if alphaMode not in ALPHA_MODES:
+        raise ValueError(f'Modo de codificação do alpha desconhecido: {alphaMode}')
+    if transform not in TRANSFORMS:
+        raise ValueError(f'Transformada desconhecida: {transform}')
 
 # função que converte uma imagem para o espaço de cor YCrCb retornando sempre a imgagem obtida em um array de numpy
 def toYCrCb(image) -> np.ndarray:
@@ -103,706 +123,372 @@ def subSampling(a:int, b:int, image):
         alphaSub = alpha
         
     else:
-        # em caso da imagem não possuir canal alpha cria um canal alpha de mesmo tamanho dos canais crSub,cbSub preenchido com 255 para não modificar a imagem
-        alphaSub = np.full(shape=y.shape, fill_value=255, dtype=np.float32)
+        # em caso da imagem não possuir canal alpha nenhum plano é criado, assim ele não é codificado e a imagem decodificada volta em RGB
+        alphaSub = None
 
     return y, crSub, cbSub, alphaSub
 
-# função responsavel por ser o operação inversa a operação de sub sampling
+# função responsavel por ser o operação inversa a operação de sub sampling, repetindo cada amostra das chrominancias a x b vezes com os
+# eixos de ampliação por repetição de resample (o decode faz o mesmo junto com a conversão para RGB em color.decodePixels)
 def upSampling(y:np.ndarray, crSub:np.ndarray, cbSub:np.ndarray, alphaSub:np.ndarray, a:int, b:int) -> np.ndarray: 
     
-    result = np.zeros((y.shape[0],y.shape[1],4), dtype=np.float32)
+    # a imagem so tem o quarto canal caso o alpha tenha sido codificado
+    result = np.empty((y.shape[0],y.shape[1],3 if alphaSub is None else 4), dtype=np.float32)
     
     result[:,:,0] = y
-    
-    for i in range(0, crSub.shape[0]): 
-        for j in range(0, crSub.shape[1]):
-            result[i*a,j*b,1] = crSub[i,j]
-            result[i*a,j*b,2] = cbSub[i,j]
-            if(j*b)+1 < result.shape[1]:
-                for k in range(b):
-                    if (j * b) + k < result.shape[1]:  # Limite de colunas
-                        result[i*a,(j*b)+k,1] = crSub[i,j]
-                        result[i*a,(j*b)+k,2] = cbSub[i,j]
-        if (i*a)+1 < result.shape[0]:
-            for l in range(a):
-                if (i * a) + l < result.shape[0]:  # Limite de linhas
-                    result[(i*a)+l,:,1] = result[i*a,:,1]
-                    result[(i*a)+l,:,2] = result[i*a,:,2]   
-
-    result[:,:,3] = alphaSub
-    return result
 
-# função responsavel por gerar o vetor zigzag de um canal da imagem, o parametro desta função é um array bidmensional 
-# contendo apenas um canal da imagem como um todo
-def zigzagVector(channel:np.ndarray):
-    # cria o vetor zigzag com a quantidade correta de linhas
-    zigzag = np.zeros((channel.shape[0] * channel.shape[1]))
-    # define altura e largura maxima
-    h, w = channel.shape
-    # iniciando duas variaveis responsaveis por iterar no canal recebido
-    y, x  = 0, 0
-    # indicações de direção iniciais para o algoritmo iterar
-    right, left, up, down = True, False, False, False
-    # itera sobre o canal original em zigzag salvando os valores lidos
-    for i in range(zigzag.shape[0]):
-        # caso ele va apenas para a direita
-        if right == True and left == False and up == False and down == False:
-            # atribui o valor encontrado no passo da diagonal no array zigzag
-            zigzag[i] = channel[y,x]
-            # efetua o passo para direita
-            x += 1
-            # verifica se o array original ja chegou na ultima linha
-            if y+1 >= h:
-                # define que o proximo passo sera uma diagonal para cima e para direita
-                right, left, up, down = True, False, True, False
-            else:
-                # define que o proximo passo sera uma diagonal para baixo e para esquerda
-                right, left, up, down = False, True, False, True
-            continue
-        # caso ele va para uma diagonal para baixo e esquerda
-        if right == False and left == True and up == False and down == True:
-            # atribui o valor encontrado no passo da diagonal no array zigzag
-            zigzag[i] = channel[y,x]
-            # efetua o passo na diagonal para baixo e esquerda
-            x -= 1
-            y += 1
-            # verifica se o array original ja chegou na ultima linha
-            if y+1 >= h:
-                # define que o proximo passo sera para direita
-                right, left, up, down = True, False, False, False
-            # verifica se o array original ja voltou para a primeira coluna
-            elif x-1 < 0:
-                # define que o proximo passo sera para baixo
-                right, left, up, down = False, False, False, True
-            else:
-                # define que o proximo passo sera uma diagonal para baixo e para esquerda
-                right, left, up, down = False, True, False, True
-            continue
-        # caso ele va para baixo
-        if right == False and left == False and up == False and down == True:
-            # atribui o valor encontrado no passo da diagonal no array zigzag
-            zigzag[i] = channel[y,x]
-            # efetua o passo para baixo
-            y += 1
-            # verifica se o array original ja chegou na ultima coluna
-            if x+1 >= w:
-                # define que o proximo passo sera uma diagonal para baixo e para esquerda
-                right, left, up, down = False, True, False, True
-            else:
-                # define que o proximo passo sera uma diagonal para cima e para direita
-                right, left, up, down = True, False, True, False
-            continue
-        # caso ele va para uma diagonal para cima e direita
-        if right == True and left == False and up == True and down == False:
-            # atribui o valor encontrado no passo da diagonal no array zigzag
-            zigzag[i] = channel[y,x]
-            # efetua o passo na diagonal para cima e para direita
-            x += 1
-            y -= 1
-            # verifica se o array original ja chegou na ultima coluna
-            if x+1 >= w: 
-                # define que o proximo passo sera para baixo
-                right, left, up, down = False, False, False, True
-            # verifica se o array original ja voltou para a primeira linha
-            elif y-1 < 0:
-                # define que o proximo passo sera para direita
-                right, left, up, down = True, False, False, False
-            else:
-                # define que o proximo passo sera uma diagonal para cima e para direita
-                right, left, up, down = True, False, True, False
-            continue
-
-    return zigzag
-
-# função responsavel por reconstruir um canal da imagem a partir de um vetor zigzag, o parametro desta função é um array unidimensional 
-# contendo apenas o vetor zigzag do canal a ser reconstruido
-def zigzagReconstruct(zigzag:np.ndarray) -> np.ndarray:
-    # criando array para reconstruir um canal com base no vetor zigzag recebido
-    channel = np.zeros((8,8))
-    # define altura e largura maxima
-    h, w = channel.shape
-    # iniciando duas variaveis responsaveis por iterar no canal recebido
-    y, x  = 0, 0
-    # indicações de direção iniciais para o algoritmo iterar
-    right, left, up, down = True, False, False, False
-    # itera sobre o vetor zigzag reconstruindo o canal original
-    for i in range(zigzag.shape[0]):
-        # caso ele va apenas para a direita
-        if right == True and left == False and up == False and down == False:
-            # atribui o valor encontrado no passo da diagonal no array zigzag
-            channel[y,x] = zigzag[i] 
-            # efetua o passo para direita
-            x += 1
-            # verifica se o array original ja chegou na ultima linha
-            if y+1 >= h:
-                # define que o proximo passo sera uma diagonal para cima e para direita
-                right, left, up, down = True, False, True, False
-            else:
-                # define que o proximo passo sera uma diagonal para baixo e para esquerda
-                right, left, up, down = False, True, False, True
-            continue
-        # caso ele va para uma diagonal para baixo e esquerda
-        if right == False and left == True and up == False and down == True:
-            # atribui o valor encontrado no passo da diagonal no array zigzag
-            channel[y,x] = zigzag[i]
-            # efetua o passo na diagonal para baixo e esquerda
-            x -= 1
-            y += 1
-            # verifica se o array original ja chegou na ultima linha
-            if y+1 >= h:
-                # define que o proximo passo sera para direita
-                right, left, up, down = True, False, False, False
-            # verifica se o array original ja voltou para a primeira coluna
-            elif x-1 < 0:
-                # define que o proximo passo sera para baixo
-                right, left, up, down = False, False, False, True
-            else:
-                # define que o proximo passo sera uma diagonal para baixo e para esquerda
-                right, left, up, down = False, True, False, True
-            continue
-        # caso ele va para baixo
-        if right == False and left == False and up == False and down == True:
-            # atribui o valor encontrado no passo da diagonal no array zigzag
-            channel[y,x] = zigzag[i]
-            # efetua o passo para baixo
-            y += 1
-            # verifica se o array original ja chegou na ultima coluna
-            if x+1 >= w:
-                # define que o proximo passo sera uma diagonal para baixo e para esquerda
-                right, left, up, down = False, True, False, True
-            else:
-                # define que o proximo passo sera uma diagonal para cima e para direita
-                right, left, up, down = True, False, True, False
-            continue
-        # caso ele va para uma diagonal para cima e direita
-        if right == True and left == False and up == True and down == False:
-            # atribui o valor encontrado no passo da diagonal no array zigzag
-            channel[y,x] = zigzag[i]
-            # efetua o passo na diagonal para cima e para direita
-            x += 1
-            y -= 1
-            # verifica se o array original ja chegou na ultima coluna
-            if x+1 >= w: 
-                # define que o proximo passo sera para baixo
-                right, left, up, down = False, False, False, True
-            # verifica se o array original ja voltou para a primeira linha
-            elif y-1 < 0:
-                # define que o proximo passo sera para direita
-                right, left, up, down = True, False, False, False
-            else:
-                # define que o proximo passo sera uma diagonal para cima e para direita
-                right, left, up, down = True, False, True, False
-            continue
-
-    return channel
-
-def jpegRLEEncode(vector: np.ndarray) -> list:
-
-    # lista responsavel por armazenar a codificação RLE
-    encoded = []
-    # contador de zeros consecutivos
-    zero_count = 0
-
-    for value in vector:
-        if value == 0:
-            zero_count += 1
-        else:
-            # Quando encontra um valor não nulo, salva o par (run-length, tamanho do valor)
-            # calcula o tamanho em bits necessario para armazenar o valor não nulo encontrado
-            #size = int(np.floor(np.log2(abs(value))) + 1)
-            size = int(value).bit_length() + 1
-
-            encoded.append((zero_count, size))
-            encoded.append(int(value))
-            # Reseta a contagem de zeros
-            zero_count = 0
-    
-    # Adiciona o símbolo EOB (End of Block) se o resto é zero
-    #if zero_count > 0:
-    encoded.append((0, 0))  # EOB para indicar o fim do bloco
+    # cada linha e coluna da imagem usa a amostra da celula em que esta, as linhas e colunas alem do tamanho de y são descartadas
+    rowAxis, colAxis = replicateAxis(y.shape[0], max(a, 1)), replicateAxis(y.shape[1], max(b, 1))
+    result[:,:,1] = interpolate(crSub, rowAxis, colAxis)
+    result[:,:,2] = interpolate(cbSub, rowAxis, colAxis)
 
-    return encoded
-
-# a lista recebida deve ter o formato [(qtd_zeros,bit_qtd),int]
-def jpegRLEDecode(encoded: list) -> np.ndarray:
-
-    # lista responsavel por armazenar o codigo RLE decodificado
-    decoded = []
-
-    for i in range(0, len(encoded), 2):
-        zeros, size = encoded[i]
-        if size == 0 and zeros == 0:
-            # EOB encontrado, preenche o restante com zeros
-            while len(decoded) < 64:
-                decoded.append(0)
-            break
-        else:
-            # Preenche os zeros até o próximo valor
-            decoded.extend([0] * zeros)
-            # Adiciona o valor real
-            value = encoded[i + 1]
-
-            decoded.append(value)
-
-    return np.array(decoded, dtype=int)
-
-# constroi a arvore de huffman, deve receber em chars uma lista com todos os simbolos gerados por RLE e uma lista com as respectivas frequencias de cada simbolo
-def buildHuffmanTree(chars, freq):
-    # criando uma lista de prioridades
-    priority = [Node(char, f) for char, f in zip(chars, freq)]
-    heapq.heapify(priority)
-
-    # construindo arvore de huffman
-    while len(priority) > 1:
-        left_child = heapq.heappop(priority)
-        right_child = heapq.heappop(priority)
-        merged_node = Node(frequency=left_child.frequency + right_child.frequency)
-        merged_node.left = left_child
-        merged_node.right = right_child
-        heapq.heappush(priority, merged_node)
-    
-    # retorna a raiz da arvore 
-    return priority[0]
-
-# gera os codigos de huffman para a arvore inserida e retorna o dicionario para symbolos e codigos
-def generateHuffmanCodes(node:Node, code='', huffman_codes={}):
-    if node is not None:
-        if node.symbol is not None:
-            huffman_codes[node.symbol] = code
-        generateHuffmanCodes(node.left, code + '0', huffman_codes)
-        generateHuffmanCodes(node.right, code + '1', huffman_codes)
-    
-    return huffman_codes
-
-# recebe uma lista contendo cada bloco codificado em RLE blocos esses tambem representados por uma lista
-def generateGlobalHuffmanTable(rle_blocks: list):
-    # coletando todos os simbolos de todos os blocos
-    all_symbols = []
-    for block in rle_blocks:
-        # itera sobre o bloco com passo 2 pois a cada 2 posições no array temops 
-        for symbol in block[::2]:
-            if isinstance(symbol, tuple):
-                all_symbols.append(str(symbol))
-
-    # contabilizando frequencias e simbolos
-    frequencies = Counter(all_symbols)
-
-    # constroi a arvore de huffman e gera o dicionario com os codigos de huffman
-    root = buildHuffmanTree(list(frequencies.keys()), list(frequencies.values()))
-    huffman_codes = generateHuffmanCodes(root)
-
-    return root, huffman_codes
-
-# codifica os blocos usando a tabela de huffman e retorna uma string com caracteres apenas binario
-def huffmanEncode(rle_blocks: list, huffman_codes: dict) -> str:
-
-    code = ''
-
-    for block in rle_blocks:
-        for i in range(0, len(block), 2):
-            symbol = block[i]
-            code += f'{huffman_codes[str(symbol)]}'
-            if symbol != (0, 0):
-                value = block[i + 1]
-                if value != 0:
-                    if value > 0:
-                        code += format(value, f'0{symbol[1]}b')
-                    else: 
-                        two_complement = (1 << symbol[1]) + value
-                        code += format(two_complement, f'0{symbol[1]}b') 
-
-
-    return code
-
-# decodifica os blocos codificados em huffman deve receber uma string com caracteres apenas binarios e retorna uma lista com todos os blocos decodificados
-# e as tabelas de quantização QTY e QTC
-def huffmanDecode(code:str, huffman_codes: dict) -> tuple:
-    # invertendo as chaves com os valores do dicionario de huffman
-    huffman_inverted = {code: symbol for symbol, code in huffman_codes.items()}
-    # indice para percorrer o codigo
-    i = 0
-    # buffer para leitura de bits no codigo
-    buffer = ''
-    # listas para a reconstrução da tabela de 
-    qty, qtc = [], []
-    # listas para reconstruir o codigo RLE original
-    decoded = []
-    block = []
-    # conta quantos blocos ja foram decodificados
-    decoded_blocks = 0
-
-    while i < len(code):
-        buffer += code[i]
-        if buffer in huffman_inverted:
-            # reconstruindo uma das tuplas do codigo original
-            symbol = eval(huffman_inverted[buffer])
-            # salvando a tupla no bloco reconstruido
-            block.append(symbol)
-            # identifica se chegou ao fim do bloco
-            if symbol == (0,0):
-                if decoded_blocks == 0:
-                    qty.append(block)
-                elif decoded_blocks == 1:
-                    qtc.append(block)
-                else:
-                    decoded.append(block)
-                buffer = ''
-                block = []
-                i += 1 + symbol[1]
-                decoded_blocks += 1
-                continue
-
-            # recortando os bits do inteiro não nulo com base no tamanho indicado na tupla acima
-            num = code[i+1:(i + 1) + symbol[1]]
-            # convertendo de binario para inteiro (considerando complemento de 2 para numeros negativos)
-            # caso o numero seja negativo
-            if num[0] == '1':
-                # quantidade de bits 
-                bits = len(num)
-                # convertendo para inteiro
-                num = int(num, 2)
-                # ajustando complemento de 2
-                num = num - (1 << bits)
-            else:
-                # se for positivo apenas converte para inteiro 
-                num = int(num, 2)
-
-            # salva o valor não nulo no bloco reconstruido
-            block.append(num)
-            # limpando buffer de bits
-            buffer = ''
-            i += 1 + symbol[1]
-        else:
-            i += 1
-
-    return decoded, qty[0], qtc[0]
-
-# funções responsaveis por codificar a tabela de huffman de modo que possa ser decodificada antes de decodificar os blocos no codigo final
-def encodeHuffmanTable(huffman_table: dict) -> str:
-    encoded = ''
-    for symbol, code in huffman_table.items():
-        # Converte o símbolo (tupla) em uma string e depois para bytes
-        symbol_str = str(symbol)  # Converte a tupla em string
-        # Armazena o tamanho do símbolo como binário 
-        symbol_length = len(symbol_str)
-        symbol_length_binary = format(symbol_length, '016b')
-        # Converte cada caractere da string do símbolo para binário (8 bits por caractere)
-        symbol_binary = ''.join(format(ord(char), '08b') for char in symbol_str)
-        # Armazena o comprimento do código de Huffman em 8 bits
-        code_length = len(code)
-        code_length_binary = format(code_length, '08b')
-        # Concatena símbolo, comprimento do código e o código
-        encoded += symbol_length_binary + symbol_binary + code_length_binary + code
-    # Adiciona o marcador de fim da tabela
-    end_marker = "1111111111111111"  # 16 bits de 1
-    encoded += end_marker
-    return encoded
-
-def decodeHuffmanTable(encoded: str) -> tuple:
-    # marcador de final de tabela 16bits de 1
-    end_marker = "1111111111111111"
-    huffman_table = {}
-    offset = 0
-    while offset < len(encoded):
-        # Verifica se encontrou o marcador de fim
-        if encoded[offset:offset + 16] == end_marker:
-            offset += 16
-            break  # Fim da decodificação dos dados
-        # Lê o comprimento do símbolo (16 bits)
-        symbol_length_binary = encoded[offset:offset + 16]
-        symbol_length = int(symbol_length_binary, 2)
-        offset += 16
-        # Lê o símbolo em formato binário
-        symbol_binary = encoded[offset:offset + (symbol_length * 8)]
-        symbol_str = ''.join(chr(int(symbol_binary[i:i + 8], 2)) for i in range(0, len(symbol_binary), 8))
-        offset += symbol_length * 8
-        # Lê o comprimento do código (8 bits)
-        code_length_binary = encoded[offset:offset + 8]
-        code_length = int(code_length_binary, 2)
-        offset += 8
-        # Lê o código de Huffman
-        code = encoded[offset:offset + code_length]
-        offset += code_length
-        huffman_table[symbol_str] = code
-    return huffman_table, encoded[offset:]
+    if alphaSub is not None:
+        result[:,:,3] = alphaSub
+    return result
 
 # funções responsaveis por codificar o dicionario que contem os shapes originais da imagem e o shape depois do padding
 # esta codificação é ligeiramente parecida com a codificação usada para codificar a tabela de huffman
-def encodeShapes(shapes: dict) -> str:
-    encoded = ''
+def encodeShapes(shapes: dict, writer: BitWriter):
     for key, value in shapes.items():
         # Serializa a chave do dicionário
-        key_length = len(key)
-        key_length_binary = format(key_length, '016b')  # 16 bits para o comprimento da chave
-        key_binary = ''.join(format(ord(char), '08b') for char in key)  # Cada caractere em 8 bits
-        encoded += key_length_binary + key_binary
-        
+        writer.write(len(key), 16)  # 16 bits para o comprimento da chave
+        for char in key:
+            writer.write(ord(char), 8)  # Cada caractere em 8 bits
+
         # Serializa a lista de tuplas
-        list_length = len(value)
-        list_length_binary = format(list_length, '08b')  # 8 bits para o comprimento da lista
-        encoded += list_length_binary
+        writer.write(len(value), 8)  # 8 bits para o comprimento da lista
         for tup in value:
             # Cada elemento da tupla (dois inteiros) em 32 bits
             for num in tup:
-                encoded += format(num, '032b')  # Inteiros em 32 bits
+                writer.write(num, 32)  # Inteiros em 32 bits
 
-    # Adiciona o marcador de fim da seção
-    end_marker = "1111111111111111"  # 16 bits de 1
-    encoded += end_marker
-    return encoded
+    # Adiciona o marcador de fim da seção (16 bits de 1)
+    writer.write(0xFFFF, 16)
 
-def decodeShapes(encoded: str) -> tuple:
+def decodeShapes(reader: BitReader) -> dict:
     # marcador de final de tabela 16bits de 1
-    end_marker = "1111111111111111"
+    end_marker = 0xFFFF
     decoded = {}
-    offset = 0
-    while offset < len(encoded):
+    while reader.pos < reader.length:
         # Verifica se encontrou o marcador de fim
-        if encoded[offset:offset + 16] == end_marker:
-            offset += 16
+        if reader.peek(16) == end_marker:
+            reader.pos += 16
             break  # Fim da decodificação dos dados
-        # Lê o comprimento da chave
-        key_length_binary = encoded[offset:offset + 16]
-        key_length = int(key_length_binary, 2)
-        offset += 16
-        # Lê a chave
-        key_binary = encoded[offset:offset + (key_length * 8)]
-        # reconstruindo a chave
-        key = ''.join(chr(int(key_binary[i:i + 8], 2)) for i in range(0, len(key_binary), 8))
-        offset += key_length * 8
-        
+        # Lê o comprimento da chave e reconstroi a chave
+        key_length = reader.read(16)
+        key = ''.join(chr(reader.read(8)) for _ in range(key_length))
+
         # Lê o comprimento da lista
-        list_length_binary = encoded[offset:offset + 8]
-        list_length = int(list_length_binary, 2)
-        offset += 8
-        # Lê os elementos da lista (tuplas)
-        value = []
-        for _ in range(list_length):
-            tup = []
-            for _ in range(2):  # Cada tupla tem 2 inteiros
-                num_binary = encoded[offset:offset + 32]
-                num = int(num_binary, 2)
-                tup.append(num)
-                offset += 32
-            value.append(tuple(tup))
+        list_length = reader.read(8)
+        # Lê os elementos da lista (tuplas), cada tupla tem 2 inteiros de 32 bits
+        value = [(reader.read(32), reader.read(32)) for _ in range(list_length)]
         decoded[key] = value
-    return decoded, encoded[offset:]
+    return decoded
 
 # função responsavel por escrever o arquivo com o codigo da imagem comprimida
-def writeFile(code:str, filename:str = 'compressed'):
+def writeFile(code:bytes, filename:str = 'compressed'):
     # ajustando extensão de arquivo
     filename = filename + '.gpeg'
-    
-    # salva o comprimento original da string de bits
-    original_length = len(code)
-
-    # verificando se a string é um multiplo de 8 ja que o arquivo sera gravado em bytes não em bits
-    if original_length % 8 != 0:
-        # adiciona um padding de 0s a direita para poder salvar em bytes
-        padded_code = code.ljust((original_length + 7) // 8 * 8, '0')
-    else:
-        padded_code = code
-
-    # converte a string em bytes
-    code_bytes = int(padded_code, 2).to_bytes(len(padded_code) // 8, byteorder='big')
 
     # escreve o arquivo
     with open(filename, 'wb') as file:
-        # salvando o comprimento original no inicio com 4 bytes (permite um arquivo de ate 4gb)
-        file.write(original_length.to_bytes(4, byteorder='big'))
+        # salvando o comprimento do codigo em bytes no inicio com 4 bytes (permite um arquivo de ate 4gb)
+        file.write(len(code).to_bytes(4, byteorder='big'))
         # salvando restante dos dados
-        file.write(code_bytes)
+        file.write(code)
+        # bytes de folga para que o arquivo possa ser decodificado direto do disco
+        file.write(bytes(READ_PADDING))
+
+def readFile(filepath:str) -> bytes:
 
-def readFile(filepath:str) -> str:
-    
     # abre o arquivo
     with open(filepath, 'rb') as file:
-        # le os 4 bytes que representam o tamanho original da string
-        orignal_length = int.from_bytes(file.read(4), byteorder='big')
+        # le os 4 bytes que representam o tamanho do codigo
+        length = int.from_bytes(file.read(4), byteorder='big')
         # le o restante do arquivo
-        read_bytes = file.read()
+        code = file.read(length)
 
-    # convertendo os bytes para bits novamente
-    padded_code = ''.join(f'{byte:08b}' for byte in read_bytes)
-
-    # retorna apenas a parte sem o padding se ele tiver sido necessario na escrita
-    return padded_code[:orignal_length]
+    return code
 
-# realiza as transformadas nos canais da imagem e ja aplica a quantização
-def compress(y:np.ndarray, cr:np.ndarray, cb:np.ndarray, alpha:np.ndarray, qty:np.ndarray, qtc:np.ndarray, ssv:int, ssh:int):
+# normaliza os canais subtraindo 128 e ajusta os shapes para que possam ser divididos igualmente em blocos 8x8, alpha pode ser None
+# os planos saem em float32, assim como os de color.encodePlanes usados por encode
+def padChannels(y:np.ndarray, cr:np.ndarray, cb:np.ndarray, alpha:np.ndarray) -> tuple:
 
     # como os blocos de quantização tem tamanho fixo define-se uma constante com o tamanho do lado
     BLOCKSIZE = 8 
     
     # normaliza os canais subtraindo 128 de todos eles
     y = y - 128
-    alpha = alpha - 128
     cr = cr - 128
     cb = cb - 128
 
-    # lista contendo todos os blocos codificados em RLE
-    all_blocks = []
-
-    # codificando as tabelizas de quantização em RLE para que possam ser posteriormente codificadas em huffman
-    qtyRle = jpegRLEEncode(zigzagVector(qty))
-    qtcRle = jpegRLEEncode(zigzagVector(qtc))
-    all_blocks.append(qtyRle)
-    all_blocks.append(qtcRle)
-
     # verifica se o tamanho de y pode ser dividido igualmente em blocos de 8 por 8 pixel, caso não seja ajusta o shape de y adicionando linhas e colunas de 0
     yWidth, yHeight = int(np.ceil(y.shape[1] / BLOCKSIZE) * BLOCKSIZE), int(np.ceil(y.shape[0] / BLOCKSIZE) * BLOCKSIZE)
     if y.shape[1] % BLOCKSIZE == 0 and y.shape[0] % BLOCKSIZE == 0:
-        yPadding = y.copy()
-        alphaPadding = alpha.copy()
+        yPadding = y.astype(np.float32)
     else:
-        yPadding = np.zeros((yHeight,yWidth))
-        alphaPadding = np.zeros((yHeight,yWidth))
+        yPadding = np.zeros((yHeight,yWidth), dtype=np.float32)
         yPadding[0:y.shape[0],0:y.shape[1]] += y
+
+    # o plano alpha so é normalizado e ajustado quando for informado
+    alphaPadding = None
+    if alpha is not None:
+        alpha = alpha - 128
+        alphaPadding = np.zeros((yHeight,yWidth), dtype=np.float32)
         alphaPadding[0:alpha.shape[0],0:alpha.shape[1]] += alpha
 
     crWidth, crHeight = int(np.ceil(cr.shape[1] / BLOCKSIZE) * BLOCKSIZE), int(np.ceil(cr.shape[0] / BLOCKSIZE) * BLOCKSIZE)
     # como os canais Cr e Cb tem sempre o mesmo tamanho os dois são ajustados dentro do mesmo if
     if cr.shape[1] % BLOCKSIZE == 0 and cr.shape[0] % BLOCKSIZE == 0:
-        crPadding = cr.copy()
-        cbPadding = cb.copy()
+        crPadding = cr.astype(np.float32)
+        cbPadding = cb.astype(np.float32)
     else:
-        crPadding = np.zeros((crHeight,crWidth))
-        cbPadding = np.zeros((crHeight,crWidth))
+        crPadding = np.zeros((crHeight,crWidth), dtype=np.float32)
+        cbPadding = np.zeros((crHeight,crWidth), dtype=np.float32)
         crPadding[0:cr.shape[0],0:cr.shape[1]] += cr
         cbPadding[0:cb.shape[0],0:cb.shape[1]] += cb
 
-    # separando em blocos
-    yBlocks = yPadding.reshape(yPadding.shape[0] // BLOCKSIZE, BLOCKSIZE, yPadding.shape[1] // BLOCKSIZE, BLOCKSIZE).transpose(0, 2, 1, 3).reshape(-1, BLOCKSIZE, BLOCKSIZE)
-    alphaBlocks = alphaPadding.reshape(alphaPadding.shape[0] // BLOCKSIZE, BLOCKSIZE, alphaPadding.shape[1] // BLOCKSIZE, BLOCKSIZE).transpose(0, 2, 1, 3).reshape(-1, BLOCKSIZE, BLOCKSIZE)
-    crBlocks = crPadding.reshape(crPadding.shape[0] // BLOCKSIZE, BLOCKSIZE, crPadding.shape[1] // BLOCKSIZE, BLOCKSIZE).transpose(0, 2, 1, 3).reshape(-1, BLOCKSIZE, BLOCKSIZE)
-    cbBlocks = cbPadding.reshape(cbPadding.shape[0] // BLOCKSIZE, BLOCKSIZE, cbPadding.shape[1] // BLOCKSIZE, BLOCKSIZE).transpose(0, 2, 1, 3).reshape(-1, BLOCKSIZE, BLOCKSIZE)
-
-    # aplicando transformada do cosseno
-    yBlocks = np.array([cv2.dct(block) for block in yBlocks])
-    alphaBlocks = np.array([cv2.dct(block) for block in alphaBlocks])
-    crBlocks = np.array([cv2.dct(block) for block in crBlocks])
-    cbBlocks = np.array([cv2.dct(block) for block in cbBlocks])
-    
-    # aplicando quantização nos blocos
-    yBlocks = np.array(np.round(yBlocks / qty))
-    alphaBlocks = np.array(np.round(alphaBlocks / qty))
-    crBlocks = np.array(np.round(crBlocks / qtc))
-    cbBlocks = np.array(np.round(cbBlocks / qtc))
-    
-    # varre o bloco em zig-zag
-    yBlocks = [zigzagVector(block) for block in yBlocks]
-    alphaBlocks = [zigzagVector(block) for block in alphaBlocks]
-    crBlocks = [zigzagVector(block) for block in crBlocks]
-    cbBlocks = [zigzagVector(block) for block in cbBlocks]
-    
-    # codifica o codigo em RLE
-    yBlocks = [jpegRLEEncode(block) for block in yBlocks]
-    alphaBlocks = [jpegRLEEncode(block) for block in alphaBlocks]
-    crBlocks = [jpegRLEEncode(block) for block in crBlocks]
-    cbBlocks = [jpegRLEEncode(block) for block in cbBlocks]
-
-    # adicionando blocos a lista de blocos
-    all_blocks.extend(yBlocks)
-    all_blocks.extend(alphaBlocks)
-    all_blocks.extend(crBlocks)
-    all_blocks.extend(cbBlocks)
+    return yPadding, crPadding, cbPadding, alphaPadding
+
+# aplica a transformada do cosseno, a quantização e a varredura em zig-zag em todos os blocos de cada canal ja com padding de uma só vez
+# retorna os planos na ordem em que são concatenados no arquivo, o alpha so é incluido quando informado
+# com pool (um CodecPool ou CodecThreads do codecpool) as faixas de linhas de blocos de cada canal são transformadas em paralelo
+# integer usa a transformada inteira, com os vetores em int16
+def transformChannels(yPadding:np.ndarray, crPadding:np.ndarray, cbPadding:np.ndarray, alphaPadding:np.ndarray, qty:np.ndarray, qtc:np.ndarray, pool = None,
+                      integer:bool = False) -> list:
+    if pool is not None:
+        args = [(yPadding, qty), (crPadding, qtc), (cbPadding, qtc)]
+        if alphaPadding is not None:
+            args.insert(1, (alphaPadding, qty))
+        return pool.transformPlanes(args, integer)
+    planes = [zigzagVector(forwardDCT(yPadding, qty, integer)), zigzagVector(forwardDCT(crPadding, qtc, integer)), zigzagVector(forwardDCT(cbPadding, qtc, integer))]
+    if alphaPadding is not None:
+        planes.insert(1, zigzagVector(forwardDCT(alphaPadding, qty, integer)))
+    return planes
+
+# posição em bytes, a partir do inicio do codigo, das posições dos segmentos no cabeçalho (apos ssv, ssh, flags, o intervalo e a quantidade)
+SEGMENT_TABLE_OFFSET = 9
+
+# flags do cabeçalho a partir das opções da codificação, hasAlpha indica que a imagem tem alpha e dctAlpha que ele passa pela DCT
+def headerFlags(hasAlpha:bool, dctAlpha:bool, restartInterval:int, regionIndex:int, centered:bool, integer:bool) -> int:
+    flags = 0
+    if hasAlpha:
+        flags = ALPHA_PLANE if dctAlpha else ALPHA_PLANE | ALPHA_LOSSLESS
+    if restartInterval:
+        flags |= RESTART_INTERVALS
+    if regionIndex:
+        flags |= REGION_INDEX
+    if centered:
+        flags |= CENTERED_CHROMA
+    if integer:
+        flags |= INTEGER_TRANSFORM
+    return flags
+
+# escreve o cabeçalho do codigo: os parametros ssv e ssh, as flags dos planos presentes, os shapes e a tabela de huffman
+# com a flag RESTART_INTERVALS restart deve ser (faixas por segmento, posição em bytes de cada segmento a partir do fim do cabeçalho),
+# gravados logo apos as flags com 16 bits para o intervalo, 32 para a quantidade e 32 para cada posição, e o cabeçalho termina alinhado
+def encodeHeader(writer: BitWriter, ssv:int, ssh:int, flags:int, shapes:dict, huffman_codes:dict, restart:tuple = None):
+    writer.write(ssv, 8)
+    writer.write(ssh, 8)
+    writer.write(flags, 8)
+    if flags & RESTART_INTERVALS:
+        restartInterval, offsets = restart
+        writer.write(restartInterval, 16)
+        writer.write(len(offsets), 32)
+        for offset in offsets:
+            writer.write(offset, 32)
+    encodeShapes(shapes, writer)
+    encodeHuffmanTable(huffman_codes, writer)
+    if flags & RESTART_INTERVALS:
+        writer.alignToByte()
+
+# realiza as transformadas nos canais da imagem e ja aplica a quantização
+# restartInterval divide o codigo em segmentos de restartInterval faixas que podem ser decodificados em paralelo (0 desativa)
+# regionIndex grava no final do codigo o indice de regiões com uma entrada a cada regionIndex colunas de blocos (0 desativa)
+# pool (um CodecPool ou CodecThreads do codecpool) paraleliza as transformadas, sem ele tudo é executado no processo atual
+# stats (um stats.Stats) recebe o tempo de cada etapa, as contagens de blocos e simbolos, os bits de cada canal e o tamanho dos buffers
+# transform escolhe a DCT: 'float' (padrão, em float32) ou 'integer' (inteira em ponto fixo, com os coeficientes em int16 e a
+# decodificação exata em qualquer maquina)
+def compress(y:np.ndarray, cr:np.ndarray, cb:np.ndarray, alpha:np.ndarray, qty:np.ndarray, qtc:np.ndarray, ssv:int, ssh:int, alphaMode:str = 'lossless',
+             restartInterval:int = 0, regionIndex:int = 0, pool = None, stats:Stats = None, transform:str = 'float'):
+
+    # o alpha so passa pela DCT com a tabela de luminancia no modo 'dct', no modo 'lossless' ele é codificado sem perdas apos os demais canais
+    validateOptions(alphaMode, transform)
+    dctAlpha = alpha is not None and alphaMode == 'dct'
+    # sem stats as metricas são descartadas e as mais caras (bits de cada canal) não são calculadas
+    collect = stats is not None
+    stats = stats or Stats()
+
+    # normaliza os canais e ajusta os shapes para que possam ser divididos em blocos 8x8, o alpha so é considerado quando passar pela DCT
+    with stats.stage('padding'):
+        yPadding, crPadding, cbPadding, alphaPadding = padChannels(y, cr, cb, alpha if dctAlpha else None)
+
+    return compressPlanes(yPadding, crPadding, cbPadding, alphaPadding, None if dctAlpha else alpha, [y.shape,cr.shape,cb.shape], qty, qtc, ssv, ssh,
+                          restartInterval, regionIndex, pool, stats if collect else None, integer=transform == 'integer')
+
+# continuação de compress a partir dos planos ja normalizados e com padding (ver padChannels e color.encodePlanes): alphaPadding é o alpha
+# que passa pela DCT e alpha o alpha sem perdas (no maximo um dos dois é informado), originalShapes os shapes de Y, Cr e Cb antes do padding
+# centered indica que as chrominancias foram reduzidas com downsampling = 'box' (ver CENTERED_CHROMA) e integer que a transformada inteira
+# é usada (ver INTEGER_TRANSFORM)
+def compressPlanes(yPadding:np.ndarray, crPadding:np.ndarray, cbPadding:np.ndarray, alphaPadding:np.ndarray, alpha:np.ndarray, originalShapes:list,
+                   qty:np.ndarray, qtc:np.ndarray, ssv:int, ssh:int, restartInterval:int = 0, regionIndex:int = 0, pool = None, stats:Stats = None,
+                   centered:bool = False, integer:bool = False):
+    dctAlpha = alphaPadding is not None
+    collect = stats is not None
+    stats = stats or Stats()
+    stats.buffer('planos', [yPadding, crPadding, cbPadding, alphaPadding])
+
+    # codifica em RLE de uma só vez as tabelas de quantização (para que possam ser decodificadas junto com a imagem) e todos os blocos
+    # dos canais na ordem das faixas do arquivo, gerando os arrays de simbolos (zeros << 4 | tamanho) e de valores
+    qtSymbols, qtValues, _ = rleEncodeArrays(zigzagVector(np.stack([qty, qtc]).astype(np.int32)))
+    with stats.stage('transformada'):
+        planes = transformChannels(yPadding, crPadding, cbPadding, alphaPadding, qty, qtc, pool, integer)
+    stats.buffer('coeficientes', planes)
+    stats.count('blocos', sum(len(plane) for plane in planes))
+    with stats.stage('rle'):
+        symbols, values, symbolEnds = stripSymbols(planes, yPadding.shape, crPadding.shape, ssv)
+    planes = None
+    stats.count('simbolos', len(symbols))
+    stats.buffer('simbolos', [symbols, values])
+    imageSymbols = symbols
+    symbols = np.concatenate([qtSymbols, symbols])
+    values = np.concatenate([qtValues, values])
+    # as tabelas fazem parte da primeira faixa
+    symbolEnds += len(qtSymbols)
 
     # salva os shapes originais dos canais para serem restaurados posteriormente na decodificação da imagem
-    originalShapes = [y.shape,cr.shape,cb.shape,alpha.shape]
-    paddedShapes = [(yHeight,yWidth),(crHeight,crWidth),(crHeight,crWidth)]
+    paddedShapes = [yPadding.shape,crPadding.shape,cbPadding.shape]
 
     shapes = {
         'original':originalShapes,
         'padded':paddedShapes
     }
     
-    # gerando arvore e tabela de huffman considerando todos os blocos codificados em RLE para garantir mair eficiencia na codificação de huffman
-    root, huffman_codes = generateGlobalHuffmanTable(all_blocks)
+    # gerando a tabela de huffman considerando todos os simbolos RLE para garantir mair eficiencia na codificação de huffman
+    with stats.stage('tabela_huffman'):
+        huffman_codes = generateGlobalHuffmanTable(symbols)
+    stats.count('tabela_huffman', len(huffman_codes))
     # codificando toda a imagem, passando primeiro os parametros ssv e ssh codificados em binario, depois os shapes codificados, apos eles a tabela de huffman,
-    # as tabelas de quantização e finalmente os blocos dos canais y, Cr, Cb e alpha codificados em huffman
-    encoded = format(ssv,'08b') + format(ssh,'08b') + encodeShapes(shapes) + encodeHuffmanTable(huffman_codes) + huffmanEncode(all_blocks, huffman_codes)
-
-    # calculando tamanho necessario em bits para armzaenar a imagem orinal
-    img_length = originalShapes[0][0] * originalShapes[0][1] * 4 * 8
-    # tamanho em bits do codigo gerado pela compressão
-    compressed_length = len(encoded)
-    # calculando taxa de compressão
-    compression_ratio = (1 - (compressed_length / img_length)) * 100
-    print(f'Tamanho em bits da imagem original: {img_length} bits')
-    print(f'Tamanho do codigo da imagem apos compressão: {compressed_length} bits')
-    print(f'Taxa de compressão estimada: {format(compression_ratio, '.2f')}%')
+    # as tabelas de quantização e finalmente as faixas com os blocos dos canais y, alpha (quando presente), Cr e Cb codificados em huffman
+    # as flags indicam os planos opcionais presentes no arquivo e o modo de codificação do alpha
+    flags = headerFlags(dctAlpha or alpha is not None, dctAlpha, restartInterval, regionIndex, centered, integer)
+    # as faixas são codificadas primeiro pois as posições dos segmentos fazem parte do cabeçalho
+    # o alpha sem perdas é escrito faixa a faixa logo apos os blocos de cada faixa
+    strips = BitWriter()
+    with stats.stage('huffman'):
+        offsets, blockBits, alphaBits = encodeStrips(symbols, values, symbolEnds, huffman_codes, alpha, ssv, strips, restartInterval,
+                                                     positions=regionIndex > 0)
+    writer = BitWriter()
+    with stats.stage('cabecalho'):
+        encodeHeader(writer, ssv, ssh, flags, shapes, huffman_codes, (restartInterval, [0] + offsets))
+    headerBits = len(writer)
+    writer.writeBytes(strips.getBytes(), len(strips))
+    if regionIndex:
+        # as posições são relativas ao inicio das faixas, os dois primeiros blocos são as tabelas de quantização
+        with stats.stage('indice'):
+            entries = regionEntries(blockBits[2:] + headerBits, None if alphaBits is None else alphaBits + headerBits, yPadding.shape, crPadding.shape, ssv, dctAlpha, regionIndex)
+            encodeRegionIndex(entries, regionIndex, writer)
+    encoded = writer.getBytes()
+    stats.buffer('codigo', len(encoded))
+
+    # tamanho necessario em bits para armazenar a imagem original, tamanho do codigo gerado e taxa de compressão
+    img_length = originalShapes[0][0] * originalShapes[0][1] * (4 if dctAlpha or alpha is not None else 3) * 8
+    stats.count('bits_original', img_length)
+    stats.count('bits_codigo', len(writer))
+    stats.count('taxa_compressao', (1 - (len(writer) / img_length)) * 100)
+    if collect:
+        stats.count('bits', codeBits(imageSymbols, qtSymbols, huffman_codes, yPadding.shape, crPadding.shape, ssv, dctAlpha, alpha is not None,
+                                     headerBits, len(strips), len(writer)))
 
     return encoded
 
-# realiza o processo inverso da função anterior, desquantiza e ja aplica a transformada inversa, retornando ja os 4 canais da imagem prontos para continuar a descompressão
-def deCompress(code:str):
-
-    BLOCKSIZE = 8
+# le o cabeçalho escrito por encodeHeader, retornando ssv, ssh, as flags, os shapes, a tabela de huffman e o intervalo e as posições
+# em bytes dos segmentos no buffer do reader (None sem a flag RESTART_INTERVALS)
+def decodeHeader(reader: BitReader) -> tuple:
     # decodificando parametros usados na sub amostragem
-    ssv = int(code[:8], 2)
-    ssh = int(code[8:16], 2)
-
-    # removendo parte do codigo referente as constantes de sub amostragem
-    code = code[16:]
-
+    ssv = reader.read(8)
+    ssh = reader.read(8)
+    # decodificando as flags dos planos presentes
+    flags = reader.read(8)
+    restart = None
+    if flags & RESTART_INTERVALS:
+        restartInterval = reader.read(16)
+        offsets = [reader.read(32) for _ in range(reader.read(32))]
     # decodificando os shapes da imagem
-    shapes, encoded_blocks = decodeShapes(code)
+    shapes = decodeShapes(reader)
     # decodificando tabela de huffman
-    huffman_codes, encoded_blocks = decodeHuffmanTable(encoded_blocks)
-    # decoficicando todos os blocos e as tabelas de quantização para o codigo RLE
-    rle_blocks, qty, qtc = huffmanDecode(encoded_blocks, huffman_codes)
-    # decodificando o RLE das tabelas de quantização neste ponto elas ja estão prontas para serem usadas na descompressão
-    qty = zigzagReconstruct(jpegRLEDecode(qty))
-    qtc = zigzagReconstruct(jpegRLEDecode(qtc))
-
-    originalShapes = shapes['original']
-    paddedShapes = shapes['padded']
-
-    # decodificando os blocos em RLE e gerando o vetor zigzag original
-    zigZagBlocks = np.array([jpegRLEDecode(block) for block in rle_blocks])
-
-    # reconstruindo os vetores zigzag para o formato de blocos original
-    quantizedBlocks = np.array([zigzagReconstruct(block) for block in zigZagBlocks])
-
-    # definindo quantidade de blocos na horizontal e vertical para luminancia e chrominancia
-    jBlocksY = int(paddedShapes[0][1] / BLOCKSIZE) # quantidade de blocos na horizontal para Y
-    iBlocksY = int(paddedShapes[0][0] / BLOCKSIZE) # quantidade de blocos na vertical para Y
-    # novamente como os canais cr e cb tem sempre as mesmas dimensões so é necessario definir quantidade de blocos para um deles
-    jBlocksC = int(paddedShapes[1][1] / BLOCKSIZE) # quantidade de blocos na horizontal para Chrominancias
-    iBlocksC = int(paddedShapes[1][0] / BLOCKSIZE) # quantidade de blocos na vertical para Chrominancias
+    huffman_codes = decodeHuffmanTable(reader)
+    if flags & RESTART_INTERVALS:
+        # os segmentos começam no primeiro byte apos o cabeçalho
+        reader.alignToByte()
+        restart = (restartInterval, [(reader.pos >> 3) + offset for offset in offsets])
+    return ssv, ssh, flags, shapes, huffman_codes, restart
+
+# quantidade de blocos de cada faixa entre as faixas first e last (exclusiva), calculada a partir dos shapes com padding da imagem inteira
+def stripBlockCounts(paddedShapes:list, ssv:int, dctAlpha:bool, first:int, last:int) -> np.ndarray:
+    BLOCKSIZE = 8
+    yRows, yCols = paddedShapes[0][0] // BLOCKSIZE, paddedShapes[0][1] // BLOCKSIZE
+    cCols = paddedShapes[1][1] // BLOCKSIZE
+    strips = np.arange(first, last)
+    # a ultima faixa pode ter menos linhas de blocos de Y
+    rows = np.minimum((strips + 1) * max(ssv, 1), yRows) - strips * max(ssv, 1)
+    return rows * yCols * (2 if dctAlpha else 1) + 2 * cCols
+
+# recebe os vetores zigzag dos blocos de um conjunto de faixas completas na ordem do arquivo e reconstroi os canais, desquantizando, aplicando
+# a transformada inversa, recortando o padding e removendo a normalização. Os shapes são os do trecho da imagem coberto pelas faixas
+# size é o tamanho dos blocos gerados pela transformada inversa (ver scaledBlockSize), com size < 8 os vetores podem ter apenas os
+# zigzagPrefix(size) primeiros coeficientes e os canais saem reduzidos para size / 8 da resolução
+# retorna y, cr, cb e o alpha quando ele foi codificado pela DCT (None caso contrario), com pool as transformadas são feitas em paralelo
+# com crop = False os canais saem com o padding e sem remover a normalização, como color.decodePixels os recebe, e integer usa a inversa inteira
+def reconstructChannels(zigZagBlocks:np.ndarray, qty:np.ndarray, qtc:np.ndarray, originalShapes:list, paddedShapes:list, ssv:int, dctAlpha:bool, size:int = 8,
+                        pool = None, crop:bool = True, integer:bool = False) -> tuple:
 
+    BLOCKSIZE = 8
     # separando canais
     # Definição dos tamanhos dos blocos
-    size_y = jBlocksY * iBlocksY
-    size_c = jBlocksC * iBlocksC
+    size_y = (paddedShapes[0][0] // BLOCKSIZE) * (paddedShapes[0][1] // BLOCKSIZE)
+    size_c = (paddedShapes[1][0] // BLOCKSIZE) * (paddedShapes[1][1] // BLOCKSIZE)
 
-    # Extração dos blocos sem loops explícitos e separando em canais de cor
-    y, alpha, cr, cb = np.split(quantizedBlocks, [size_y, 2 * size_y, 2 * size_y + size_c])
+    # voltando os blocos da ordem das faixas para os planos concatenados
+    order, _ = stripOrder(paddedShapes[0], paddedShapes[1], ssv, dctAlpha)
+    planeBlocks = np.empty_like(zigZagBlocks)
+    planeBlocks[order] = zigZagBlocks
 
-    # desquantizando blocos
-    y = np.array([y[block] * qty for block in range(jBlocksY * iBlocksY)])
-    alpha = np.array([alpha[block] * qty for block in range(jBlocksY * iBlocksY)])
-    cr = np.array([cr[block] * qtc for block in range(jBlocksC * iBlocksC)])
-    cb = np.array([cb[block] * qtc for block in range(jBlocksC * iBlocksC)])
-    
-    # revertendo a transformada
-    y = np.array([cv2.idct(block) for block in y])
-    alpha = np.array([cv2.idct(block) for block in alpha])
-    cr = np.array([cv2.idct(block) for block in cr])
-    cb = np.array([cv2.idct(block) for block in cb])
-
-    # reorganizando lista de blocos para a matriz imagem 
-    y = y.reshape(paddedShapes[0][0] // BLOCKSIZE, paddedShapes[0][1] // BLOCKSIZE, BLOCKSIZE, BLOCKSIZE).transpose(0, 2, 1, 3).reshape(paddedShapes[0])
-    alpha = alpha.reshape(paddedShapes[0][0] // BLOCKSIZE, paddedShapes[0][1] // BLOCKSIZE, BLOCKSIZE, BLOCKSIZE).transpose(0, 2, 1, 3).reshape(paddedShapes[0])
-    cr = cr.reshape(paddedShapes[1][0] // BLOCKSIZE, paddedShapes[1][1] // BLOCKSIZE, BLOCKSIZE, BLOCKSIZE).transpose(0, 2, 1, 3).reshape(paddedShapes[1])
-    cb = cb.reshape(paddedShapes[1][0] // BLOCKSIZE, paddedShapes[1][1] // BLOCKSIZE, BLOCKSIZE, BLOCKSIZE).transpose(0, 2, 1, 3).reshape(paddedShapes[1])
+    # Extração dos blocos sem loops explícitos e separando em canais de cor
+    alpha = None
+    if dctAlpha:
+        y, alpha, cr, cb = np.split(planeBlocks, [size_y, 2 * size_y, 2 * size_y + size_c])
+    else:
+        y, cr, cb = np.split(planeBlocks, [size_y, size_y + size_c])
+
+    # shapes dos canais na escala de decodificação
+    scaled = lambda shape, ceil: tuple(-(-n * size // BLOCKSIZE) if ceil else n * size // BLOCKSIZE for n in shape)
+    paddedShapes = [scaled(shape, False) for shape in paddedShapes]
+    originalShapes = [scaled(shape, True) for shape in originalShapes]
+
+    # desquantizando, revertendo a transformada e reorganizando a lista de blocos para a matriz imagem
+    if pool is not None:
+        args = [(y, qty, paddedShapes[0]), (cr, qtc, paddedShapes[1]), (cb, qtc, paddedShapes[1])]
+        if dctAlpha:
+            args.append((alpha, qty, paddedShapes[0]))
+        y, cr, cb, *rest = pool.inversePlanes(args, size, integer)
+        if dctAlpha:
+            alpha = rest[0]
+    else:
+        y = inverseDCTScaled(y, qty, paddedShapes[0], size, integer)
+        if dctAlpha:
+            alpha = inverseDCTScaled(alpha, qty, paddedShapes[0], size, integer)
+        cr = inverseDCTScaled(cr, qtc, paddedShapes[1], size, integer)
+        cb = inverseDCTScaled(cb, qtc, paddedShapes[1], size, integer)
+    if not crop:
+        return y, cr, cb, alpha
 
     # recortando os blocos para eliminar o padding inserido na compressão
     shape = originalShapes[0]
     if y.shape > shape:
         y = y[0:shape[0],0:shape[1]]
-        alpha = alpha[0:shape[0],0:shape[1]]
+        if dctAlpha:
+            alpha = alpha[0:shape[0],0:shape[1]]
 
     # recortando os blocos para eliminar o padding inserido na compressão
     shape = originalShapes[1]
@@ -813,11 +499,82 @@ def deCompress(code:str):
     y = y + 128
     cr = cr + 128
     cb = cb + 128
-    alpha = alpha + 128
+    if dctAlpha:
+        alpha = alpha + 128
+
+    return y, cr, cb, alpha
+
+# realiza o processo inverso da função anterior, desquantiza e ja aplica a transformada inversa, retornando ja os canais da imagem (alpha é None quando não foi codificado) prontos para continuar a descompressão
+# scale (1, 1/2, 1/4 ou 1/8) decodifica a imagem reduzida usando apenas os coeficientes de baixa frequencia de cada bloco, em 1/8 apenas o DC
+# pool (um CodecPool ou CodecThreads do codecpool) paraleliza as transformadas e, quando o codigo tem segmentos, a decodificação deles
+def deCompress(code:bytes, scale:float = 1, pool = None, stats:Stats = None):
+    return decodeChannels(code, scale, pool, stats)[:6]
+
+# deCompress retornando tambem o shape (altura, largura) da imagem na escala de decodificação, o valor a ser somado ao alpha (128 no alpha
+# da DCT quando ele não foi removido, 0 caso contrario) e se as chrominancias estão centradas nas celulas (ver CENTERED_CHROMA). Com
+# crop = False os canais saem como em reconstructChannels com crop = False
+def decodeChannels(code:bytes, scale:float = 1, pool = None, stats:Stats = None, crop:bool = True) -> tuple:
+
+    size = scaledBlockSize(scale)
+    stats = stats or Stats()
+
+    # criando o leitor de bits sobre o codigo comprimido
+    reader = BitReader(code)
+    with stats.stage('cabecalho'):
+        ssv, ssh, flags, shapes, huffman_codes, restart = decodeHeader(reader)
+    stats.count('tabela_huffman', len(huffman_codes))
+    stats.buffer('codigo', len(code))
+    # o alpha so faz parte dos blocos da DCT caso não tenha sido codificado sem perdas
+    losslessAlpha = (flags & ALPHA_PLANE) and (flags & ALPHA_LOSSLESS)
+    dctAlpha = (flags & ALPHA_PLANE) and not losslessAlpha
+    integer = bool(flags & INTEGER_TRANSFORM)
 
-    return y, cr, cb, alpha, ssv, ssh
+    originalShapes = shapes['original']
+    paddedShapes = shapes['padded']
+
+    # decoficicando todos os blocos e as tabelas de quantização faixa a faixa, são 2 tabelas antes da primeira faixa e cada faixa tem 1 ou 2 canais (Y e alpha)
+    # com o tamanho de Y e 2 com o tamanho das chrominancias. O alpha sem perdas é lido junto com as faixas
+    blockCounts = stripBlockCounts(paddedShapes, ssv, dctAlpha, 0, paddedShapes[1][0] // 8)
+    blockCounts[0] += 2
+    # sem pool os segmentos são lidos em sequencia, alinhando o reader no inicio de cada um
+    with stats.stage('huffman'):
+        if restart is not None and pool is not None and pool.workers > 1:
+            runs, sizes, values, blockEnds, alpha = pool.decodeSegments(reader.raw, huffman_codes, blockCounts, ssv, originalShapes[0] if losslessAlpha else None, restart)
+        else:
+            runs, sizes, values, blockEnds, alpha = decodeStrips(reader, huffman_codes, blockCounts, ssv, originalShapes[0] if losslessAlpha else None,
+                                                                 restartInterval=restart[0] if restart else 0)
+    stats.count('blocos', len(blockEnds) - 2)
+    stats.count('simbolos', len(runs) - int(blockEnds[1]))
+    stats.buffer('simbolos', [runs, sizes, values])
+    # reconstruindo as tabelas de quantização, neste ponto elas ja estão prontas para serem usadas na descompressão
+    qtEnd = blockEnds[1]
+    with stats.stage('rle'):
+        qtBlocks = rleDecodeArrays(runs[:qtEnd], values[:qtEnd], blockEnds[:2])
+        qty = zigzagReconstruct(qtBlocks[0])
+        qtc = zigzagReconstruct(qtBlocks[1])
+        # decodificando o RLE de todos os blocos de uma vez gerando os vetores zigzag, apenas com os coeficientes usados na escala de decodificação
+        zigZagBlocks = rleDecodeArrays(runs[qtEnd:], values[qtEnd:], blockEnds[2:] - qtEnd, zigzagPrefix(size), np.int16 if integer else np.int32)
+    stats.buffer('coeficientes', zigZagBlocks)
+
+    with stats.stage('transformada'):
+        y, cr, cb, dctAlphaPlane = reconstructChannels(zigZagBlocks, qty, qtc, originalShapes, paddedShapes, ssv, dctAlpha, size, pool, crop, integer)
+    stats.buffer('planos', [y, cr, cb, dctAlphaPlane])
+    if dctAlpha:
+        alpha = dctAlphaPlane
+    elif losslessAlpha:
+        alpha = downscalePlane(alpha, size)
+
+    shape = tuple(-(-n * size // 8) for n in originalShapes[0])
+    return y, cr, cb, alpha, ssv, ssh, shape, 128 if dctAlpha and not crop else 0, bool(flags & CENTERED_CHROMA)
     
-def encode(image, qty:np.ndarray = QTY, qtc:np.ndarray = QTC, ssv:int = 2, ssh:int = 2, factor:float = 1, outputname:str = 'compressed'):
+# aplica o fator de qualidade nas tabelas de quantização, os valores são limitados para que caibam nos 15 bits de tamanho dos simbolos RLE
+def scaleTables(qty:np.ndarray, qtc:np.ndarray, factor:float) -> tuple:
+    qty = np.clip(np.round(qty / factor), 1, MAX_VALUE)
+    qtc = np.clip(np.round(qtc / factor), 1, MAX_VALUE)
+    return qty, qtc
+
+def encode(image, qty:np.ndarray = QTY, qtc:np.ndarray = QTC, ssv:int = 2, ssh:int = 2, factor:float = 1, outputname:str = 'compressed', alphaMode:str = 'lossless', restartInterval:int = 0, regionIndex:int = 0,
+           pool = None, stats:Stats = None, downsampling:str = 'decimate', transform:str = 'float'):
 
     # verifica se a imagem fornecida foi um filepath ou uma imagem em array de numpy
     if isinstance(image, str):
@@ -825,53 +582,358 @@ def encode(image, qty:np.ndarray = QTY, qtc:np.ndarray = QTC, ssv:int = 2, ssh:i
         img = Image.open(image)
     else:
         img = image
-
-    print('Inciando compressão!')
-
-    # convertendo para o espaço de cor YCrCb
-    colorSpace = toYCrCb(img)
-
+    # o alpha so passa pela DCT com a tabela de luminancia no modo 'dct', no modo 'lossless' ele é codificado sem perdas apos os demais canais
+    validateOptions(alphaMode, transform)
+    # compressPlanes so calcula as metricas mais caras quando recebe um stats
+    collect = stats is not None
+    stats = stats or Stats()
+
+    # convertendo para o espaço de cor YCrCb, aplicando a sub amostragem e normalizando os canais de uma vez, direto nos planos com padding
+    # (mesmo resultado de toYCrCb, subSampling e padChannels, sem as copias intermediarias da imagem inteira)
     # constantes ssv, ssh de sub amostragem vertical e horizontal, não representão literalmente o 4:a:b
     # quanto maior o valor mais informação descartada e pior o resultado final
     # os valores equivalentes para 4:2:2 são ssv = 2, ssh = 1 e para 4:2:0 são ssv = 2 e ssh = 2
-    y, crSub, cbSub, alpha = subSampling(ssv,ssh,colorSpace)
+    # downsampling escolhe como as chrominancias são reduzidas: 'decimate' (padrão) mantem a primeira amostra de cada celula ssv x ssh e 'box'
+    # usa a media da celula, com melhor qualidade nas bordas coloridas principalmente junto com upsampling = 'bilinear' no decode
+    with stats.stage('cor+subamostragem+padding'):
+        pixels = np.asarray(img)
+        yPadding, crPadding, cbPadding, alphaPadding, alpha, originalShapes = encodePlanes(pixels, ssv, ssh, alphaMode == 'dct', downsampling)
+    stats.buffer('imagem', pixels)
+    pixels = None
 
     # fator de qualidade aplicado nas tabelas de quantização, quanto maior mais qualidade e quanto menor mais compressão
     # recomendo usar valores de 1 ate no maximo 100 (em 100 praticamente ja não a perdas)
-    qty = np.round(qty / factor)
-    qty[qty == 0] = 1
-    qtc = np.round(qtc / factor)
-    qtc[qtc == 0] = 1
-
-    # comprimindo a imagem realizando diretamente a DCT, quantização e codificação em ZIG ZAG, retorna a string codificada
-    encoded = compress(y, crSub, cbSub, alpha, qty, qtc, ssv, ssh)
+    qty, qtc = scaleTables(qty, qtc, factor)
+
+    # comprimindo a imagem realizando diretamente a DCT, quantização e codificação em ZIG ZAG, retorna o codigo em bytes
+    # alphaMode escolhe como o canal alpha é codificado: 'lossless' (sem perdas, padrão) ou 'dct' (com perdas, junto com a luminancia)
+    # restartInterval divide o codigo em segmentos de restartInterval faixas que podem ser decodificados em paralelo pelo codec_mt (0 desativa)
+    # regionIndex grava o indice usado por decodeRegion, com uma entrada a cada regionIndex colunas de blocos de cada linha (0 desativa)
+    # pool (por exemplo codecpool.CodecThreads()) paraleliza as transformadas
+    # stats (um stats.Stats) recebe as metricas de cada etapa, sem ele nada é coletado nem impresso
+    # transform escolhe a DCT: 'float' (padrão) ou 'integer', a DCT inteira em ponto fixo com os coeficientes em int16 e a decodificação
+    # exata, com o mesmo resultado em qualquer maquina
+    encoded = compressPlanes(yPadding, crPadding, cbPadding, alphaPadding, alpha, originalShapes, qty, qtc, ssv, ssh, restartInterval, regionIndex, pool,
+                             stats if collect else None, downsampling == 'box', transform == 'integer')
     # Escreve o arquivo comprimido
-    writeFile(encoded, outputname)
-
-    print('Compressão finalizada!')
+    with stats.stage('io'):
+        writeFile(encoded, outputname)
 
     return encoded
 
-def decode(filepath:str = 'compressed.gpeg', savePng:bool = False):
+# abre a origem de uma codificação em faixas: um array (HxWxC uint8, inclusive np.memmap), o caminho de um arquivo .npy (aberto com mmap)
+# ou uma imagem do PIL/caminho de imagem. Retorna o shape (altura, largura, canais) e uma função que le as linhas [start, end) como array uint8
+# so os arrays e os .npy são lidos sob demanda, o PIL carrega a imagem inteira em uint8 no primeiro acesso
+def openSource(source) -> tuple:
+    if isinstance(source, str) and source.endswith('.npy'):
+        source = np.load(source, mmap_mode='r')
+    if isinstance(source, np.ndarray):
+        return source.shape, lambda start, end: np.asarray(source[start:end])
+    img = Image.open(source) if isinstance(source, str) else source
+    return (img.height, img.width, len(img.getbands())), lambda start, end: np.asarray(img.crop((0, start, img.width, end)))
+
+# converte, subamostra, transforma e codifica em RLE as linhas de um conjunto de faixas completo (ou o final da imagem)
+# retorna os simbolos, os valores, o indice final de cada faixa nos simbolos e o alpha sem perdas das linhas (None quando não existe ou
+# passa pela DCT)
+def encodeChunk(rows:np.ndarray, qty:np.ndarray, qtc:np.ndarray, ssv:int, ssh:int, dctAlpha:bool, downsampling:str = 'decimate', integer:bool = False) -> tuple:
+    yPadding, crPadding, cbPadding, alphaPadding, alpha, _ = encodePlanes(rows, ssv, ssh, dctAlpha, downsampling)
+    planes = transformChannels(yPadding, crPadding, cbPadding, alphaPadding, qty, qtc, integer=integer)
+    return stripSymbols(planes, yPadding.shape, crPadding.shape, ssv) + (alpha,)
+
+# versão de encode com memoria limitada para imagens muito grandes: a imagem é lida em conjuntos de stripsPerChunk faixas de 8 * ssv linhas,
+# cada conjunto passa por todas as etapas da compressão e é escrito direto no arquivo. A tabela de huffman vem de uma primeira passada
+# que apenas conta os simbolos, então a origem é lida duas vezes (ver openSource). O arquivo gerado é identico ao de encode
+def encodeStream(source, qty:np.ndarray = QTY, qtc:np.ndarray = QTC, ssv:int = 2, ssh:int = 2, factor:float = 1, outputname:str = 'compressed', alphaMode:str = 'lossless', stripsPerChunk:int = 4, restartInterval:int = 0, regionIndex:int = 0,
+                 stats:Stats = None, downsampling:str = 'decimate', transform:str = 'float') -> int:
+    validateOptions(alphaMode, transform)
+    integer = transform == 'integer'
+    stats = stats or Stats()
+
+    shape, readRows = openSource(source)
+    height, width = shape[0], shape[1]
+    hasAlpha = shape[2] == 4
+    dctAlpha = hasAlpha and alphaMode == 'dct'
+    qty, qtc = scaleTables(qty, qtc, factor)
+
+    # shapes que compress calcularia com a imagem inteira
+    ceilBlock = lambda n: -(-n // 8) * 8
+    cShape = (-(-height // max(ssv, 1)), -(-width // max(ssh, 1)))
+    shapes = {
+        'original':[(height,width),cShape,cShape],
+        'padded':[(ceilBlock(height),ceilBlock(width)),(ceilBlock(cShape[0]),ceilBlock(cShape[1])),(ceilBlock(cShape[0]),ceilBlock(cShape[1]))]
+    }
+    chunkRows = stripHeight(ssv) * stripsPerChunk
+    qtSymbols, qtValues, _ = rleEncodeArrays(zigzagVector(np.stack([qty, qtc]).astype(np.int32)))
+
+    # primeira passada: contando os simbolos de todas as faixas para gerar a tabela de huffman
+    counts = symbolCounts(qtSymbols)
+    with stats.stage('contagem'):
+        for start in range(0, height, chunkRows):
+            counts += symbolCounts(encodeChunk(readRows(start, min(start + chunkRows, height)), qty, qtc, ssv, ssh, dctAlpha, downsampling, integer)[0])
+        huffman_codes = huffmanCodesFromCounts(counts)
+    stats.count('simbolos', int(counts.sum()) - len(qtSymbols))
+    stats.count('tabela_huffman', len(huffman_codes))
+
+    flags = headerFlags(hasAlpha, dctAlpha, restartInterval, regionIndex, downsampling == 'box', integer)
+    segments = -(-shapes['padded'][1][0] // 8 // restartInterval) if restartInterval else 0
+
+    # segunda passada: codificando e escrevendo cada conjunto de faixas, o comprimento do codigo no inicio do arquivo e as posições dos
+    # segmentos no cabeçalho são preenchidos no final
+    with open(outputname + '.gpeg', 'wb') as file:
+        file.write(bytes(4))
+        writer = BitWriter(file)
+        encodeHeader(writer, ssv, ssh, flags, shapes, huffman_codes, (restartInterval, [0] * segments))
+        stripsStart = len(writer) // 8
+        offsets, entries = [stripsStart], []
+        # as tabelas de quantização vem antes da primeira faixa
+        encodeStrips(qtSymbols, qtValues, np.array([len(qtSymbols)]), huffman_codes, None, ssv, writer)
+        for start in range(0, height, chunkRows):
+            end = min(start + chunkRows, height)
+            with stats.stage('transformada'):
+                symbols, values, symbolEnds, alpha = encodeChunk(readRows(start, end), qty, qtc, ssv, ssh, dctAlpha, downsampling, integer)
+            stats.buffer('simbolos', [symbols, values])
+            with stats.stage('huffman'):
+                chunkOffsets, blockBits, alphaBits = encodeStrips(symbols, values, symbolEnds, huffman_codes, alpha, ssv, writer,
+                                                                  restartInterval, start // stripHeight(ssv), regionIndex > 0)
+            offsets += chunkOffsets
+            if regionIndex:
+                # shapes com padding das linhas deste conjunto
+                yShape = (ceilBlock(end - start), shapes['padded'][0][1])
+                cShape = (ceilBlock(-(-(end - start) // max(ssv, 1))), shapes['padded'][1][1])
+                entries += regionEntries(blockBits, alphaBits, yShape, cShape, ssv, dctAlpha, regionIndex)
+        if regionIndex:
+            encodeRegionIndex(entries, regionIndex, writer)
+        length = writer.finish()
+        file.write(bytes(READ_PADDING))
+        file.seek(0)
+        file.write(length.to_bytes(4, byteorder='big'))
+        if restartInterval:
+            file.seek(4 + SEGMENT_TABLE_OFFSET)
+            file.write(b''.join((offset - stripsStart).to_bytes(4, byteorder='big') for offset in offsets))
+
+    stats.count('bits_original', height * width * shape[2] * 8)
+    stats.count('bits_codigo', length * 8)
+    stats.count('taxa_compressao', (1 - length / (height * width * shape[2])) * 100)
+
+    return length
+
+# scale decodifica uma versão reduzida da imagem (1/2, 1/4 ou 1/8), bem mais barata que reduzir a imagem inteira
+# pool (por exemplo codecpool.CodecThreads()) paraleliza as transformadas e a decodificação dos segmentos
+# stats (um stats.Stats) recebe as metricas de cada etapa, sem ele nada é coletado nem impresso
+# out é o array uint8 (altura, largura, canais) onde a imagem é escrita e retornada, pode ser reaproveitado entre imagens do mesmo tamanho
+# (ver imageShape), sem ele um novo array é criado
+# upsampling escolhe como as chrominancias são ampliadas: 'replicate' (padrão) repete cada amostra e 'bilinear' interpola as amostras vizinhas
+def decode(filepath:str = 'compressed.gpeg', savePng:bool = False, scale:float = 1, pool = None, stats:Stats = None, out:np.ndarray = None,
+           upsampling:str = 'replicate'):
+    stats = stats or Stats()
 
-    print('Iniciando descompressão!')
     try:
         # le o arquivo
-        encoded = readFile(filepath)
+        with stats.stage('io'):
+            encoded = readFile(filepath)
     except:
         encoded = filepath
 
-    # decodifica o arquivo e ja reconstroi as alterções gerados por quantização e DCT
-    y, cr, cb, alpha, ssv, ssh = deCompress(encoded)
-    # reconstruindo os canais que foram aplicados sub amostragem
-    decodedYCrCb = upSampling(y, cr, cb, alpha, ssv, ssh)
-
-    # voltando a imagem para o espaço de cor RGB com canal alpha
-    decoded = toRGB(decodedYCrCb)
-
-    print('Descompressão finalizada!')
+    # decodifica o arquivo e ja reconstroi as alterções gerados por quantização e DCT, mantendo o padding e a normalização dos canais
+    y, cr, cb, alpha, ssv, ssh, (height, width), alphaShift, centered = decodeChannels(encoded, scale, pool, stats, crop=False)
+    # reconstruindo os canais que foram aplicados sub amostragem e voltando para o espaço de cor RGB de uma vez, com canal alpha caso a
+    # imagem original tenha um (mesmo resultado de upSampling e toRGB)
+    with stats.stage('subamostragem+cor'):
+        decoded = decodePixels(y, cr, cb, alpha, ssv, ssh, height, width, out, alphaShift, upsampling=upsampling, centered=centered)
+    stats.buffer('imagem', decoded)
 
     if savePng:
         Image.fromarray(decoded).save('compressed.png')
 
     return decoded
+
+# abre um arquivo comprimido com mmap, sem carregar o codigo na memoria, e le o cabeçalho. Retorna o mmap, o reader posicionado no inicio
+# das tabelas de quantização e o cabeçalho como decodeHeader
+def openCompressed(filepath:str) -> tuple:
+    with open(filepath, 'rb') as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    # o arquivo ja termina com os bytes de folga, o codigo começa apos os 4 bytes do comprimento
+    reader = BitReader(mapped, 32, padded=True)
+    return (mapped, reader) + decodeHeader(reader)
+
+# retorna o shape da imagem decodificada (altura, largura, canais) na escala informada lendo apenas o cabeçalho do arquivo
+def imageShape(filepath:str, scale:float = 1) -> tuple:
+    size = scaledBlockSize(scale)
+    mapped, reader, ssv, ssh, flags, shapes, huffman_codes, restart = openCompressed(filepath)
+    # o mmap so pode ser fechado depois de liberar a visão usada pelo reader
+    reader = None
+    mapped.close()
+    return tuple(-(-n * size // 8) for n in shapes['original'][0]) + (4 if flags & ALPHA_PLANE else 3,)
+
+# versão de decode com memoria limitada para imagens muito grandes: o arquivo é lido com mmap e decodificado em conjuntos de stripsPerChunk
+# faixas, cada conjunto passa por todas as etapas da descompressão e suas linhas são emitidas como (linha inicial, linhas em RGB ou RGBA)
+# assim que ficam prontas. As linhas emitidas são identicas as linhas correspondentes de decode com a mesma escala e a ampliação das
+# chrominancias por repetição (upsampling = 'replicate'), a unica usada aqui
+# out (um array uint8 com o shape de imageShape, como em decode) recebe as linhas diretamente, e as linhas emitidas são visões dele
+def decodeStream(filepath:str = 'compressed.gpeg', stripsPerChunk:int = 4, scale:float = 1, out:np.ndarray = None):
+    size = scaledBlockSize(scale)
+    mapped, reader, ssv, ssh, flags, shapes, huffman_codes, restart = openCompressed(filepath)
+    losslessAlpha = (flags & ALPHA_PLANE) and (flags & ALPHA_LOSSLESS)
+    dctAlpha = (flags & ALPHA_PLANE) and not losslessAlpha
+    integer = bool(flags & INTEGER_TRANSFORM)
+    (height, width), cShape = shapes['original'][0], shapes['original'][1]
+    paddedShapes = shapes['padded']
+
+    try:
+        # as tabelas de quantização vem antes da primeira faixa, as tabelas de huffman são montadas uma unica vez
+        tables = buildDecodeTables(huffman_codes)
+        runs, sizes, values, blockEnds = huffmanDecodeArrays(reader, huffman_codes, 2, None, tables)
+        qtBlocks = rleDecodeArrays(runs, values, blockEnds)
+        qty = zigzagReconstruct(qtBlocks[0])
+        qtc = zigzagReconstruct(qtBlocks[1])
+
+        rows = stripHeight(ssv)
+        totalStrips = paddedShapes[1][0] // 8
+        for first in range(0, totalStrips, stripsPerChunk):
+            last = min(first + stripsPerChunk, totalStrips)
+            # linhas da imagem e das chrominancias cobertas por este conjunto de faixas
+            start, end = first * rows, min(last * rows, height)
+            cStart, cEnd = first * 8, min(last * 8, cShape[0])
+            originalShapes = [(end - start, width), (cEnd - cStart, cShape[1]), (cEnd - cStart, cShape[1])]
+            chunkShapes = [(-(-(end - start) // 8) * 8, paddedShapes[0][1]), ((last - first) * 8, paddedShapes[1][1]), ((last - first) * 8, paddedShapes[2][1])]
+
+            blockCounts = stripBlockCounts(paddedShapes, ssv, dctAlpha, first, last)
+            runs, sizes, values, blockEnds, alpha = decodeStrips(reader, huffman_codes, blockCounts, ssv, originalShapes[0] if losslessAlpha else None, tables=tables,
+                                                                 restartInterval=restart[0] if restart else 0, firstStrip=first)
+            zigZagBlocks = rleDecodeArrays(runs, values, blockEnds, zigzagPrefix(size), np.int16 if integer else np.int32)
+            y, cr, cb, dctAlphaPlane = reconstructChannels(zigZagBlocks, qty, qtc, originalShapes, chunkShapes, ssv, dctAlpha, size, crop=False, integer=integer)
+            if dctAlpha:
+                alpha = dctAlphaPlane
+            elif losslessAlpha:
+                alpha = downscalePlane(alpha, size)
+
+            # as faixas começam em linhas multiplas de 8, a linha inicial na escala é sempre inteira
+            first, count = start * size // 8, -(-(end - start) * size // 8)
+            rowsOut = None if out is None else out[first:first + count]
+            yield first, decodePixels(y, cr, cb, alpha, ssv, ssh, count, -(-width * size // 8), rowsOut, 128 if dctAlpha else 0)
+    finally:
+        reader = None
+        mapped.close()
+
+# decodifica o arquivo com decodeStream escrevendo as linhas direto em output, que pode ser um array (por exemplo um np.memmap) com o shape
+# de imageShape ou o caminho de um arquivo .npy, criado como memmap. Retorna o array com a imagem decodificada
+def decodeInto(filepath:str, output, stripsPerChunk:int = 4, scale:float = 1) -> np.ndarray:
+    if isinstance(output, str):
+        output = np.lib.format.open_memmap(output, mode='w+', dtype=np.uint8, shape=imageShape(filepath, scale))
+    # as linhas são escritas direto em output pelo decodeStream
+    for _ in decodeStream(filepath, stripsPerChunk, scale, output):
+        pass
+    if isinstance(output, np.memmap):
+        output.flush()
+    return output
+
+# decodifica apenas a região de w x h pixels a partir da coluna x e da linha y (limitada a imagem), retornando as linhas da região em RGB ou
+# RGBA identicas as da imagem de decode com o mesmo upsampling. Com o indice de regiões (ver encode) somente os blocos de Y e do alpha pela
+# DCT e os blocos subamostrados de Cr e Cb usados pela ampliação das chrominancias da região (com 'bilinear' tambem as amostras vizinhas)
+# são decodificados, o alpha sem perdas é decodificado na largura inteira das faixas da região. Sem o indice as faixas são decodificadas em
+# sequencia ate a ultima linha da região e, com 'bilinear', que decodeStream não usa, a imagem inteira é decodificada
+def decodeRegion(filepath:str, x:int, y:int, w:int, h:int, upsampling:str = 'replicate') -> np.ndarray:
+    mapped, reader, ssv, ssh, flags, shapes, huffman_codes, restart = openCompressed(filepath)
+    losslessAlpha = (flags & ALPHA_PLANE) and (flags & ALPHA_LOSSLESS)
+    dctAlpha = (flags & ALPHA_PLANE) and not losslessAlpha
+    integer = bool(flags & INTEGER_TRANSFORM)
+    height, width = shapes['original'][0]
+    yShape, cShape = shapes['padded'][0], shapes['padded'][1]
+    x0, y0, x1, y1 = max(x, 0), max(y, 0), min(x + w, width), min(y + h, height)
+    # eixos da ampliação das chrominancias da imagem inteira, apenas as linhas e colunas da região são usadas
+    try:
+        rowAxis, colAxis = chromaAxes(ssv, ssh, height, width, upsampling, bool(flags & CENTERED_CHROMA))
+    except ValueError:
+        reader = None
+        mapped.close()
+        raise
+
+    if x1 <= x0 or y1 <= y0 or not flags & REGION_INDEX:
+        reader = None
+        mapped.close()
+        if x1 <= x0 or y1 <= y0:
+            return np.zeros((max(y1 - y0, 0), max(x1 - x0, 0), 4 if flags & ALPHA_PLANE else 3), dtype=np.uint8)
+        if upsampling == 'bilinear':
+            return decode(filepath, upsampling=upsampling)[y0:y1, x0:x1]
+        result = []
+        for start, rows in decodeStream(filepath):
+            if start + len(rows) > y0:
+                result.append(rows[max(y0 - start, 0):y1 - start, x0:x1])
+            if start + len(rows) >= y1:
+                break
+        return np.concatenate(result)
+
+    lookup = None
+    try:
+        # as tabelas de quantização vem antes da primeira faixa
+        tables = buildDecodeTables(huffman_codes)
+        runs, sizes, values, blockEnds = huffmanDecodeArrays(reader, huffman_codes, 2, None, tables)
+        qtBlocks = rleDecodeArrays(runs, values, blockEnds)
+        qty = zigzagReconstruct(qtBlocks[0])
+        qtc = zigzagReconstruct(qtBlocks[1])
+
+        # o inicio do indice esta nos ultimos 4 bytes do codigo, que ocupa os bytes 4 ate 4 + length do arquivo
+        length = int.from_bytes(mapped[0:4], byteorder='big')
+        indexStart = int.from_bytes(mapped[length:length + 4], byteorder='big')
+        interval, stripRows, lookup = decodeRegionIndex(reader, 32, indexStart, yShape, cShape, ssv, dctAlpha, losslessAlpha)
+
+        # faixas e grupos de interval colunas de blocos de Y que cobrem a região e das chrominancias que cobrem as amostras usadas pela
+        # ampliação, cada faixa tem 8 linhas de chrominancia
+        ceilDiv = lambda n, d: -(-n // d)
+        rows = stripHeight(ssv)
+        cRows, cCols = (int(rowAxis[0][y0]), int(rowAxis[1][y1 - 1]) + 1), (int(colAxis[0][x0]), int(colAxis[1][x1 - 1]) + 1)
+        yCols, cColBlocks = yShape[1] // 8, cShape[1] // 8
+        yGroups, cGroups = ceilDiv(yCols, interval), ceilDiv(cColBlocks, interval)
+        s0, s1 = y0 // rows, ceilDiv(y1, rows)
+        cs0, cs1 = cRows[0] // 8, ceilDiv(cRows[1], 8)
+        yg0, yg1 = x0 // 8 // interval, ceilDiv(ceilDiv(x1, 8), interval)
+        cg0, cg1 = cCols[0] // 8 // interval, ceilDiv(ceilDiv(cCols[1], 8), interval)
+        yCount = min(yg1 * interval, yCols) - yg0 * interval
+        cCount = min(cg1 * interval, cColBlocks) - cg0 * interval
+
+        # decodifica count blocos a partir de cada posição, retornando os vetores zigzag (quantidade de posições, count, 64)
+        def decodeBlocks(positions:np.ndarray, count:int) -> np.ndarray:
+            vectors = []
+            for position in positions.tolist():
+                reader.pos = position
+                runs, sizes, values, blockEnds = huffmanDecodeArrays(reader, huffman_codes, count, None, tables)
+                vectors.append(rleDecodeArrays(runs, values, blockEnds, dtype=np.int16 if integer else np.int32))
+            return np.stack(vectors)
+
+        yBlocks, alphaBlocks, crBlocks, cbBlocks, alphaRows = [], [], [], [], []
+        for strip in range(min(s0, cs0), max(s1, cs1)):
+            stripY = int(stripRows[strip])
+            rowEntries = np.arange(stripY) * yGroups + yg0
+            cStart = stripY * (2 if dctAlpha else 1) * yGroups + cg0
+            if s0 <= strip < s1:
+                yBlocks.append(decodeBlocks(lookup(strip, rowEntries), yCount))
+                if dctAlpha:
+                    alphaBlocks.append(decodeBlocks(lookup(strip, rowEntries + stripY * yGroups), yCount))
+                if losslessAlpha:
+                    reader.pos = int(lookup(strip, [stripY * yGroups + 2 * cGroups])[0])
+                    alphaRows.append(decodeAlpha(reader, (min(rows, height - strip * rows), width))[:, x0:x1])
+            if cs0 <= strip < cs1:
+                crBlocks.append(decodeBlocks(lookup(strip, [cStart]), cCount))
+                cbBlocks.append(decodeBlocks(lookup(strip, [cStart + cGroups]), cCount))
+
+        # desquantizando e revertendo a transformada apenas dos blocos decodificados, sem desfazer a normalização como em decodeChannels
+        def reconstruct(blocks:list, qt:np.ndarray) -> np.ndarray:
+            blocks = np.concatenate(blocks)
+            shape = (blocks.shape[0] * 8, blocks.shape[1] * 8)
+            return inverseDCT(zigzagReconstruct(blocks.reshape(-1, 64)), qt, shape, integer)
+
+        # linhas e colunas da região nos planos de Y e do alpha decodificados e eixos da ampliação relativos as amostras decodificadas
+        lumaRows, lumaCols = slice(y0 - s0 * rows, y1 - s0 * rows), slice(x0 - yg0 * interval * 8, x1 - yg0 * interval * 8)
+        axes = (tuple(axis[y0:y1] - cs0 * 8 for axis in rowAxis[:2]) + (rowAxis[2][y0:y1],),
+                tuple(axis[x0:x1] - cg0 * interval * 8 for axis in colAxis[:2]) + (colAxis[2][x0:x1],))
+        alpha = None
+        if dctAlpha:
+            alpha = reconstruct(alphaBlocks, qty)[lumaRows, lumaCols]
+        if losslessAlpha:
+            alpha = np.concatenate(alphaRows)[lumaRows]
+        return decodePixels(reconstruct(yBlocks, qty)[lumaRows, lumaCols], reconstruct(crBlocks, qtc), reconstruct(cbBlocks, qtc), alpha, ssv, ssh,
+                            y1 - y0, x1 - x0, alphaShift=128 if dctAlpha else 0, axes=axes)
+    finally:
+        # o mmap so pode ser fechado depois de liberar as referencias ao reader
+        reader = lookup = None
+        mapped.close()
@@ -0,0 +1,166 @@
+import os
+import sys
+import json
+import time
+import importlib
+import tempfile
+import subprocess
+import multiprocessing as mp
+import numpy as np
+from PIL import Image
+import codec
+from bitstream import BitReader
+
+# front-end que escolhe automaticamente o caminho mais rapido para cada imagem: o codec.py, o codec_mt.py com processos ou o codec_mt.py
+# com threads. Os tres geram e leem exatamente os mesmos arquivos, então a escolha afeta apenas o tempo. Cada caminho tem um modelo linear
+# de custo (tempo = fixo + custo por amostra * pixels * canais) para codificar e decodificar, mais os custos de partida do codec_mt (importar
+# o modulo e carregar os kernels do numba, criar o pool) que só são somados enquanto eles ainda não aconteceram neste processo
+# os modelos vem de uma calibração feita uma unica vez (calibrate) e gravada em CALIBRATION_PATH, sem ela são usados os valores de DEFAULT_MODEL
+
+# arquivo com a calibração local, pode ser alterado pela variavel de ambiente GPEG_CALIBRATION
+CALIBRATION_PATH = os.environ.get('GPEG_CALIBRATION', os.path.join(os.path.expanduser('~'), '.cache', 'gpeg', 'calibration.json'))
+
+# caminhos disponiveis, como (modulo, backend do pool do codec_mt)
+PATHS = {'codec': ('codec', None), 'process': ('codec_mt', 'process'), 'thread': ('codec_mt', 'thread')}
+
+# modelo usado sem calibração, medido em uma maquina de 1 nucleo: [fixo (s), custo por amostra (s)] de cada operação e os custos de partida (s)
+DEFAULT_MODEL = {
+    'cpus': 1,
+    'paths': {
+        'codec': {'encode': [0.0, 3.3e-8], 'decode': [0.017, 4.5e-7]},
+        'process': {'encode': [0.0, 4.1e-8], 'decode': [0.0, 3.5e-8]},
+        'thread': {'encode': [0.0, 3.6e-8], 'decode': [0.0, 2.9e-8]},
+    },
+    'startup': {'import': 0.73, 'process': 0.024, 'thread': 0.0005},
+}
+
+# modelo carregado do arquivo de calibração, lido na primeira escolha
+model = None
+
+def loadModel() -> dict:
+    global model
+    if model is None:
+        try:
+            with open(CALIBRATION_PATH) as file:
+                model = json.load(file)
+        except (OSError, ValueError):
+            model = DEFAULT_MODEL
+    return model
+
+# estima o tempo de cada caminho para a operação ('encode' ou 'decode') de uma imagem com a quantidade de pixels e canais informada
+# e retorna o nome do caminho mais rapido. Com uma quantidade de nucleos diferente da calibração o custo por amostra do codec_mt é escalado
+def choosePath(operation:str, pixels:int, channels:int) -> str:
+    current = loadModel()
+    samples = pixels * channels
+    cpus = mp.cpu_count()
+    loaded = 'codec_mt' in sys.modules
+    pools = sys.modules['codecpool'].pools if 'codecpool' in sys.modules else {}
+    estimates = {}
+    for name, (module, backend) in PATHS.items():
+        fixed, perSample = current['paths'][name][operation]
+        if module == 'codec_mt':
+            perSample *= current['cpus'] / cpus
+            # custos de partida que ainda não foram pagos neste processo
+            if not loaded:
+                fixed += current['startup']['import']
+            if (backend, cpus) not in pools:
+                fixed += current['startup'][backend]
+        estimates[name] = fixed + perSample * samples
+    return min(estimates, key=estimates.get)
+
+# mesmos parametros de codec.encode, a imagem é codificada pelo caminho escolhido por choosePath
+def encode(image, qty:np.ndarray = codec.QTY, qtc:np.ndarray = codec.QTC, ssv:int = 2, ssh:int = 2, factor:float = 1, outputname:str = 'compressed', alphaMode:str = 'lossless',
+           restartInterval:int = 0, regionIndex:int = 0, downsampling:str = 'decimate', transform:str = 'float'):
+    if isinstance(image, str):
+        image = Image.open(image)
+    shape = np.shape(image)
+    name = choosePath('encode', shape[0] * shape[1], shape[2] if len(shape) > 2 else 1)
+    module, backend = PATHS[name]
+    if module == 'codec':
+        return codec.encode(image, qty, qtc, ssv, ssh, factor, outputname, alphaMode, restartInterval, regionIndex, downsampling=downsampling, transform=transform)
+    return importlib.import_module(module).encode(image, qty, qtc, ssv, ssh, factor, outputname, alphaMode, restartInterval, regionIndex, backend=backend,
+                                                  downsampling=downsampling, transform=transform)
+
+# mesmos parametros de codec.decode, o arquivo (ou o codigo em bytes) é decodificado pelo caminho escolhido por choosePath
+def decode(filepath:str = 'compressed.gpeg', savePng:bool = False, scale:float = 1, upsampling:str = 'replicate'):
+    if isinstance(filepath, str):
+        height, width, channels = codec.imageShape(filepath)
+    else:
+        # codigo ja em memoria, apenas o cabeçalho é lido
+        _, _, flags, shapes, _, _ = codec.decodeHeader(BitReader(filepath))
+        (height, width), channels = shapes['original'][0], 4 if flags & codec.ALPHA_PLANE else 3
+    # a decodificação reduzida só transforma parte dos coeficientes, mas a decodificação de huffman continua proporcional à imagem inteira
+    name = choosePath('decode', height * width, channels)
+    module, backend = PATHS[name]
+    if module == 'codec':
+        return codec.decode(filepath, savePng, scale, upsampling=upsampling)
+    return importlib.import_module(module).decode(filepath, savePng, scale=scale, backend=backend, upsampling=upsampling)
+
+# imagem sintetica usada na calibração: gradientes com ruido, com uma quantidade de simbolos parecida com a de fotos
+def calibrationImage(side:int) -> np.ndarray:
+    yy, xx = np.mgrid[0:side, 0:side]
+    image = np.stack([(xx + yy) % 256, (2 * yy) % 256, (xx * 3) % 256], axis=-1).astype(np.float32)
+    return np.clip(image + np.random.default_rng(side).normal(0, 8, image.shape), 0, 255).astype(np.uint8)
+
+# menor tempo de repeats execuções de function
+def bestTime(function, repeats:int) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+# mede cada caminho em imagens de lado sides e ajusta os modelos lineares por minimos quadrados, mede os custos de partida do codec_mt
+# (importação em um interpretador novo e criação de cada pool) e grava tudo em path. Deve ser executado uma vez em cada maquina
+def calibrate(sides:tuple = (64, 256, 768, 1536), repeats:int = 3, path:str = None) -> dict:
+    path = path or CALIBRATION_PATH
+    root = os.path.dirname(os.path.abspath(__file__))
+    # importação do codec_mt e carga dos kernels em um processo novo, com o cache do numba ja preenchido
+    command = [sys.executable, '-c', 'import time; start = time.perf_counter(); import codec_mt; print(time.perf_counter() - start)']
+    env = dict(os.environ, PYTHONPATH=root)
+    subprocess.run(command, env=env, cwd=root, capture_output=True, check=True)
+    startup = {'import': min(float(subprocess.run(command, env=env, cwd=root, capture_output=True, text=True, check=True).stdout) for _ in range(repeats))}
+
+    import codec_mt
+    from codecpool import CodecPool, CodecThreads
+    for backend, create in (('process', CodecPool), ('thread', CodecThreads)):
+        # criação de um pool novo mais a primeira tarefa, que inclui o tempo de partida dos processos
+        def startPool():
+            with create() as pool:
+                pool.transformPlanes([(np.zeros((8, 8), dtype=np.float32), codec_mt.QTY)])
+        startup[backend] = bestTime(startPool, repeats)
+
+    paths = {}
+    directory = tempfile.TemporaryDirectory()
+    target = os.path.join(directory.name, 'calibration')
+    for name, (module, backend) in PATHS.items():
+        if module == 'codec_mt':
+            codec_mt.warmup(backend=backend)
+        times = {'encode': [], 'decode': []}
+        for side in sides:
+            image = Image.fromarray(calibrationImage(side))
+            if module == 'codec':
+                times['encode'].append(bestTime(lambda: codec.encode(image, outputname=target), repeats))
+                times['decode'].append(bestTime(lambda: codec.decode(target + '.gpeg'), repeats))
+            else:
+                times['encode'].append(bestTime(lambda: codec_mt.encode(image, outputname=target, backend=backend), repeats))
+                times['decode'].append(bestTime(lambda: codec_mt.decode(target + '.gpeg', backend=backend), repeats))
+        samples = [side * side * 3 for side in sides]
+        # ajuste de tempo = fixo + custo * amostras, sem valores negativos
+        paths[name] = {operation: [max(float(fixed), 0.0), max(float(perSample), 0.0)] for operation, values in times.items()
+                       for perSample, fixed in [np.polyfit(samples, values, 1)]}
+
+    directory.cleanup()
+
+    calibration = {'cpus': mp.cpu_count(), 'paths': paths, 'startup': startup}
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as file:
+        json.dump(calibration, file, indent=2)
+    global model
+    model = calibration
+    return calibration
+
+if __name__ == '__main__':
+    # python codec_auto.py grava a calibração desta maquina
+    print(json.dumps(calibrate(), indent=2))
@@ -1,13 +1,18 @@
 import numpy as np
 from PIL import Image
-import cv2
-import heapq
-from collections import Counter
-import multiprocessing as mp
-from numba import jit
-
-# como os blocos de quantização tem tamanho fixo define-se uma constante com o tamanho do lado
-BLOCKSIZE = 8 
+from bitstream import READ_PADDING, BitWriter, BitReader
+from transform import BLOCKSIZE, zigzagVector, zigzagReconstruct, scaledBlockSize, zigzagPrefix, downscalePlane
+from strips import stripSymbols, codeBits, encodeStrips, decodeStrips, regionEntries, encodeRegionIndex
+import kernels
+from kernels import huffmanDecodeKernel, alphaDecodeKernel
+from codecpool import getPool
+from stats import Stats
+from color import encodePlanes, decodePixels
+from huffman import generateGlobalHuffmanTable, rleEncodeArrays, rleDecodeArrays
+# o cabeçalho e as suas flags, o padding de compress, a escala das tabelas de quantização, a validação das opções e a reconstrução dos
+# canais a partir dos vetores zigzag são definidos apenas no codec.py, os arquivos e as imagens dos dois codecs são identicos
+from codec import ALPHA_PLANE, ALPHA_LOSSLESS, RESTART_INTERVALS, REGION_INDEX, CENTERED_CHROMA, INTEGER_TRANSFORM, headerFlags, encodeHeader, decodeHeader, padChannels, scaleTables, validateOptions, \
+    stripBlockCounts, reconstructChannels
 
 QTY = np.array([[16, 11, 10, 16, 24, 40, 51, 61],  # Tabela de qunatização da luminancia
                 [12, 12, 14, 19, 26, 58, 60, 55],
@@ -27,17 +32,6 @@ QTC = np.array([[17, 18, 24, 47, 99, 99, 99, 99],  # Tabela de quantização das
                 [99, 99, 99, 99, 99, 99, 99, 99],
                 [99, 99, 99, 99, 99, 99, 99, 99]])
 
-# classes e funções relacionadas com a codificação de huffman
-class Node:
-    def __init__(self, symbol=None, frequency=None):
-        self.symbol = symbol
-        self.frequency = frequency
-        self.left = None
-        self.right = None
-    
-    def __lt__(self, other):
-        return self.frequency < other.frequency
-
 # função que converte uma imagem para o espaço de cor YCrCb retornando sempre a imgagem obtida em um array de numpy
 def toYCrCb(image) -> np.ndarray:
     # convertendo a imagem para um np array
@@ -108,718 +102,252 @@ def subSampling(a:int, b:int, image):
         alphaSub = alpha
         
     else:
-        # em caso da imagem não possuir canal alpha cria um canal alpha de mesmo tamanho dos canais crSub,cbSub preenchido com 255 para não modificar a imagem
-        alphaSub = np.full(shape=y.shape, fill_value=255, dtype=np.float32)
+        # em caso da imagem não possuir canal alpha nenhum plano é criado, assim ele não é codificado e a imagem decodificada volta em RGB
+        alphaSub = None
 
     return y, crSub, cbSub, alphaSub
 
 # função responsavel por ser o operação inversa a operação de sub sampling
 def upSampling(y:np.ndarray, crSub:np.ndarray, cbSub:np.ndarray, alphaSub:np.ndarray, a:int, b:int) -> np.ndarray: 
     
-    result = np.zeros((y.shape[0],y.shape[1],4), dtype=np.float32)
+    # a imagem so tem o quarto canal caso o alpha tenha sido codificado
+    result = np.zeros((y.shape[0],y.shape[1],3 if alphaSub is None else 4), dtype=np.float32)
     
     result[:,:,0] = y
     
-    # Reconstroi os canais cr e cb
-    result[:, :, 1] = np.repeat(np.repeat(crSub, a, axis=0), b, axis=1)
-    result[:, :, 2] = np.repeat(np.repeat(cbSub, a, axis=0), b, axis=1)   
+    # Reconstroi os canais cr e cb, recortando as linhas e colunas repetidas alem do tamanho de y quando ele não é multiplo dos fatores
+    result[:, :, 1] = np.repeat(np.repeat(crSub, a, axis=0), b, axis=1)[:y.shape[0], :y.shape[1]]
+    result[:, :, 2] = np.repeat(np.repeat(cbSub, a, axis=0), b, axis=1)[:y.shape[0], :y.shape[1]]
 
-    result[:,:,3] = alphaSub
+    if alphaSub is not None:
+        result[:,:,3] = alphaSub
     return result
 
-# função responsavel por gerar o vetor zigzag de um canal da imagem, o parametro desta função é um array bidmensional 
-# contendo apenas um canal da imagem como um todo
-@jit(nopython=True)
-def zigzagVector(channel:np.ndarray):
-    # cria o vetor zigzag com a quantidade correta de linhas
-    zigzag = np.zeros((channel.shape[0] * channel.shape[1]))
-    # define altura e largura maxima
-    h, w = channel.shape
-    # iniciando duas variaveis responsaveis por iterar no canal recebido
-    y, x  = 0, 0
-    # indicações de direção iniciais para o algoritmo iterar
-    right, left, up, down = True, False, False, False
-    # itera sobre o canal original em zigzag salvando os valores lidos
-    for i in range(zigzag.shape[0]):
-        # caso ele va apenas para a direita
-        if right == True and left == False and up == False and down == False:
-            # atribui o valor encontrado no passo da diagonal no array zigzag
-            zigzag[i] = channel[y,x]
-            # efetua o passo para direita
-            x += 1
-            # verifica se o array original ja chegou na ultima linha
-            if y+1 >= h:
-                # define que o proximo passo sera uma diagonal para cima e para direita
-                right, left, up, down = True, False, True, False
-            else:
-                # define que o proximo passo sera uma diagonal para baixo e para esquerda
-                right, left, up, down = False, True, False, True
-            continue
-        # caso ele va para uma diagonal para baixo e esquerda
-        if right == False and left == True and up == False and down == True:
-            # atribui o valor encontrado no passo da diagonal no array zigzag
-            zigzag[i] = channel[y,x]
-            # efetua o passo na diagonal para baixo e esquerda
-            x -= 1
-            y += 1
-            # verifica se o array original ja chegou na ultima linha
-            if y+1 >= h:
-                # define que o proximo passo sera para direita
-                right, left, up, down = True, False, False, False
-            # verifica se o array original ja voltou para a primeira coluna
-            elif x-1 < 0:
-                # define que o proximo passo sera para baixo
-                right, left, up, down = False, False, False, True
-            else:
-                # define que o proximo passo sera uma diagonal para baixo e para esquerda
-                right, left, up, down = False, True, False, True
-            continue
-        # caso ele va para baixo
-        if right == False and left == False and up == False and down == True:
-            # atribui o valor encontrado no passo da diagonal no array zigzag
-            zigzag[i] = channel[y,x]
-            # efetua o passo para baixo
-            y += 1
-            # verifica se o array original ja chegou na ultima coluna
-            if x+1 >= w:
-                # define que o proximo passo sera uma diagonal para baixo e para esquerda
-                right, left, up, down = False, True, False, True
-            else:
-                # define que o proximo passo sera uma diagonal para cima e para direita
-                right, left, up, down = True, False, True, False
-            continue
-        # caso ele va para uma diagonal para cima e direita
-        if right == True and left == False and up == True and down == False:
-            # atribui o valor encontrado no passo da diagonal no array zigzag
-            zigzag[i] = channel[y,x]
-            # efetua o passo na diagonal para cima e para direita
-            x += 1
-            y -= 1
-            # verifica se o array original ja chegou na ultima coluna
-            if x+1 >= w: 
-                # define que o proximo passo sera para baixo
-                right, left, up, down = False, False, False, True
-            # verifica se o array original ja voltou para a primeira linha
-            elif y-1 < 0:
-                # define que o proximo passo sera para direita
-                right, left, up, down = True, False, False, False
-            else:
-                # define que o proximo passo sera uma diagonal para cima e para direita
-                right, left, up, down = True, False, True, False
-            continue
-
-    return zigzag
-
-# função responsavel por reconstruir um canal da imagem a partir de um vetor zigzag, o parametro desta função é um array unidimensional 
-# contendo apenas o vetor zigzag do canal a ser reconstruido
-@jit(nopython=True)
-def zigzagReconstruct(zigzag:np.ndarray) -> np.ndarray:
-    # criando array para reconstruir um canal com base no vetor zigzag recebido
-    channel = np.zeros((8,8))
-    # define altura e largura maxima
-    h, w = channel.shape
-    # iniciando duas variaveis responsaveis por iterar no canal recebido
-    y, x  = 0, 0
-    # indicações de direção iniciais para o algoritmo iterar
-    right, left, up, down = True, False, False, False
-    # itera sobre o vetor zigzag reconstruindo o canal original
-    for i in range(zigzag.shape[0]):
-        # caso ele va apenas para a direita
-        if right == True and left == False and up == False and down == False:
-            # atribui o valor encontrado no passo da diagonal no array zigzag
-            channel[y,x] = zigzag[i] 
-            # efetua o passo para direita
-            x += 1
-            # verifica se o array original ja chegou na ultima linha
-            if y+1 >= h:
-                # define que o proximo passo sera uma diagonal para cima e para direita
-                right, left, up, down = True, False, True, False
-            else:
-                # define que o proximo passo sera uma diagonal para baixo e para esquerda
-                right, left, up, down = False, True, False, True
-            continue
-        # caso ele va para uma diagonal para baixo e esquerda
-        if right == False and left == True and up == False and down == True:
-            # atribui o valor encontrado no passo da diagonal no array zigzag
-            channel[y,x] = zigzag[i]
-            # efetua o passo na diagonal para baixo e esquerda
-            x -= 1
-            y += 1
-            # verifica se o array original ja chegou na ultima linha
-            if y+1 >= h:
-                # define que o proximo passo sera para direita
-                right, left, up, down = True, False, False, False
-            # verifica se o array original ja voltou para a primeira coluna
-            elif x-1 < 0:
-                # define que o proximo passo sera para baixo
-                right, left, up, down = False, False, False, True
-            else:
-                # define que o proximo passo sera uma diagonal para baixo e para esquerda
-                right, left, up, down = False, True, False, True
-            continue
-        # caso ele va para baixo
-        if right == False and left == False and up == False and down == True:
-            # atribui o valor encontrado no passo da diagonal no array zigzag
-            channel[y,x] = zigzag[i]
-            # efetua o passo para baixo
-            y += 1
-            # verifica se o array original ja chegou na ultima coluna
-            if x+1 >= w:
-                # define que o proximo passo sera uma diagonal para baixo e para esquerda
-                right, left, up, down = False, True, False, True
-            else:
-                # define que o proximo passo sera uma diagonal para cima e para direita
-                right, left, up, down = True, False, True, False
-            continue
-        # caso ele va para uma diagonal para cima e direita
-        if right == True and left == False and up == True and down == False:
-            # atribui o valor encontrado no passo da diagonal no array zigzag
-            channel[y,x] = zigzag[i]
-            # efetua o passo na diagonal para cima e para direita
-            x += 1
-            y -= 1
-            # verifica se o array original ja chegou na ultima coluna
-            if x+1 >= w: 
-                # define que o proximo passo sera para baixo
-                right, left, up, down = False, False, False, True
-            # verifica se o array original ja voltou para a primeira linha
-            elif y-1 < 0:
-                # define que o proximo passo sera para direita
-                right, left, up, down = True, False, False, False
-            else:
-                # define que o proximo passo sera uma diagonal para cima e para direita
-                right, left, up, down = True, False, True, False
-            continue
-
-    return channel
-
-@jit(nopython=True)
-def jpegRLEEncode(vector: np.ndarray) -> list:
-
-    # lista responsavel por armazenar a codificação RLE
-    encoded = []
-    # contador de zeros consecutivos
-    zero_count = 0
-
-    for i in range(vector.shape[0]):
-        value = vector[i]
-        if value == 0:
-            zero_count += 1
-        else:
-            # Quando encontra um valor não nulo, salva o par (run-length, tamanho do valor)
-            # calcula o tamanho em bits necessario para armazenar o valor não nulo encontrado
-            size = int(np.floor(np.log2(abs(value))) + 2)
-
-            encoded.append(zero_count)
-            encoded.append(size)
-            encoded.append(int(value))
-            # Reseta a contagem de zeros
-            zero_count = 0
-    
-    # Adiciona o símbolo EOB (End of Block) se o resto é zero
-    
-    # EOB para indicar o fim do bloco
-    encoded.append(0)  
-    encoded.append(0)
-
-    return encoded
-
-# a lista recebida deve ter o formato [qtd_zeros,bit_qtd,int]
-def jpegRLEDecode(encoded: list) -> list:
-
-    # lista responsavel por armazenar o codigo RLE decodificado
-    decoded = []
-
-    for i in range(0, len(encoded), 3):
-        zeros, size = encoded[i], encoded[i+1]
-        if size == 0 and zeros == 0:
-            # EOB encontrado, preenche o restante com zeros
-            while len(decoded) < 64:
-                decoded.append(0)
-            break
-        else:
-            # Preenche os zeros até o próximo valor
-            decoded.extend([0] * zeros)
-            # Adiciona o valor real
-            value = encoded[i + 2]
-            decoded.append(value)
-
-    return decoded
-
-# constroi a arvore de huffman, deve receber em chars uma lista com todos os simbolos gerados por RLE e uma lista com as respectivas frequencias de cada simbolo
-def buildHuffmanTree(chars, freq):
-    # criando uma lista de prioridades
-    priority = [Node(char, f) for char, f in zip(chars, freq)]
-    heapq.heapify(priority)
-
-    # construindo arvore de huffman
-    while len(priority) > 1:
-        left_child = heapq.heappop(priority)
-        right_child = heapq.heappop(priority)
-        merged_node = Node(frequency=left_child.frequency + right_child.frequency)
-        merged_node.left = left_child
-        merged_node.right = right_child
-        heapq.heappush(priority, merged_node)
-    
-    # retorna a raiz da arvore 
-    return priority[0]
-
-# gera os codigos de huffman para a arvore inserida e retorna o dicionario para symbolos e codigos
-def generateHuffmanCodes(node:Node, code='', huffman_codes={}):
-    if node is not None:
-        if node.symbol is not None:
-            huffman_codes[node.symbol] = code
-        generateHuffmanCodes(node.left, code + '0', huffman_codes)
-        generateHuffmanCodes(node.right, code + '1', huffman_codes)
-    
-    return huffman_codes
-
-# recebe uma lista contendo cada bloco codificado em RLE blocos esses tambem representados por uma lista
-def generateGlobalHuffmanTable(rle_blocks: list):
-    # coletando todos os simbolos de todos os blocos
-    all_symbols = []
-    for block in rle_blocks:
-        # itera sobre o bloco com passo 2 pois a cada 2 posições no array temops 
-        for i in range(0, len(block), 3):
-            symbol = f'{block[i]},{block[i+1]}'
-            #if isinstance(symbol, tuple):
-            all_symbols.append(str(symbol))
-            
-    # contabilizando frequencias e simbolos
-    frequencies = Counter(all_symbols)
-
-    # constroi a arvore de huffman e gera o dicionario com os codigos de huffman
-    root = buildHuffmanTree(list(frequencies.keys()), list(frequencies.values()))
-    huffman_codes = generateHuffmanCodes(root)
-
-    return root, huffman_codes
-
-# codifica os blocos usando a tabela de huffman e retorna uma string com caracteres apenas binario
-def huffmanEncode(block: list, huffman_codes: dict) -> str:
-
-    code = ''
-
-    for i in range(0, len(block), 3):
-        symbol = f'{block[i]},{block[i+1]}'
-        code += f'{huffman_codes[symbol]}'
-        if symbol != '0,0':
-            value = block[i + 2]
-            if value != 0:
-                if value > 0:
-                    code += format(value, f'0{block[i+1]}b')
-                else: 
-                    two_complement = (1 << block[i+1]) + value
-                    code += format(two_complement, f'0{block[i+1]}b') 
-
-
-    return code
-
-# decodifica os blocos codificados em huffman deve receber uma string com caracteres apenas binarios e retorna uma lista com todos os blocos decodificados
-# e as tabelas de quantização QTY e QTC
-def huffmanDecode(code:str, huffman_codes: dict) -> tuple:
-    # invertendo as chaves com os valores do dicionario de huffman
-    huffman_inverted = {code: symbol for symbol, code in huffman_codes.items()}
-    # indice para percorrer o codigo
-    i = 0
-    # buffer para leitura de bits no codigo
-    buffer = ''
-    # listas para a reconstrução da tabela de 
-    qty, qtc = [], []
-    # listas para reconstruir o codigo RLE original
-    decoded = []
-    block = []
-    # conta quantos blocos ja foram decodificados
-    decoded_blocks = 0
-
-    while i < len(code):
-        buffer += code[i]
-        if buffer in huffman_inverted:
-            # reconstruindo uma das tuplas do codigo original
-            symbol = huffman_inverted[buffer]
-            numbers = np.array(symbol.split(',')).astype(int)
-            block.append(int(numbers[0]))
-            block.append(int(numbers[1]))
-            # identifica se chegou ao fim do bloco
-            if symbol == '0,0':
-                if decoded_blocks == 0:
-                    qty.append(block)
-                elif decoded_blocks == 1:
-                    qtc.append(block)
-                else:
-                    decoded.append(block)
-                buffer = ''
-                block = []
-                i += 1 + numbers[1]
-                decoded_blocks += 1
-                continue
-
-            # recortando os bits do inteiro não nulo com base no tamanho indicado na tupla acima
-            num = code[i+1:(i + 1) + numbers[1]]
-            # convertendo de binario para inteiro (considerando complemento de 2 para numeros negativos)
-            # caso o numero seja negativo
-            if num[0] == '1':
-                # quantidade de bits 
-                bits = len(num)
-                # convertendo para inteiro
-                num = int(num, 2)
-                # ajustando complemento de 2
-                num = num - (1 << bits)
-            else:
-                # se for positivo apenas converte para inteiro 
-                num = int(num, 2)
-
-            # salva o valor não nulo no bloco reconstruido
-            block.append(num)
-            # limpando buffer de bits
-            buffer = ''
-            i += 1 + numbers[1]
-        else:
-            i += 1
-
-    return decoded, qty[0], qtc[0]
-
-# funções responsaveis por codificar a tabela de huffman de modo que possa ser decodificada antes de decodificar os blocos no codigo final
-def encodeHuffmanTable(huffman_table: dict) -> str:
-    encoded = ''
-    for symbol, code in huffman_table.items():
-        # Converte o símbolo (tupla) em uma string e depois para bytes
-        symbol_str = str(symbol)  # Converte a tupla em string
-        # Armazena o tamanho do símbolo como binário 
-        symbol_length = len(symbol_str)
-        symbol_length_binary = format(symbol_length, '016b')
-        # Converte cada caractere da string do símbolo para binário (8 bits por caractere)
-        symbol_binary = ''.join(format(ord(char), '08b') for char in symbol_str)
-        # Armazena o comprimento do código de Huffman em 8 bits
-        code_length = len(code)
-        code_length_binary = format(code_length, '08b')
-        # Concatena símbolo, comprimento do código e o código
-        encoded += symbol_length_binary + symbol_binary + code_length_binary + code
-    # Adiciona o marcador de fim da tabela
-    end_marker = "1111111111111111"  # 16 bits de 1
-    encoded += end_marker
-    return encoded
-
-def decodeHuffmanTable(encoded: str) -> tuple:
-    # marcador de final de tabela 16bits de 1
-    end_marker = "1111111111111111"
-    huffman_table = {}
-    offset = 0
-    while offset < len(encoded):
-        # Verifica se encontrou o marcador de fim
-        if encoded[offset:offset + 16] == end_marker:
-            offset += 16
-            break  # Fim da decodificação dos dados
-        # Lê o comprimento do símbolo (16 bits)
-        symbol_length_binary = encoded[offset:offset + 16]
-        symbol_length = int(symbol_length_binary, 2)
-        offset += 16
-        # Lê o símbolo em formato binário
-        symbol_binary = encoded[offset:offset + (symbol_length * 8)]
-        symbol_str = ''.join(chr(int(symbol_binary[i:i + 8], 2)) for i in range(0, len(symbol_binary), 8))
-        offset += symbol_length * 8
-        # Lê o comprimento do código (8 bits)
-        code_length_binary = encoded[offset:offset + 8]
-        code_length = int(code_length_binary, 2)
-        offset += 8
-        # Lê o código de Huffman
-        code = encoded[offset:offset + code_length]
-        offset += code_length
-        huffman_table[symbol_str] = code
-
-    return huffman_table, encoded[offset:]
-
-# funções responsaveis por codificar o dicionario que contem os shapes originais da imagem e o shape depois do padding
-# esta codificação é ligeiramente parecida com a codificação usada para codificar a tabela de huffman
-def encodeShapes(shapes: dict) -> str:
-    encoded = ''
-    for key, value in shapes.items():
-        # Serializa a chave do dicionário
-        key_length = len(key)
-        key_length_binary = format(key_length, '016b')  # 16 bits para o comprimento da chave
-        key_binary = ''.join(format(ord(char), '08b') for char in key)  # Cada caractere em 8 bits
-        encoded += key_length_binary + key_binary
-        
-        # Serializa a lista de tuplas
-        list_length = len(value)
-        list_length_binary = format(list_length, '08b')  # 8 bits para o comprimento da lista
-        encoded += list_length_binary
-        for tup in value:
-            # Cada elemento da tupla (dois inteiros) em 32 bits
-            for num in tup:
-                encoded += format(num, '032b')  # Inteiros em 32 bits
-
-    # Adiciona o marcador de fim da seção
-    end_marker = "1111111111111111"  # 16 bits de 1
-    encoded += end_marker
-    return encoded
-
-def decodeShapes(encoded: str) -> tuple:
-    # marcador de final de tabela 16bits de 1
-    end_marker = "1111111111111111"
-    decoded = {}
-    offset = 0
-    while offset < len(encoded):
-        # Verifica se encontrou o marcador de fim
-        if encoded[offset:offset + 16] == end_marker:
-            offset += 16
-            break  # Fim da decodificação dos dados
-        # Lê o comprimento da chave
-        key_length_binary = encoded[offset:offset + 16]
-        key_length = int(key_length_binary, 2)
-        offset += 16
-        # Lê a chave
-        key_binary = encoded[offset:offset + (key_length * 8)]
-        # reconstruindo a chave
-        key = ''.join(chr(int(key_binary[i:i + 8], 2)) for i in range(0, len(key_binary), 8))
-        offset += key_length * 8
-        
-        # Lê o comprimento da lista
-        list_length_binary = encoded[offset:offset + 8]
-        list_length = int(list_length_binary, 2)
-        offset += 8
-        # Lê os elementos da lista (tuplas)
-        value = []
-        for _ in range(list_length):
-            tup = []
-            for _ in range(2):  # Cada tupla tem 2 inteiros
-                num_binary = encoded[offset:offset + 32]
-                num = int(num_binary, 2)
-                tup.append(num)
-                offset += 32
-            value.append(tuple(tup))
-        decoded[key] = value
-    return decoded, encoded[offset:]
+# decodifica as faixas de toda a imagem a partir da posição atual do reader, retornando o mesmo que decodeStrips. Com restart (intervalo e
+# posições dos segmentos lidos do cabeçalho) e um pool com mais de um processo ou thread os segmentos são decodificados em paralelo,
+# caso contrario em sequencia
+def decodeEntropy(reader: BitReader, huffman_codes:dict, blockCounts:np.ndarray, ssv:int, alphaShape:tuple, restart:tuple, pool) -> tuple:
+    if restart is None or pool.workers == 1:
+        return decodeStrips(reader, huffman_codes, blockCounts, ssv, alphaShape, huffmanDecodeKernel, alphaDecodeKernel,
+                            restartInterval=restart[0] if restart else 0)
+    return pool.decodeSegments(reader.raw, huffman_codes, blockCounts, ssv, alphaShape, restart)
 
 # função responsavel por escrever o arquivo com o codigo da imagem comprimida
-def writeFile(code:str, filename:str = 'compressed'):
+def writeFile(code:bytes, filename:str = 'compressed'):
     # ajustando extensão de arquivo
     filename = filename + '.gpeg'
-    
-    # salva o comprimento original da string de bits
-    original_length = len(code)
-
-    # verificando se a string é um multiplo de 8 ja que o arquivo sera gravado em bytes não em bits
-    if original_length % 8 != 0:
-        # adiciona um padding de 0s a direita para poder salvar em bytes
-        padded_code = code.ljust((original_length + 7) // 8 * 8, '0')
-    else:
-        padded_code = code
-
-    # converte a string em bytes
-    code_bytes = int(padded_code, 2).to_bytes(len(padded_code) // 8, byteorder='big')
 
     # escreve o arquivo
     with open(filename, 'wb') as file:
-        # salvando o comprimento original no inicio com 4 bytes (permite um arquivo de ate 4gb)
-        file.write(original_length.to_bytes(4, byteorder='big'))
+        # salvando o comprimento do codigo em bytes no inicio com 4 bytes (permite um arquivo de ate 4gb)
+        file.write(len(code).to_bytes(4, byteorder='big'))
         # salvando restante dos dados
-        file.write(code_bytes)
+        file.write(code)
+        # bytes de folga para que o arquivo possa ser decodificado direto do disco
+        file.write(bytes(READ_PADDING))
+
+def readFile(filepath:str) -> bytes:
 
-def readFile(filepath:str) -> str:
-    
     # abre o arquivo
     with open(filepath, 'rb') as file:
-        # le os 4 bytes que representam o tamanho original da string
-        orignal_length = int.from_bytes(file.read(4), byteorder='big')
+        # le os 4 bytes que representam o tamanho do codigo
+        length = int.from_bytes(file.read(4), byteorder='big')
         # le o restante do arquivo
-        read_bytes = file.read()
-
-    # convertendo os bytes para bits novamente
-    padded_code = ''.join(f'{byte:08b}' for byte in read_bytes)
-
-    # retorna apenas a parte sem o padding se ele tiver sido necessario na escrita
-    return padded_code[:orignal_length]
-
-def compressChannel(channel:np.ndarray, qt:np.ndarray) -> list:
-    # separando em blocos
-    blocks = channel.reshape(channel.shape[0] // BLOCKSIZE, BLOCKSIZE, channel.shape[1] // BLOCKSIZE, BLOCKSIZE).transpose(0, 2, 1, 3).reshape(-1, BLOCKSIZE, BLOCKSIZE)
-    # aplicando transformada do cosseno
-    blocks = np.array([cv2.dct(block) for block in blocks])
-    # aplicando quantização nos blocos
-    blocks = np.array(np.round(blocks / qt))
-    # varre o bloco em zig-zag
-    blocks = [zigzagVector(block) for block in blocks]
-    # codifica o codigo em RLE
-    blocks = [jpegRLEEncode(block) for block in blocks]
-
-    return blocks
-
-def deCompressChannel(channel:np.ndarray, qt:np.ndarray, paddedShapes:tuple) -> np.ndarray:
+        code = file.read(length)
 
-    # definindo quantidade de blocos na horizontal e vertical para luminancia e chrominancia
-    jBlocks = int(paddedShapes[1] / BLOCKSIZE) # quantidade de blocos na horizontal
-    iBlocks = int(paddedShapes[0] / BLOCKSIZE) # quantidade de blocos na vertical
-
-    # desquantizando blocos e separando canais
-    blocks = np.array([channel[block] * qt for block in range(jBlocks * iBlocks)])
-    
-    blocks = np.array([cv2.idct(block) for block in blocks])
-
-    # reorganizando lista de blocos para a matriz imagem 
-    blocks = blocks.reshape(paddedShapes[0] // BLOCKSIZE, paddedShapes[1] // BLOCKSIZE, BLOCKSIZE, BLOCKSIZE).transpose(0, 2, 1, 3).reshape(paddedShapes)
-    
-    return blocks
+    return code
 
 # realiza as transformadas nos canais da imagem e ja aplica a quantização
-def compress(y:np.ndarray, cr:np.ndarray, cb:np.ndarray, alpha:np.ndarray, qty:np.ndarray, qtc:np.ndarray, ssv:int, ssh:int):
-
-    # normaliza os canais subtraindo 128 de todos eles
-    y = y - 128
-    alpha = alpha - 128
-    cr = cr - 128
-    cb = cb - 128
-
-    # lista contendo todos os blocos codificados em RLE
-    all_blocks = []
-
-    # codificando as tabelizas de quantização em RLE para que possam ser posteriormente codificadas em huffman
-    qtyRle = jpegRLEEncode(zigzagVector(qty))
-    qtcRle = jpegRLEEncode(zigzagVector(qtc))
-    all_blocks.append(qtyRle)
-    all_blocks.append(qtcRle)
-    
-    # verifica se o tamanho de y pode ser dividido igualmente em blocos de 8 por 8 pixel, caso não seja ajusta o shape de y adicionando linhas e colunas de 0
-    yWidth, yHeight = int(np.ceil(y.shape[1] / BLOCKSIZE) * BLOCKSIZE), int(np.ceil(y.shape[0] / BLOCKSIZE) * BLOCKSIZE)
-    if y.shape[1] % BLOCKSIZE == 0 and y.shape[0] % BLOCKSIZE == 0:
-        yPadding = y.copy()
-        alphaPadding = alpha.copy()
-    else:
-        yPadding = np.zeros((yHeight,yWidth))
-        alphaPadding = np.zeros((yHeight,yWidth))
-        yPadding[0:y.shape[0],0:y.shape[1]] += y
-        alphaPadding[0:alpha.shape[0],0:alpha.shape[1]] += alpha
-
-    crWidth, crHeight = int(np.ceil(cr.shape[1] / BLOCKSIZE) * BLOCKSIZE), int(np.ceil(cr.shape[0] / BLOCKSIZE) * BLOCKSIZE)
-    # como os canais Cr e Cb tem sempre o mesmo tamanho os dois são ajustados dentro do mesmo if
-    if cr.shape[1] % BLOCKSIZE == 0 and cr.shape[0] % BLOCKSIZE == 0:
-        crPadding = cr.copy()
-        cbPadding = cb.copy()
-    else:
-        crPadding = np.zeros((crHeight,crWidth))
-        cbPadding = np.zeros((crHeight,crWidth))
-        crPadding[0:cr.shape[0],0:cr.shape[1]] += cr
-        cbPadding[0:cb.shape[0],0:cb.shape[1]] += cb
-
-    with mp.Pool(processes=mp.cpu_count()) as pool:
-        args = [(yPadding,qty), (alphaPadding,qty), (crPadding,qtc), (cbPadding,qtc)]
-        results = pool.starmap(compressChannel, args)
-
-    for result in results:
-        all_blocks.extend(result)
+# restartInterval divide o codigo em segmentos de restartInterval faixas que podem ser decodificados em paralelo (0 desativa)
+# regionIndex grava no final do codigo o indice de regiões com uma entrada a cada regionIndex colunas de blocos (0 desativa)
+# backend escolhe entre processos ('process') e threads ('thread') para as transformadas, usando o pool persistente compartilhado do backend
+# (ver codecpool.getPool), ou pool informa diretamente um CodecPool ou CodecThreads
+# stats (um stats.Stats) recebe o tempo de cada etapa, as contagens de blocos e simbolos, os bits de cada canal e o tamanho dos buffers
+# transform escolhe a DCT: 'float' (padrão, em float32) ou 'integer' (inteira em ponto fixo, com os coeficientes em int16 e a
+# decodificação exata em qualquer maquina)
+def compress(y:np.ndarray, cr:np.ndarray, cb:np.ndarray, alpha:np.ndarray, qty:np.ndarray, qtc:np.ndarray, ssv:int, ssh:int, alphaMode:str = 'lossless',
+             restartInterval:int = 0, regionIndex:int = 0, pool = None, backend:str = 'process', stats:Stats = None, transform:str = 'float'):
+
+    # o alpha so passa pela DCT com a tabela de luminancia no modo 'dct', no modo 'lossless' ele é codificado sem perdas apos os demais canais
+    validateOptions(alphaMode, transform)
+    dctAlpha = alpha is not None and alphaMode == 'dct'
+    # sem stats as metricas são descartadas e as mais caras (bits de cada canal) não são calculadas
+    collect = stats is not None
+    stats = stats or Stats()
+
+    # normaliza os canais e ajusta os shapes para que possam ser divididos em blocos 8x8, o alpha so é considerado quando passar pela DCT
+    with stats.stage('padding'):
+        yPadding, crPadding, cbPadding, alphaPadding = padChannels(y, cr, cb, alpha if dctAlpha else None)
+
+    return compressPlanes(yPadding, crPadding, cbPadding, alphaPadding, None if dctAlpha else alpha, [y.shape,cr.shape,cb.shape],
+                          qty, qtc, ssv, ssh, restartInterval, regionIndex, pool, backend, stats if collect else None, integer=transform == 'integer')
+
+# continuação de compress a partir dos planos ja normalizados e com padding (ver color.encodePlanes): alphaPadding é o alpha que passa pela
+# DCT e alpha o alpha sem perdas (no maximo um dos dois é informado), originalShapes os shapes de Y, Cr e Cb antes do padding
+# centered indica que as chrominancias foram reduzidas com downsampling = 'box' (ver CENTERED_CHROMA) e integer que a transformada inteira
+# é usada (ver INTEGER_TRANSFORM)
+def compressPlanes(yPadding:np.ndarray, crPadding:np.ndarray, cbPadding:np.ndarray, alphaPadding:np.ndarray, alpha:np.ndarray, originalShapes:list,
+                   qty:np.ndarray, qtc:np.ndarray, ssv:int, ssh:int, restartInterval:int = 0, regionIndex:int = 0, pool = None, backend:str = 'process',
+                   stats:Stats = None, centered:bool = False, integer:bool = False):
+    dctAlpha = alphaPadding is not None
+    collect = stats is not None
+    stats = stats or Stats()
+    stats.buffer('planos', [yPadding, crPadding, cbPadding, alphaPadding])
+
+    # codificando as tabelas de quantização em RLE para que possam ser posteriormente codificadas em huffman
+    qtSymbols, qtValues, _ = rleEncodeArrays(zigzagVector(np.stack([qty, qtc]).astype(np.int32)))
+
+    # cada processo ou thread transforma algumas faixas de linhas de blocos, com processos os planos e os coeficientes passam pela memoria compartilhada
+    pool = pool or getPool(backend=backend)
+    args = [(yPadding,qty), (crPadding,qtc), (cbPadding,qtc)]
+    if dctAlpha:
+        args.insert(1, (alphaPadding,qty))
+    with stats.stage('transformada'):
+        results = pool.transformPlanes(args, integer)
+    stats.buffer('coeficientes', results)
+    stats.count('blocos', sum(len(plane) for plane in results))
+
+    # codifica em RLE os blocos de todos os canais de uma vez na ordem das faixas do arquivo e concatena com as tabelas
+    with stats.stage('rle'):
+        symbols, values, symbolEnds = stripSymbols(results, yPadding.shape, crPadding.shape, ssv)
+    results = None
+    stats.count('simbolos', len(symbols))
+    stats.buffer('simbolos', [symbols, values])
+    imageSymbols = symbols
+    symbols = np.concatenate([qtSymbols, symbols])
+    values = np.concatenate([qtValues, values])
+    # as tabelas fazem parte da primeira faixa
+    symbolEnds += len(qtSymbols)
 
     # salva os shapes originais dos canais para serem restaurados posteriormente na decodificação da imagem
-    originalShapes = [y.shape,cr.shape,cb.shape,alpha.shape]
-    paddedShapes = [(yHeight,yWidth),(crHeight,crWidth),(crHeight,crWidth)]
+    paddedShapes = [yPadding.shape,crPadding.shape,cbPadding.shape]
 
     shapes = {
         'original':originalShapes,
         'padded':paddedShapes
     }
     
-    # gerando arvore e tabela de huffman considerando todos os blocos codificados em RLE para garantir mair eficiencia na codificação de huffman
-    root, huffman_codes = generateGlobalHuffmanTable(all_blocks)
+    # gerando a tabela de huffman considerando todos os simbolos RLE para garantir mair eficiencia na codificação de huffman
+    with stats.stage('tabela_huffman'):
+        huffman_codes = generateGlobalHuffmanTable(symbols)
+    stats.count('tabela_huffman', len(huffman_codes))
 
     # codificando toda a imagem, passando primeiro os parametros ssv e ssh codificados em binario, depois os shapes codificados, apos eles a tabela de huffman,
-    # as tabelas de quantização e finalmente os blocos dos canais y, Cr, Cb e alpha codificados em huffman
-    encoded = format(ssv,'08b') 
-    encoded += format(ssh,'08b') 
-    encoded += encodeShapes(shapes)
-    encoded += encodeHuffmanTable(huffman_codes) 
-
-    with mp.Pool(processes=mp.cpu_count()) as pool:
-        args = list(zip(all_blocks, [huffman_codes] * len(all_blocks)))
-        results = pool.starmap(huffmanEncode, args)
+    # as tabelas de quantização e finalmente as faixas com os blocos dos canais y, alpha (quando presente), Cr e Cb codificados em huffman
+    # todos os simbolos são empacotados de uma vez pelo kernel vetorizado, sem precisar dividir o trabalho entre processos
+    # as faixas são codificadas primeiro pois as posições dos segmentos fazem parte do cabeçalho
+    # o alpha sem perdas é escrito faixa a faixa logo apos os blocos de cada faixa
+    strips = BitWriter()
+    with stats.stage('huffman'):
+        offsets, blockBits, alphaBits = encodeStrips(symbols, values, symbolEnds, huffman_codes, alpha, ssv, strips, restartInterval,
+                                                     positions=regionIndex > 0)
+    offsets = [0] + offsets
+
+    writer = BitWriter()
+    with stats.stage('cabecalho'):
+        # flags com os planos opcionais presentes no arquivo e o modo de codificação do alpha, seguidas do intervalo e das posições dos
+        # segmentos a partir do fim do cabeçalho, dos shapes e da tabela de huffman
+        flags = headerFlags(dctAlpha or alpha is not None, dctAlpha, restartInterval, regionIndex, centered, integer)
+        encodeHeader(writer, ssv, ssh, flags, shapes, huffman_codes, (restartInterval, offsets))
+    headerBits = len(writer)
+    writer.writeBytes(strips.getBytes(), len(strips))
+    if regionIndex:
+        # as posições são relativas ao inicio das faixas, os dois primeiros blocos são as tabelas de quantização
+        with stats.stage('indice'):
+            entries = regionEntries(blockBits[2:] + headerBits, None if alphaBits is None else alphaBits + headerBits, yPadding.shape, crPadding.shape, ssv, dctAlpha, regionIndex)
+            encodeRegionIndex(entries, regionIndex, writer)
+    encoded = writer.getBytes()
+    stats.buffer('codigo', len(encoded))
     
-    encoded += ''.join(results)
-    
-    # calculando tamanho necessario em bits para armzaenar a imagem orinal
-    img_length = originalShapes[0][0] * originalShapes[0][1] * 4 * 8
-    # tamanho em bits do codigo gerado pela compressão
-    compressed_length = len(encoded)
-    # calculando taxa de compressão
-    compression_ratio = (1 - (compressed_length / img_length)) * 100
-    print(f'Tamanho em bits da imagem original: {img_length} bits')
-    print(f'Tamanho do codigo da imagem apos compressão: {compressed_length} bits')
-    print(f'Taxa de compressão estimada: {format(compression_ratio, '.2f')}%')
+    # tamanho necessario em bits para armazenar a imagem original, tamanho do codigo gerado e taxa de compressão
+    img_length = originalShapes[0][0] * originalShapes[0][1] * (4 if dctAlpha or alpha is not None else 3) * 8
+    stats.count('bits_original', img_length)
+    stats.count('bits_codigo', len(writer))
+    stats.count('taxa_compressao', (1 - (len(writer) / img_length)) * 100)
+    if collect:
+        stats.count('bits', codeBits(imageSymbols, qtSymbols, huffman_codes, yPadding.shape, crPadding.shape, ssv, dctAlpha, alpha is not None,
+                                     headerBits, len(strips), len(writer)))
 
     return encoded
 
-# realiza o processo inverso da função anterior, desquantiza e ja aplica a transformada inversa, retornando ja os 4 canais da imagem prontos para continuar a descompressão
-def deCompress(code:str):
-
-    # decodificando parametros usados na sub amostragem
-    ssv = int(code[:8], 2)
-    ssh = int(code[8:16], 2)
-
-    # removendo parte do codigo referente as constantes de sub amostragem
-    code = code[16:]
-    # decodificando os shapes da imagem
-    shapes, encoded_blocks = decodeShapes(code)
-    # decodificando tabela de huffman
-    huffman_codes, encoded_blocks = decodeHuffmanTable(encoded_blocks)
-    # decoficicando todos os blocos e as tabelas de quantização para o codigo RLE
-    rle_blocks, qty, qtc = huffmanDecode(encoded_blocks, huffman_codes)
-    # decodificando o RLE das tabelas de quantização neste ponto elas ja estão prontas para serem usadas na descompressão
-    qty = zigzagReconstruct(np.array(jpegRLEDecode(qty), dtype=int))
-    qtc = zigzagReconstruct(np.array(jpegRLEDecode(qtc), dtype=int))
-    
+# realiza o processo inverso da função anterior, desquantiza e ja aplica a transformada inversa, retornando ja os canais da imagem (alpha é None quando não foi codificado) prontos para continuar a descompressão
+# workers é a quantidade de processos ou threads (conforme o backend, 'process' ou 'thread') usados na decodificação dos segmentos e nas
+# transformadas (por padrão a quantidade de nucleos), o pool persistente é criado na primeira chamada e reaproveitado, um CodecPool
+# ou CodecThreads pode ser informado em pool
+# scale (1, 1/2, 1/4 ou 1/8) decodifica a imagem reduzida usando apenas os coeficientes de baixa frequencia de cada bloco, em 1/8 apenas o DC
+def deCompress(code:bytes, workers:int = None, scale:float = 1, pool = None, backend:str = 'process', stats:Stats = None):
+    return decodeChannels(code, workers, scale, pool, backend, stats)[:6]
+
+# deCompress retornando tambem o shape (altura, largura) da imagem na escala de decodificação, o valor a ser somado ao alpha (128 no alpha
+# da DCT quando ele não foi removido, 0 caso contrario) e se as chrominancias estão centradas nas celulas (ver CENTERED_CHROMA). Com
+# crop = False os canais saem com o padding e sem remover a normalização, como color.decodePixels os recebe
+def decodeChannels(code:bytes, workers:int = None, scale:float = 1, pool = None, backend:str = 'process', stats:Stats = None, crop:bool = True) -> tuple:
+
+    pool = pool or getPool(workers, backend)
+    stats = stats or Stats()
+    stats.buffer('codigo', len(code))
+
+    size = scaledBlockSize(scale)
+
+    # criando o leitor de bits sobre o codigo comprimido
+    reader = BitReader(code)
+    with stats.stage('cabecalho'):
+        ssv, ssh, flags, shapes, huffman_codes, restart = decodeHeader(reader)
+    # o alpha so faz parte dos blocos da DCT caso não tenha sido codificado sem perdas
+    losslessAlpha = (flags & ALPHA_PLANE) and (flags & ALPHA_LOSSLESS)
+    dctAlpha = (flags & ALPHA_PLANE) and not losslessAlpha
+    integer = bool(flags & INTEGER_TRANSFORM)
+    stats.count('tabela_huffman', len(huffman_codes))
+
     originalShapes = shapes['original']
     paddedShapes = shapes['padded']
 
-    # definindo quantidade de blocos na horizontal e vertical para luminancia e chrominancia
-    jBlocksY = int(paddedShapes[0][1] / BLOCKSIZE) # quantidade de blocos na horizontal para Y
-    iBlocksY = int(paddedShapes[0][0] / BLOCKSIZE) # quantidade de blocos na vertical para Y
-    # novamente como os canais cr e cb tem sempre as mesmas dimensões so é necessario definir quantidade de blocos para um deles
-    jBlocksC = int(paddedShapes[1][1] / BLOCKSIZE) # quantidade de blocos na horizontal para Chrominancias
-    iBlocksC = int(paddedShapes[1][0] / BLOCKSIZE) # quantidade de blocos na vertical para Chrominancias
-
-    # decodificando todos os blocos RLE
-    with mp.Pool(processes=mp.cpu_count()) as pool:
-        results = pool.map(jpegRLEDecode, rle_blocks)
-    zigZagBlocks = np.array(results)
-
-    # reconstruindo blocos em zigzag
-    quantizedBlocks = np.array([zigzagReconstruct(block) for block in zigZagBlocks])
-
-    # separando canais
-    # Definição dos tamanhos dos blocos
-    size_y = jBlocksY * iBlocksY
-    size_c = jBlocksC * iBlocksC
-
-    # Extração dos blocos sem loops explícitos e separando em canais de cor
-    y, alpha, cr, cb = np.split(quantizedBlocks, [size_y, 2 * size_y, 2 * size_y + size_c])
-
-    with mp.Pool(processes=mp.cpu_count()) as pool:
-        args = [(y,qty,paddedShapes[0]), (alpha,qty,paddedShapes[0]), (cr,qtc,paddedShapes[1]), (cb,qtc,paddedShapes[1])]
-        results = pool.starmap(deCompressChannel, args)
-
-    # separando novamente os canais a partir do resultado do multiprocessing usado para finalizar a descompressão
-    y = results[0]
-    alpha = results[1]
-    cr = results[2]
-    cb = results[3]
-
-    # recortando os blocos para eliminar o padding inserido na compressão
-    shape = originalShapes[0]
-    if y.shape > shape:
-        y = y[0:shape[0],0:shape[1]]
-        alpha = alpha[0:shape[0],0:shape[1]]
-
-    # recortando os blocos para eliminar o padding inserido na compressão
-    shape = originalShapes[1]
-    if cr.shape > shape:
-        cr = cr[0:shape[0],0:shape[1]]
-        cb = cb[0:shape[0],0:shape[1]]
-
-    # removendo a normalização aplicada nos canais ao comprimir
-    y = y + 128
-    cr = cr + 128
-    cb = cb + 128
-    alpha = alpha + 128
-
-    return y, cr, cb, alpha, ssv, ssh
+    # decoficicando todos os blocos e as tabelas de quantização faixa a faixa, são 2 tabelas, 1 ou 2 canais (Y e alpha) com o tamanho de Y e 2 com o tamanho
+    # das chrominancias. O alpha sem perdas é lido junto com as faixas
+    blockCounts = stripBlockCounts(paddedShapes, ssv, dctAlpha, 0, paddedShapes[1][0] // BLOCKSIZE)
+    blockCounts[0] += 2
+    # com segmentos cada um é decodificado por um processo
+    with stats.stage('huffman'):
+        runs, sizes, values, blockEnds, alpha = decodeEntropy(reader, huffman_codes, blockCounts, ssv, originalShapes[0] if losslessAlpha else None, restart, pool)
+    stats.count('blocos', len(blockEnds) - 2)
+    stats.count('simbolos', len(runs) - int(blockEnds[1]))
+    stats.buffer('simbolos', [runs, sizes, values])
+    # reconstruindo as tabelas de quantização, neste ponto elas ja estão prontas para serem usadas na descompressão
+    qtEnd = blockEnds[1]
+    with stats.stage('rle'):
+        qtBlocks = rleDecodeArrays(runs[:qtEnd], values[:qtEnd], blockEnds[:2])
+        qty = zigzagReconstruct(qtBlocks[0])
+        qtc = zigzagReconstruct(qtBlocks[1])
+        # decodificando o RLE de todos os blocos de uma vez gerando os vetores zigzag, apenas com os coeficientes usados na escala de decodificação
+        zigZagBlocks = rleDecodeArrays(runs[qtEnd:], values[qtEnd:], blockEnds[2:] - qtEnd, zigzagPrefix(size), np.int16 if integer else np.int32)
+    stats.buffer('coeficientes', zigZagBlocks)
+
+    # desquantizando, revertendo a transformada (reduzida quando size < 8) nos processos ou threads do pool e reorganizando os blocos nas
+    # matrizes dos canais, com o recorte do padding e a normalização do codec.py
+    with stats.stage('transformada'):
+        y, cr, cb, dctAlphaPlane = reconstructChannels(zigZagBlocks, qty, qtc, originalShapes, paddedShapes, ssv, dctAlpha, size, pool, crop, integer)
+    stats.buffer('planos', [y, cr, cb, dctAlphaPlane])
+    if dctAlpha:
+        alpha = dctAlphaPlane
+    elif losslessAlpha:
+        alpha = downscalePlane(alpha, size)
+
+    shape = tuple(-(-n * size // BLOCKSIZE) for n in originalShapes[0])
+    return y, cr, cb, alpha, ssv, ssh, shape, 128 if dctAlpha and not crop else 0, bool(flags & CENTERED_CHROMA)
     
-def encode(image, qty:np.ndarray = QTY, qtc:np.ndarray = QTC, ssv:int = 2, ssh:int = 2, factor:float = 1, outputname:str = 'compressed'):
+# prepara o codec antes da primeira imagem: carrega os kernels do numba (compilados na importação ou lidos do cache em disco) e cria o pool
+# persistente do backend, passando uma imagem minima por ele para que os processos ou threads ja estejam prontos. Assim a primeira imagem
+# de um processo novo leva praticamente o mesmo tempo que as seguintes. shape é o tamanho da imagem usada, quanto mais proximo das
+# imagens reais mais da memoria usada por elas ja fica reservada nos processos
+def warmup(workers:int = None, backend:str = 'process', shape:tuple = (512, 512)):
+    kernels.warmup()
+    pool = getPool(workers, backend)
+    image = np.random.default_rng(0).integers(0, 256, (shape[0], shape[1], 3)).astype(np.uint8)
+    code = compress(*subSampling(2, 2, toYCrCb(image)), QTY, QTC, 2, 2, restartInterval=1, pool=pool)
+    deCompress(code, pool=pool)
+
+def encode(image, qty:np.ndarray = QTY, qtc:np.ndarray = QTC, ssv:int = 2, ssh:int = 2, factor:float = 1, outputname:str = 'compressed', alphaMode:str = 'lossless', restartInterval:int = 0, regionIndex:int = 0,
+           pool = None, backend:str = 'process', stats:Stats = None, downsampling:str = 'decimate', transform:str = 'float'):
 
     # verifica se a imagem fornecida foi um filepath ou uma imagem em array de numpy
     if isinstance(image, str):
@@ -827,51 +355,70 @@ def encode(image, qty:np.ndarray = QTY, qtc:np.ndarray = QTC, ssv:int = 2, ssh:i
         img = Image.open(image)
     else:
         img = image
-
-    print('Inciando compressão!')
-
-    # convertendo para o espaço de cor YCrCb
-    colorSpace = toYCrCb(img)
-
+    # o alpha so passa pela DCT com a tabela de luminancia no modo 'dct', no modo 'lossless' ele é codificado sem perdas apos os demais canais
+    validateOptions(alphaMode, transform)
+    # compressPlanes so calcula as metricas mais caras quando recebe um stats
+    collect = stats is not None
+    stats = stats or Stats()
+
+    # convertendo para o espaço de cor YCrCb, aplicando a sub amostragem e normalizando os canais de uma vez, direto nos planos com padding
+    # (mesmo resultado de toYCrCb, subSampling e do padding de compress, sem as copias intermediarias da imagem inteira)
     # constantes ssv, ssh de sub amostragem vertical e horizontal, não representão literalmente o 4:a:b
     # quanto maior o valor mais informação descartada e pior o resultado final
     # os valores equivalentes para 4:2:2 são ssv = 2, ssh = 1 e para 4:2:0 são ssv = 2 e ssh = 2
-    
-    y, crSub, cbSub, alpha = subSampling(ssv,ssh,colorSpace)
+    # downsampling escolhe como as chrominancias são reduzidas: 'decimate' (padrão) mantem a primeira amostra de cada celula ssv x ssh e 'box'
+    # usa a media da celula, com melhor qualidade nas bordas coloridas principalmente junto com upsampling = 'bilinear' no decode
+    with stats.stage('cor+subamostragem+padding'):
+        pixels = np.asarray(img)
+        yPadding, crPadding, cbPadding, alphaPadding, alpha, originalShapes = encodePlanes(pixels, ssv, ssh, alphaMode == 'dct', downsampling)
+    stats.buffer('imagem', pixels)
+    pixels = None
 
     # fator de qualidade aplicado nas tabelas de quantização, quanto maior mais qualidade e quanto menor mais compressão
     # recomendo usar valores de 1 ate no maximo 100 (em 100 praticamente ja não a perdas)
-    qty = np.round(qty / factor)
-    qty[qty == 0] = 1
-    qtc = np.round(qtc / factor)
-    qtc[qtc == 0] = 1
-
-    # comprimindo a imagem realizando diretamente a DCT, quantização e codificação em ZIG ZAG, retorna a string codificada
-    encoded = compress(y, crSub, cbSub, alpha, qty, qtc, ssv, ssh)
+    qty, qtc = scaleTables(qty, qtc, factor)
+
+    # comprimindo a imagem realizando diretamente a DCT, quantização e codificação em ZIG ZAG, retorna o codigo em bytes
+    # alphaMode escolhe como o canal alpha é codificado: 'lossless' (sem perdas, padrão) ou 'dct' (com perdas, junto com a luminancia)
+    # restartInterval divide o codigo em segmentos de restartInterval faixas decodificados em paralelo por deCompress (0 desativa)
+    # regionIndex grava o indice usado por codec.decodeRegion, com uma entrada a cada regionIndex colunas de blocos de cada linha (0 desativa)
+    # backend escolhe processos ('process', padrão) ou threads ('thread'), as threads evitam as copias dos planos em cada processo
+    # stats (um stats.Stats) recebe as metricas de cada etapa, sem ele nada é coletado nem impresso
+    # transform escolhe a DCT: 'float' (padrão) ou 'integer', a DCT inteira em ponto fixo com os coeficientes em int16 e a decodificação
+    # exata, com o mesmo resultado em qualquer maquina
+    encoded = compressPlanes(yPadding, crPadding, cbPadding, alphaPadding, alpha, originalShapes, qty, qtc, ssv, ssh, restartInterval, regionIndex, pool, backend,
+                             stats if collect else None, downsampling == 'box', transform == 'integer')
 
     # Escreve o arquivo comprimido
-    writeFile(encoded, outputname)
-    print('Compressão finalizada!')
+    with stats.stage('io'):
+        writeFile(encoded, outputname)
 
     return encoded
 
-def decode(filepath:str = 'compressed.gpeg', savePng:bool = False):
+# scale decodifica uma versão reduzida da imagem (1/2, 1/4 ou 1/8), bem mais barata que reduzir a imagem inteira
+# backend escolhe processos ('process', padrão) ou threads ('thread') para a decodificação dos segmentos e as transformadas
+# stats (um stats.Stats) recebe as metricas de cada etapa, sem ele nada é coletado nem impresso
+# out é o array uint8 (altura, largura, canais) onde a imagem é escrita e retornada, pode ser reaproveitado entre imagens do mesmo tamanho
+# (ver codec.imageShape), sem ele um novo array é criado
+# upsampling escolhe como as chrominancias são ampliadas: 'replicate' (padrão) repete cada amostra e 'bilinear' interpola as amostras vizinhas
+def decode(filepath:str = 'compressed.gpeg', savePng:bool = False, workers:int = None, scale:float = 1, pool = None, backend:str = 'process', stats:Stats = None,
+           out:np.ndarray = None, upsampling:str = 'replicate'):
+    stats = stats or Stats()
 
-    print('Iniciando descompressão!')
     try:
         # le o arquivo
-        encoded = readFile(filepath)
+        with stats.stage('io'):
+            encoded = readFile(filepath)
     except:
         encoded = filepath
 
-    # decodifica o arquivo e ja reconstroi as alterções gerados por quantização e DCT
-    y, cr, cb, alpha, ssv, ssh = deCompress(encoded)
-    # reconstruindo os canais que foram aplicados sub amostragem
-    decodedYCrCb = upSampling(y, cr, cb, alpha, ssv, ssh)
-    # voltando a imagem para o espaço de cor RGB com canal alpha
-    decoded = toRGB(decodedYCrCb)
-
-    print('Descompressão finalizada!')
+    # decodifica o arquivo e ja reconstroi as alterções gerados por quantização e DCT, mantendo o padding e a normalização dos canais
+    y, cr, cb, alpha, ssv, ssh, (height, width), alphaShift, centered = decodeChannels(encoded, workers, scale, pool, backend, stats, crop=False)
+    # reconstruindo os canais que foram aplicados sub amostragem e voltando para o espaço de cor RGB de uma vez pelo kernel compilado, com
+    # canal alpha caso a imagem original tenha um
+    with stats.stage('subamostragem+cor'):
+        decoded = decodePixels(y, cr, cb, alpha, ssv, ssh, height, width, out, alphaShift, kernels.rgbKernel, upsampling, centered)
+    stats.buffer('imagem', decoded)
 
     if savePng:
         Image.fromarray(decoded).save('compressed.png')
@@ -0,0 +1,239 @@
+import atexit
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory, resource_tracker
+from concurrent.futures import ThreadPoolExecutor
+from transform import BLOCKSIZE, forwardDCT, zigzagVector, inverseDCTScaled
+from strips import stripHeight, segmentRanges, decodeSegment, concatenateParts
+from huffman import buildDecodeTables
+from kernels import huffmanDecodeKernel, alphaDecodeKernel
+
+# pools persistentes usados pelo codec_mt (e opcionalmente pelo codec) para paralelizar as transformadas e a decodificação dos segmentos
+# CodecPool usa processos: os planos, os coeficientes, o codigo e as tabelas passam por blocos de memoria compartilhada e as tarefas
+# levam apenas a descrição dos blocos. CodecThreads usa threads no mesmo processo, sem copias, ja que as transformadas do numpy e os
+# kernels do numba (compilados com nogil) liberam o GIL. Os dois tem a mesma interface e são criados uma unica vez e reaproveitados
+
+# backends disponiveis em getPool
+BACKENDS = ('process', 'thread')
+
+# alinhamento de cada array dentro do bloco de memoria compartilhada
+SHARED_ALIGNMENT = 64
+# quantidade de blocos de memoria compartilhada mantidos abertos por cada processo
+SHARED_CACHE = 2
+
+# cria as visões de numpy dos arrays de um bloco a partir da descrição (posição, shape, dtype) de cada array
+def viewArrays(block:shared_memory.SharedMemory, layout:dict) -> dict:
+    return {key: np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf, offset=offset) for key, (offset, shape, dtype) in layout.items()}
+
+# conjunto de arrays guardados em um unico bloco de memoria compartilhada, arrays recebe para cada nome um array (copiado para o bloco)
+# ou uma tupla (shape, dtype) de um array vazio, usado para as saidas dos processos. Apenas spec (nome do bloco e descrição dos arrays)
+# é enviado aos processos
+class SharedArrays:
+    def __init__(self, arrays:dict):
+        layout, size = {}, 0
+        for key, array in arrays.items():
+            shape, dtype = (array.shape, array.dtype) if isinstance(array, np.ndarray) else (tuple(array[0]), np.dtype(array[1]))
+            layout[key] = (size, shape, dtype.str)
+            size += -(-int(np.prod(shape)) * dtype.itemsize // SHARED_ALIGNMENT) * SHARED_ALIGNMENT
+        self.block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self.spec = (self.block.name, layout)
+        self.arrays = viewArrays(self.block, layout)
+        for key, array in arrays.items():
+            if isinstance(array, np.ndarray):
+                self.arrays[key][...] = array
+
+    # copia um array do bloco para a memoria do processo, permitindo liberar o bloco
+    def copy(self, key:str) -> np.ndarray:
+        return np.array(self.arrays[key])
+
+    # libera o bloco, as visões precisam ser descartadas antes de fechar
+    def close(self):
+        self.arrays = None
+        self.block.close()
+        self.block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+# estado de cada processo do pool, preenchido pelo inicializador: os blocos de memoria compartilhada ja abertos e os arrays de cada um
+workerState = {}
+
+def initWorker():
+    workerState['shared'] = {}
+
+# abre (ou reaproveita) no processo o bloco descrito por spec, mantendo apenas os SHARED_CACHE blocos mais recentes abertos
+# as tabelas enviadas junto com o bloco ficam disponiveis para todas as tarefas da mesma imagem sem serem enviadas novamente
+def openShared(spec:tuple) -> dict:
+    name, layout = spec
+    cache = workerState['shared']
+    if name not in cache:
+        while len(cache) >= SHARED_CACHE:
+            block, arrays = cache.pop(next(iter(cache)))
+            arrays.clear()
+            block.close()
+        block = shared_memory.SharedMemory(name=name)
+        cache[name] = (block, viewArrays(block, layout))
+    return cache[name][1]
+
+# aplica a DCT, a quantização e o zig-zag nas linhas de blocos first ate last (exclusiva) de um plano, escrevendo os vetores na saida
+# integer usa a transformada inteira (ver transform.forwardDCT)
+def transformBand(plane:np.ndarray, qt:np.ndarray, out:np.ndarray, first:int, last:int, integer:bool = False):
+    cols = plane.shape[1] // BLOCKSIZE
+    out[first * cols:last * cols] = zigzagVector(forwardDCT(plane[first * BLOCKSIZE:last * BLOCKSIZE], qt, integer))
+
+# desquantiza e aplica a transformada inversa (reduzida quando size < 8) nas linhas de blocos first ate last de um plano
+def inverseBand(vectors:np.ndarray, qt:np.ndarray, out:np.ndarray, first:int, last:int, size:int, integer:bool = False):
+    cols = out.shape[1] // size
+    shape = ((last - first) * size, cols * size)
+    out[first * size:last * size] = inverseDCTScaled(vectors[first * cols:last * cols], qt, shape, size, integer)
+
+# divide rows linhas de blocos em faixas continuas, duas por processo ou thread para equilibrar a carga
+def bandRanges(rows:int, workers:int) -> list:
+    count = max(1, min(rows, 2 * workers))
+    bounds = np.linspace(0, rows, count + 1).astype(int)
+    return [(int(first), int(last)) for first, last in zip(bounds[:-1], bounds[1:]) if last > first]
+
+# argumentos de decodeSegment de cada segmento: (posição em bytes, quantidade de blocos de cada faixa, shape do alpha sem perdas, primeira faixa)
+def segmentTasks(blockCounts:np.ndarray, ssv:int, alphaShape:tuple, restart:tuple) -> list:
+    restartInterval, offsets = restart
+    rows = stripHeight(ssv)
+    tasks = []
+    for offset, (first, last) in zip(offsets, segmentRanges(len(blockCounts), restartInterval)):
+        segmentAlpha = None if alphaShape is None else (min(last * rows, alphaShape[0]) - first * rows, alphaShape[1])
+        tasks.append((offset, blockCounts[first:last], segmentAlpha, first))
+    return tasks
+
+# junta os resultados de decodeSegment de cada segmento no mesmo formato de decodeStrips
+def joinSegments(parts:list, alphaShape:tuple) -> tuple:
+    runs, sizes, values, blockEnds = concatenateParts(parts)
+    return runs, sizes, values, blockEnds, None if alphaShape is None else np.concatenate([part[4] for part in parts])
+
+def transformTask(spec:tuple, plane:str, qt:str, out:str, first:int, last:int, integer:bool):
+    arrays = openShared(spec)
+    transformBand(arrays[plane], arrays[qt], arrays[out], first, last, integer)
+
+def inverseTask(spec:tuple, vectors:str, qt:str, out:str, first:int, last:int, size:int, integer:bool):
+    arrays = openShared(spec)
+    inverseBand(arrays[vectors], arrays[qt], arrays[out], first, last, size, integer)
+
+# decodifica um segmento independente do codigo compartilhado (ver decodeSegment), as tabelas de decodificação estão no mesmo bloco
+def segmentTask(spec:tuple, tableCount:int, offset:int, blockCounts:np.ndarray, ssv:int, alphaShape:tuple, restartInterval:int, firstStrip:int) -> tuple:
+    arrays = openShared(spec)
+    tables = tuple(arrays[f'table{i}'] for i in range(tableCount))
+    return decodeSegment(arrays['code'], offset, None, blockCounts, ssv, alphaShape, restartInterval, firstStrip, huffmanDecodeKernel, alphaDecodeKernel, tables)
+
+class CodecPool:
+    def __init__(self, processes:int = None):
+        self.workers = processes or mp.cpu_count()
+        # o rastreador de memoria compartilhada precisa existir antes dos processos para ser herdado por eles, caso contrario cada processo
+        # cria o seu e tenta liberar ao terminar os blocos que ja foram liberados pelo processo principal
+        resource_tracker.ensure_running()
+        self.pool = mp.Pool(processes=self.workers, initializer=initWorker)
+
+    # recebe uma lista de (plano com padding, tabela de quantização) e retorna os vetores zigzag dos blocos quantizados de cada plano
+    # com integer a transformada inteira é usada e os vetores são int16
+    def transformPlanes(self, planes:list, integer:bool = False) -> list:
+        arrays = {}
+        for i, (plane, qt) in enumerate(planes):
+            arrays[f'plane{i}'] = np.asarray(plane, dtype=np.float32)
+            arrays[f'qt{i}'] = np.asarray(qt, dtype=np.float32)
+            arrays[f'out{i}'] = ((plane.shape[0] * plane.shape[1] // (BLOCKSIZE * BLOCKSIZE), BLOCKSIZE * BLOCKSIZE), np.int16 if integer else np.int32)
+        with SharedArrays(arrays) as shared:
+            tasks = [(shared.spec, f'plane{i}', f'qt{i}', f'out{i}', first, last, integer) for i, (plane, _) in enumerate(planes) for first, last in bandRanges(plane.shape[0] // BLOCKSIZE, self.workers)]
+            self.pool.starmap(transformTask, tasks)
+            return [shared.copy(f'out{i}') for i in range(len(planes))]
+
+    # recebe uma lista de (vetores zigzag, tabela de quantização, shape do plano na escala de decodificação) e retorna os planos reconstruidos
+    # com integer a inversa inteira é usada
+    def inversePlanes(self, planes:list, size:int, integer:bool = False) -> list:
+        arrays = {}
+        for i, (vectors, qt, shape) in enumerate(planes):
+            arrays[f'vectors{i}'] = vectors
+            arrays[f'qt{i}'] = np.asarray(qt)
+            arrays[f'out{i}'] = (shape, np.float32)
+        with SharedArrays(arrays) as shared:
+            tasks = [(shared.spec, f'vectors{i}', f'qt{i}', f'out{i}', first, last, size, integer) for i, (_, _, shape) in enumerate(planes) for first, last in bandRanges(shape[0] // size, self.workers)]
+            self.pool.starmap(inverseTask, tasks)
+            return [shared.copy(f'out{i}') for i in range(len(planes))]
+
+    # decodifica em paralelo os segmentos do codigo (data, ja com os bytes de folga do BitReader), restart é o intervalo e as posições em bytes
+    # dos segmentos lidos do cabeçalho. Retorna o mesmo que decodeStrips para todas as faixas
+    def decodeSegments(self, data:bytes, huffman_codes:dict, blockCounts:np.ndarray, ssv:int, alphaShape:tuple, restart:tuple) -> tuple:
+        tables = buildDecodeTables(huffman_codes)
+        arrays = {'code': np.frombuffer(data, dtype=np.uint8)}
+        for i, table in enumerate(tables):
+            arrays[f'table{i}'] = table
+        with SharedArrays(arrays) as shared:
+            tasks = [(shared.spec, len(tables), offset, counts, ssv, segmentAlpha, restart[0], first) for offset, counts, segmentAlpha, first in segmentTasks(blockCounts, ssv, alphaShape, restart)]
+            return joinSegments(self.pool.starmap(segmentTask, tasks), alphaShape)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+# backend com threads no mesmo processo: as faixas e os segmentos são processados direto sobre os arrays da imagem, sem memoria compartilhada
+# nem copias, a memoria extra é apenas a dos resultados. Indicado quando a memoria é limitada ou os processos são caros de criar
+class CodecThreads:
+    def __init__(self, threads:int = None):
+        self.workers = threads or mp.cpu_count()
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+
+    # executa function com cada tupla de argumentos nas threads, propagando a primeira exceção
+    def starmap(self, function, tasks:list) -> list:
+        return list(self.pool.map(lambda args: function(*args), tasks))
+
+    # mesma interface de CodecPool.transformPlanes
+    def transformPlanes(self, planes:list, integer:bool = False) -> list:
+        outputs = [np.empty((plane.shape[0] * plane.shape[1] // (BLOCKSIZE * BLOCKSIZE), BLOCKSIZE * BLOCKSIZE), dtype=np.int16 if integer else np.int32) for plane, _ in planes]
+        qts = [np.asarray(qt, dtype=np.float32) for _, qt in planes]
+        self.starmap(transformBand, [(plane, qts[i], outputs[i], first, last, integer) for i, (plane, _) in enumerate(planes) for first, last in bandRanges(plane.shape[0] // BLOCKSIZE, self.workers)])
+        return outputs
+
+    # mesma interface de CodecPool.inversePlanes
+    def inversePlanes(self, planes:list, size:int, integer:bool = False) -> list:
+        outputs = [np.empty(shape, dtype=np.float32) for _, _, shape in planes]
+        self.starmap(inverseBand, [(vectors, qt, outputs[i], first, last, size, integer) for i, (vectors, qt, shape) in enumerate(planes) for first, last in bandRanges(shape[0] // size, self.workers)])
+        return outputs
+
+    # mesma interface de CodecPool.decodeSegments, o codigo e as tabelas são compartilhados diretamente entre as threads
+    def decodeSegments(self, data:bytes, huffman_codes:dict, blockCounts:np.ndarray, ssv:int, alphaShape:tuple, restart:tuple) -> tuple:
+        tables = buildDecodeTables(huffman_codes)
+        tasks = [(data, offset, None, counts, ssv, segmentAlpha, restart[0], first, huffmanDecodeKernel, alphaDecodeKernel, tables) for offset, counts, segmentAlpha, first in segmentTasks(blockCounts, ssv, alphaShape, restart)]
+        return joinSegments(self.starmap(decodeSegment, tasks), alphaShape)
+
+    def close(self):
+        self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+# pools persistentes compartilhados por todas as chamadas, um para cada backend e quantidade de processos ou threads, fechados ao final do programa
+pools = {}
+
+# retorna o pool persistente do backend ('process' ou 'thread') com a quantidade de processos ou threads informada (por padrão a
+# quantidade de nucleos), criando-o na primeira chamada
+def getPool(workers:int = None, backend:str = 'process'):
+    if backend not in BACKENDS:
+        raise ValueError(f'Backend desconhecido: {backend}')
+    key = (backend, workers or mp.cpu_count())
+    if key not in pools:
+        pools[key] = CodecPool(key[1]) if backend == 'process' else CodecThreads(key[1])
+    return pools[key]
+
+@atexit.register
+def closePools():
+    for pool in pools.values():
+        pool.close()
+    pools.clear()
@@ -0,0 +1,154 @@
+import numpy as np
+from transform import BLOCKSIZE
+from resample import DOWNSAMPLING, UPSAMPLING, boxDownsample, interpolationAxis, replicateAxis, interpolate
+
+# etapas de cor compartilhadas pelos codecs que trabalham direto nos buffers finais, sem os planos intermediarios de toYCrCb, subSampling e
+# padChannels. Os valores calculados são exatamente os mesmos (mesmas operações em float32 e na mesma ordem), então os arquivos gerados
+# são identicos aos das etapas separadas
+
+# quantidade de linhas da imagem convertidas de cada vez, os temporarios em float32 tem no maximo o tamanho dessa faixa
+FRONT_END_ROWS = 64
+
+# converte a imagem uint8 HxWxC (C = 3 ou 4, imagem do PIL ou array) para YCrCb, subamostra as chrominancias e subtrai 128 de tudo,
+# escrevendo direto nos planos com padding para blocos 8x8 (em float32, o padding fica com 0). A imagem é percorrida em faixas de linhas
+# e Cr e Cb so são calculados nas posições mantidas pela subamostragem
+# downsampling escolhe a redução das chrominancias (ver resample.DOWNSAMPLING): 'decimate' mantem a primeira amostra de cada celula ssv x ssh
+# e 'box' usa a media de R, G e B na celula (como as conversões são lineares, é a media de Cr e Cb), com menos serrilhado nas bordas coloridas
+# retorna os planos de Y, Cr, Cb e do alpha com padding (None quando o alpha não passa pela DCT), o alpha sem perdas (uma visão uint8
+# da imagem, None quando não existe ou passa pela DCT) e os shapes originais de Y, Cr e Cb
+def encodePlanes(image, ssv:int, ssh:int, dctAlpha:bool, downsampling:str = 'decimate') -> tuple:
+    if downsampling not in DOWNSAMPLING:
+        raise ValueError(f'Modo de redução das chrominancias desconhecido: {downsampling}')
+    box = downsampling == 'box'
+    arr = np.asarray(image)
+    height, width = arr.shape[0], arr.shape[1]
+    hasAlpha = arr.shape[2] == 4
+    a, b = max(ssv, 1), max(ssh, 1)
+    cHeight, cWidth = -(-height // a), -(-width // b)
+    ceilBlock = lambda n: -(-n // BLOCKSIZE) * BLOCKSIZE
+
+    yPadding = np.zeros((ceilBlock(height), ceilBlock(width)), dtype=np.float32)
+    crPadding = np.zeros((ceilBlock(cHeight), ceilBlock(cWidth)), dtype=np.float32)
+    cbPadding = np.zeros((ceilBlock(cHeight), ceilBlock(cWidth)), dtype=np.float32)
+    alphaPadding = np.zeros(yPadding.shape, dtype=np.float32) if hasAlpha and dctAlpha else None
+
+    # as faixas começam em linhas multiplas de a, assim as linhas subamostradas de cada faixa são continuas
+    rows = max(FRONT_END_ROWS // a, 1) * a
+    temp = np.empty((rows, width), dtype=np.float32)
+    for start in range(0, height, rows):
+        end = min(start + rows, height)
+        band = arr[start:end]
+        r, g, bl = (band[:, :, channel].astype(np.float32) for channel in range(3))
+        t = temp[:end - start]
+        # Y = 0.299 R + 0.587 G + 0.114 B, somado na mesma ordem de toYCrCb
+        y = yPadding[start:end, :width]
+        np.multiply(r, 0.299, out=y)
+        np.multiply(g, 0.587, out=t)
+        y += t
+        np.multiply(bl, 0.114, out=t)
+        y += t
+        # Cr = (R - Y) / 1.402 e Cb = (B - Y) / 1.772, apenas nas linhas e colunas mantidas ou com as medias das celulas
+        # as faixas começam em celulas completas, então as medias não dependem das faixas vizinhas
+        ySub = boxDownsample(y, a, b) if box else y[::a, ::b]
+        cStart, cEnd = start // a, -(-end // a)
+        for plane, channel, factor in ((crPadding, r, 1.402), (cbPadding, bl, 1.772)):
+            c = plane[cStart:cEnd, :cWidth]
+            np.subtract(boxDownsample(channel, a, b) if box else channel[::a, ::b], ySub, out=c)
+            c /= factor
+            c -= 128
+        y -= 128
+        if alphaPadding is not None:
+            np.subtract(band[:, :, 3], np.float32(128), out=alphaPadding[start:end, :width])
+
+    alpha = arr[:, :, 3] if hasAlpha and not dctAlpha else None
+    return yPadding, crPadding, cbPadding, alphaPadding, alpha, [(height, width), (cHeight, cWidth), (cHeight, cWidth)]
+
+# coeficientes da conversão de YCrCb para RGB, em float32 como em toRGB
+CR_RED = np.float32(1.402)
+CR_GREEN = np.float32(0.299 * 1.402 / 0.587)
+CB_GREEN = np.float32(0.114 * 1.772 / 0.587)
+CB_BLUE = np.float32(1.772)
+
+# kernel do final da decodificação, escrito para ser compilado pelo numba (ver kernels.py) mas que tambem funciona em python puro: para
+# cada pixel de out le Y e interpola o Cr e o Cb entre as amostras vizinhas, desfaz a normalização, converte para RGB, limita a [0, 255]
+# e escreve em uint8, sem nenhum plano intermediario. alpha (vazio quando não existe) recebe alphaShift antes de ser limitado
+# rows e cols são os eixos da ampliação (indices das duas amostras vizinhas e peso da segunda, ver resample.interpolationAxis), na
+# repetição o peso é 0 e as duas amostras são a mesma, resultando exatamente na amostra repetida
+def rgbKernel(y, cr, cb, alpha, alphaShift, rows0, rows1, rowWeights, cols0, cols1, colWeights, out):
+    shift = np.float32(128)
+    for i in range(out.shape[0]):
+        r0, r1, wr = rows0[i], rows1[i], rowWeights[i]
+        for j in range(out.shape[1]):
+            c0, c1, wc = cols0[j], cols1[j], colWeights[j]
+            luma = y[i, j] + shift
+            # primeiro nas linhas e depois nas colunas, na mesma ordem de resample.interpolate
+            left = cr[r0, c0] + wr * (cr[r1, c0] - cr[r0, c0])
+            right = cr[r0, c1] + wr * (cr[r1, c1] - cr[r0, c1])
+            red = left + wc * (right - left) + shift
+            left = cb[r0, c0] + wr * (cb[r1, c0] - cb[r0, c0])
+            right = cb[r0, c1] + wr * (cb[r1, c1] - cb[r0, c1])
+            blue = left + wc * (right - left) + shift
+            values = (luma + CR_RED * red, luma - CR_GREEN * red - CB_GREEN * blue, luma + CB_BLUE * blue)
+            for channel in range(3):
+                value = min(max(values[channel], np.float32(0)), np.float32(255))
+                out[i, j, channel] = np.uint8(value)
+            if out.shape[2] == 4:
+                value = min(max(np.float32(alpha[i, j]) + alphaShift, np.float32(0)), np.float32(255))
+                out[i, j, 3] = np.uint8(value)
+
+# cria ou confere o buffer de saida da imagem decodificada: uint8 com shape (altura, largura, canais) e continuo
+def outputBuffer(out:np.ndarray, shape:tuple) -> np.ndarray:
+    if out is None:
+        return np.empty(shape, dtype=np.uint8)
+    if out.shape != shape or out.dtype != np.uint8 or not out.flags.c_contiguous or not out.flags.writeable:
+        raise ValueError(f'O buffer de saida deve ser um array uint8 continuo e gravavel com shape {shape}, recebido {out.dtype} {out.shape}')
+    return out
+
+# eixos da ampliação das chrominancias subamostradas por ssv x ssh para uma imagem de height x width pixels (indices das duas amostras
+# vizinhas e peso da segunda para cada linha e cada coluna, ver resample.interpolationAxis), com upsampling = 'replicate' o peso é sempre 0
+def chromaAxes(ssv:int, ssh:int, height:int, width:int, upsampling:str = 'replicate', centered:bool = False) -> tuple:
+    if upsampling not in UPSAMPLING:
+        raise ValueError(f'Modo de ampliação das chrominancias desconhecido: {upsampling}')
+    a, b = max(ssv, 1), max(ssh, 1)
+    if upsampling == 'bilinear':
+        return interpolationAxis(height, a, -(-height // a), centered), interpolationAxis(width, b, -(-width // b), centered)
+    return replicateAxis(height, a), replicateAxis(width, b)
+
+# final da decodificação: amplia as chrominancias por ssv x ssh, converte para RGB e limita a [0, 255], escrevendo
+# a imagem de height x width pixels direto em out (um array uint8 que pode ser reaproveitado entre imagens, criado quando None). y, cr e cb
+# são os planos da transformada inversa ainda com padding e sem desfazer a normalização (-128), alpha é None ou o plano do alpha, somado
+# a alphaShift (128 para o alpha da DCT). Com upsampling = 'replicate' cada amostra é repetida e o resultado é identico ao de
+# toRGB(upSampling(...)) com os planos recortados e normalizados, com 'bilinear' as chrominancias são interpoladas (ver resample.UPSAMPLING)
+# considerando as amostras no centro das celulas quando centered (chrominancias reduzidas com 'box') ou na primeira posição delas
+# kernel é a versão compilada de rgbKernel, sem ele a imagem é processada com numpy em faixas de linhas
+# axes substitui os eixos de chromaAxes (linhas, colunas), usado por codec.decodeRegion para gerar apenas uma região: y e alpha começam na
+# primeira linha e coluna da região e os indices dos eixos apontam para as amostras de cr e cb, que são sempre interpoladas pelos eixos
+def decodePixels(y:np.ndarray, cr:np.ndarray, cb:np.ndarray, alpha:np.ndarray, ssv:int, ssh:int, height:int, width:int, out:np.ndarray = None,
+                 alphaShift:float = 0, kernel = None, upsampling:str = 'replicate', centered:bool = False, axes:tuple = None) -> np.ndarray:
+    a, b = max(ssv, 1), max(ssh, 1)
+    rowAxis, colAxis = chromaAxes(ssv, ssh, height, width, upsampling, centered) if axes is None else axes
+    out = outputBuffer(out, (height, width, 3 if alpha is None else 4))
+    interpolated = upsampling == 'bilinear' or axes is not None
+    if kernel is not None:
+        kernel(y, cr, cb, np.empty((0, 0), dtype=np.float32) if alpha is None else alpha, np.float32(alphaShift), *rowAxis, *colAxis, out)
+        return out
+
+    rows = max(FRONT_END_ROWS // a, 1) * a
+    for start in range(0, height, rows):
+        end = min(start + rows, height)
+        luma = y[start:end, :width] + np.float32(128)
+        if interpolated:
+            # as linhas da faixa podem interpolar com as linhas de chrominancia das faixas vizinhas
+            bandAxis = tuple(axis[start:end] for axis in rowAxis)
+            red, blue = (interpolate(plane[:, :int(colAxis[1][-1]) + 1], bandAxis, colAxis) + np.float32(128) for plane in (cr, cb))
+        else:
+            # chrominancias das linhas da faixa, ampliadas apenas dentro dela
+            cStart, cEnd, cWidth = start // a, -(-end // a), -(-width // b)
+            red, blue = (np.repeat(np.repeat(plane[cStart:cEnd, :cWidth] + np.float32(128), a, axis=0), b, axis=1)[:end - start, :width] for plane in (cr, cb))
+        band = out[start:end]
+        for channel, value in enumerate((luma + CR_RED * red, luma - CR_GREEN * red - CB_GREEN * blue, luma + CB_BLUE * blue)):
+            band[:, :, channel] = np.clip(value, 0, 255, out=value)
+        if alpha is not None:
+            value = alpha[start:end, :width].astype(np.float32) + np.float32(alphaShift)
+            band[:, :, 3] = np.clip(value, 0, 255, out=value)
+    return out
@@ -2,85 +2,34 @@
 ####### porem não estão sendo utilizadas no codigo final
 
 
-# Faz a redução de escala da imagem
 import numpy as np
+from resample import boxDownsample, replicateAxis, bilinearUpsample
 
+# as funções de escala abaixo eram loops por pixel e foram refeitas com as operações vetorizadas de resample.py, que tambem são usadas
+# pelos codecs na reamostragem das chrominancias
+
+# Faz a redução de escala da imagem pela media de cada bloco de 1/scaleFactor x 1/scaleFactor pixels
 def downScaling(image: np.ndarray, scaleFactor):
     # Fator de escala de redução é calculado e convertido para inteiro
     scaleFactor = int(scaleFactor**(-1))
-    # Cria um array para salvar o resultado
-    result = np.zeros(image.shape, dtype=np.float32)
-    # Calcula tamanho final da imagem apos a redução
+    # Calcula tamanho final da imagem apos a redução, os pixels que não completam um bloco são descartados
     size_x = int(image.shape[0] / scaleFactor)
     size_y = int(image.shape[1] / scaleFactor)
-
-    # Calcula os pixels da imagem reduzida
-    for i in range(int(size_x)):
-        for j in range(int(size_y)):
-            temp = np.array([0], dtype=np.float32)
-            for x in range(scaleFactor):
-                for y in range(scaleFactor):
-                    temp += image[i*scaleFactor + x, j*scaleFactor + y]
-            result[i,j] = temp / (scaleFactor*scaleFactor)
-    
-    # recortando o array de resultado para que fique com o tamanho final da imagem (elimando area sem pixels devido ao tamanho original da imagem)
-    result = result[0:size_x,0:size_y]
-
-    return result
+    return boxDownsample(image[:size_x * scaleFactor, :size_y * scaleFactor], scaleFactor, scaleFactor)
 
 # upscaling atraves do metodo nearest neighbor (QUALIDADE FINAL MUITO INFERIOR)
 def nnb(image, scaleFactor):
-    ls, cs, p = image.shape[0] * scaleFactor, image.shape[1] * scaleFactor, image.shape[2]
-    result = np.zeros((ls,cs,p), dtype=np.uint8)
-
-    for i in range(ls):
-        for j in range(cs):
-            ny = int(np.floor(i * (image.shape[0] / ls)))
-            nx = int(np.floor(j * (image.shape[1] / cs)))
-
-            result[i,j] = image[ny,nx]
-    
-    return result
+    rows = replicateAxis(image.shape[0] * scaleFactor, scaleFactor)[0]
+    cols = replicateAxis(image.shape[1] * scaleFactor, scaleFactor)[0]
+    return image[rows][:, cols].astype(np.uint8)
 
 
-# Faz o aumento e escala da imagem usando interpolação bilinear (QUALIDADE MUITO SUPERIOR POREM MAIS LENTO)
+# Faz o aumento e escala da imagem usando interpolação bilinear (QUALIDADE MUITO SUPERIOR), com cada pixel original na primeira
+# posição do seu bloco e a ultima linha e coluna repetidas na borda
 def upScaling(image: np.ndarray, scaleFactor):
     # Convertendo o scaleFactor apra inteiro
     scaleFactor = int(scaleFactor)
-    
-    # Calculando qual o tamanho da imagem final apos o upScaling
-    size_x = int(image.shape[0] * scaleFactor)
-    size_y = int(image.shape[1] * scaleFactor)
-    
-    # Salvando o shape final da imagem que sera gerada
-    shape = (size_x,size_y)
-    
-
-    # calculando fatores
-    sl = image.shape[0] / size_x 
-    sc = image.shape[1] / size_y
-
-    # Array responsavel por armazenar a imagem resultante
-    result = np.zeros(shape, dtype=np.float32)
-
-    # Realiza o upscaling usando interpolação bilinear
-    for l in range(size_x):
-        for c in range(size_y):
-            lf = l * (sl) 
-            cf = c * (sc)
-            l0 = int(np.floor(lf)) 
-            if l0+1 >= image.shape[0] : l0 = image.shape[0] - 2
-            c0 = int(np.floor(cf))
-            if c0+1 >= image.shape[1] : c0 = image.shape[1] - 2
-            deltaL = lf - l0
-            deltaC = cf - c0
-            result[l,c] = ( image[l0,c0] * (1 - deltaL) * (1 - deltaC)
-                            + image[l0 + 1, c0] * deltaL * (1 - deltaC)
-                            + image[l0,c0 + 1] * (1 - deltaL) * deltaC
-                            + image[l0 + 1,c0 + 1] * deltaL * deltaC
-            )
-    
-    return result
+    return bilinearUpsample(image, scaleFactor, scaleFactor, image.shape[0] * scaleFactor, image.shape[1] * scaleFactor, centered=False)
 
 
 
@@ -0,0 +1,349 @@
+import numpy as np
+from bitstream import packBits
+
+# funções compartilhadas pelos codecs para a geração dos codigos de huffman canonicos e para a decodificação baseada em tabelas de consulta
+# os kernels são escritos em python puro compativel com numba, o codec_mt os compila com jit enquanto o codec os executa diretamente
+
+# quantidade de bits consultados de uma só vez na tabela rapida, codigos maiores que isso usam o caminho lento
+LOOKUP_BITS = 9
+
+# tamanho maximo permitido para um codigo de huffman, assim como no JPEG
+MAX_CODE_LENGTH = 16
+
+# os simbolos são empacotados como (zeros << 4 | tamanho), com ate 63 zeros e tamanhos de ate 15 bits
+SYMBOL_COUNT = 64 << 4
+# maior valor absoluto que pode ser representado com tamanho de 15 bits em complemento de 2
+MAX_VALUE = (1 << 14) - 1
+
+# calcula o tamanho otimo dos codigos de huffman para frequencias ordenadas de forma crescente, usando o algoritmo
+# em array de Moffat e Katajainen, que substitui a arvore de objetos. Retorna o tamanho de cada codigo na mesma ordem
+def huffmanCodeLengths(frequencies: list) -> list:
+    A = list(frequencies)
+    n = len(A)
+    if n == 1:
+        return [1]
+
+    # fase 1: combina os nos, A passa a guardar o indice do pai de cada no interno
+    A[0] += A[1]
+    root, leaf = 0, 2
+    for next in range(1, n - 1):
+        # primeiro filho
+        if leaf >= n or A[root] < A[leaf]:
+            A[next] = A[root]
+            A[root] = next
+            root += 1
+        else:
+            A[next] = A[leaf]
+            leaf += 1
+        # segundo filho
+        if leaf >= n or (root < next and A[root] < A[leaf]):
+            A[next] += A[root]
+            A[root] = next
+            root += 1
+        else:
+            A[next] += A[leaf]
+            leaf += 1
+
+    # fase 2: converte os indices dos pais em profundidade dos nos internos
+    A[n - 2] = 0
+    for next in range(n - 3, -1, -1):
+        A[next] = A[A[next]] + 1
+
+    # fase 3: converte as profundidades dos nos internos em profundidade das folhas
+    available, used, depth = 1, 0, 0
+    root, next = n - 2, n - 1
+    while available > 0:
+        while root >= 0 and A[root] == depth:
+            used += 1
+            root -= 1
+        while available > used:
+            A[next] = depth
+            next -= 1
+            available -= 1
+        available = 2 * used
+        depth += 1
+        used = 0
+
+    return A
+
+# limita os tamanhos dos codigos a MAX_CODE_LENGTH bits com o mesmo procedimento do JPEG (anexo K.3), lengths deve estar em ordem crescente
+# de frequencia como retornado por huffmanCodeLengths, o resultado continua em ordem decrescente de tamanho
+def limitCodeLengths(lengths: list) -> list:
+    # quantidade de codigos de cada tamanho
+    bits = [0] * (max(lengths) + 1)
+    for length in lengths:
+        bits[length] += 1
+
+    for i in range(len(bits) - 1, MAX_CODE_LENGTH, -1):
+        while bits[i] > 0:
+            # encontra um codigo mais curto que possa virar prefixo de dois codigos
+            j = i - 2
+            while bits[j] == 0:
+                j -= 1
+            # dois codigos de tamanho i viram um de tamanho i-1 e um codigo de tamanho j vira dois de tamanho j+1
+            bits[i] -= 2
+            bits[i - 1] += 1
+            bits[j + 1] += 2
+            bits[j] -= 1
+
+    # redistribui os tamanhos, os simbolos menos frequentes ficam com os codigos mais longos
+    limited = []
+    for length in range(len(bits) - 1, 0, -1):
+        limited.extend([length] * bits[length])
+    return limited
+
+# gera os codigos canonicos a partir do tamanho de cada simbolo, os codigos são atribuidos em ordem de (tamanho, simbolo)
+# retorna o dicionario {simbolo: (codigo, quantidade de bits)}
+def canonicalCodes(lengths: dict) -> dict:
+    huffman_codes = {}
+    code, previous = 0, 0
+    for symbol, length in sorted(lengths.items(), key=lambda item: (item[1], item[0])):
+        code <<= length - previous
+        huffman_codes[symbol] = (code, length)
+        code += 1
+        previous = length
+    return huffman_codes
+
+# gera os codigos de huffman canonicos e limitados a MAX_CODE_LENGTH bits a partir do dicionario {simbolo: frequencia}
+def generateHuffmanCodes(frequencies: dict) -> dict:
+    # simbolos ordenados por frequencia crescente, empates resolvidos pelo proprio simbolo para que o resultado seja deterministico
+    symbols = sorted(frequencies, key=lambda symbol: (frequencies[symbol], symbol))
+    lengths = limitCodeLengths(huffmanCodeLengths([frequencies[symbol] for symbol in symbols]))
+    return canonicalCodes(dict(zip(symbols, lengths)))
+
+# conta a frequencia de cada simbolo (zeros << 4 | tamanho) com um unico bincount, os contadores podem ser somados entre partes da imagem
+def symbolCounts(symbols: np.ndarray) -> np.ndarray:
+    return np.bincount(symbols, minlength=SYMBOL_COUNT)
+
+# gera os codigos de huffman a partir dos contadores de todos os simbolos
+def huffmanCodesFromCounts(counts: np.ndarray) -> dict:
+    present = np.flatnonzero(counts)
+    return generateHuffmanCodes(dict(zip(present.tolist(), counts[present].tolist())))
+
+# gera a tabela de huffman global a partir do array de simbolos (zeros << 4 | tamanho) de todos os blocos
+def generateGlobalHuffmanTable(symbols: np.ndarray) -> dict:
+    return huffmanCodesFromCounts(symbolCounts(symbols))
+
+# monta os arrays densos com o codigo e o tamanho de cada simbolo, indexados pelo proprio simbolo (zeros << 4 | tamanho)
+def buildEncodeTables(huffman_codes: dict) -> tuple:
+    codeWords = np.zeros(SYMBOL_COUNT, dtype=np.uint64)
+    codeLengths = np.zeros(SYMBOL_COUNT, dtype=np.uint64)
+    for symbol, (code, length) in huffman_codes.items():
+        codeWords[symbol] = code
+        codeLengths[symbol] = length
+    return codeWords, codeLengths
+
+# gera de uma só vez as palavras dos simbolos e valores gerados por rleEncodeArrays: cada simbolo vira uma palavra com o codigo de huffman
+# seguido dos bits do valor (numeros negativos em complemento de 2), retorna as palavras e seus tamanhos em bits
+def huffmanWords(symbols: np.ndarray, values: np.ndarray, huffman_codes: dict) -> tuple:
+    codeWords, codeLengths = buildEncodeTables(huffman_codes)
+    # o tamanho do valor fica nos 4 bits menos significativos do simbolo (0 no EOB)
+    sizes = (symbols & 15).astype(np.uint64)
+    masks = (np.uint64(1) << sizes) - np.uint64(1)
+    words = (codeWords[symbols] << sizes) | (values.astype(np.int64).astype(np.uint64) & masks)
+    return words, codeLengths[symbols] + sizes
+
+# codifica os simbolos e valores de uma só vez, retorna os bytes e a quantidade de bits
+def huffmanEncodeArrays(symbols: np.ndarray, values: np.ndarray, huffman_codes: dict) -> tuple:
+    return packBits(*huffmanWords(symbols, values, huffman_codes))
+
+# codifica os simbolos e valores gerados por rleEncodeArrays escrevendo os bits diretamente no BitWriter recebido
+def huffmanEncode(symbols: np.ndarray, values: np.ndarray, huffman_codes: dict, writer):
+    writer.writeBytes(*huffmanEncodeArrays(symbols, values, huffman_codes))
+
+# escreve a tabela de huffman canonica: a quantidade de codigos de cada tamanho (16 bits por tamanho) seguida dos simbolos
+# em ordem canonica, cada simbolo (zeros << 4 | tamanho) ocupa 10 bits
+def encodeHuffmanTable(huffman_codes: dict, writer):
+    ordered = sorted(huffman_codes.items(), key=lambda item: (item[1][1], item[1][0]))
+    counts = [0] * (MAX_CODE_LENGTH + 1)
+    for _, (_, length) in ordered:
+        counts[length] += 1
+    for length in range(1, MAX_CODE_LENGTH + 1):
+        writer.write(counts[length], 16)
+    for symbol, _ in ordered:
+        writer.write(symbol, 10)
+
+# le a tabela escrita por encodeHuffmanTable e reconstroi os codigos canonicos
+def decodeHuffmanTable(reader) -> dict:
+    counts = [reader.read(16) for _ in range(MAX_CODE_LENGTH)]
+    lengths = {}
+    for length, count in enumerate(counts, start=1):
+        for _ in range(count):
+            lengths[reader.read(10)] = length
+    return canonicalCodes(lengths)
+
+# constroi as tabelas de decodificação a partir do dicionario canonico {zeros << 4 | tamanho: (codigo, quantidade de bits)}
+def buildDecodeTables(huffman_codes: dict) -> tuple:
+    # simbolos em ordem canonica, o kernel devolve o indice e recupera zeros e tamanho nestes arrays
+    ordered = sorted(huffman_codes.items(), key=lambda item: (item[1][1], item[1][0]))
+    symbolRun = np.array([symbol >> 4 for symbol, _ in ordered], dtype=np.int32)
+    symbolSize = np.array([symbol & 15 for symbol, _ in ordered], dtype=np.int32)
+
+    # tabela rapida: para cada combinação de LOOKUP_BITS bits guarda o tamanho do codigo e o indice do simbolo (tamanho 0 indica codigo longo)
+    lutLength = np.zeros(1 << LOOKUP_BITS, dtype=np.int32)
+    lutSymbol = np.zeros(1 << LOOKUP_BITS, dtype=np.int32)
+    # para os codigos longos basta o maior codigo de cada tamanho e o deslocamento entre codigo e indice do simbolo
+    maxCode = np.full(MAX_CODE_LENGTH + 1, -1, dtype=np.int64)
+    valOffset = np.zeros(MAX_CODE_LENGTH + 1, dtype=np.int64)
+
+    for index, (_, (code, length)) in enumerate(ordered):
+        if length <= LOOKUP_BITS:
+            # todas as entradas que começam com o codigo levam ao mesmo simbolo
+            shift = LOOKUP_BITS - length
+            lutLength[code << shift:(code + 1) << shift] = length
+            lutSymbol[code << shift:(code + 1) << shift] = index
+        elif maxCode[length] < 0:
+            valOffset[length] = index - code
+        maxCode[length] = max(maxCode[length], code)
+
+    return lutLength, lutSymbol, maxCode, valOffset, symbolRun, symbolSize
+
+# decodifica simbolos de huffman a partir da posição pos (em bits) do buffer data ate completar total_blocks blocos
+# os valores não nulos são gravados em runs, sizes e values e blockEnds guarda para cada bloco o indice final (exclusivo) nestes arrays
+# a função para quando os arrays de saida enchem, retornando o estado (pos, block, count) para que possa ser chamada novamente
+def huffmanDecodeKernel(data, pos, block, count, total_blocks, lutLength, lutSymbol, maxCode, valOffset, symbolRun, symbolSize, runs, sizes, values, blockEnds):
+    capacity = len(runs)
+    mask = (1 << LOOKUP_BITS) - 1
+
+    while block < total_blocks:
+        if count == capacity:
+            break
+        # janela de 56 bits a partir do byte atual
+        byte = pos >> 3
+        offset = pos & 7
+        window = 0
+        for i in range(7):
+            window = (window << 8) | int(data[byte + i])
+
+        # consulta rapida com os proximos LOOKUP_BITS bits
+        bits = (window >> (56 - offset - LOOKUP_BITS)) & mask
+        length = lutLength[bits]
+        symbol = lutSymbol[bits]
+        if length == 0:
+            # caminho lento, como os codigos são canonicos basta comparar com o maior codigo de cada tamanho
+            symbol = -1
+            for L in range(LOOKUP_BITS + 1, MAX_CODE_LENGTH + 1):
+                code = (window >> (56 - offset - L)) & ((1 << L) - 1)
+                if code <= maxCode[L]:
+                    symbol = valOffset[L] + code
+                    length = L
+                    break
+            if symbol < 0:
+                raise ValueError('Codigo de huffman invalido')
+
+        run = symbolRun[symbol]
+        size = symbolSize[symbol]
+        # EOB encontrado, finaliza o bloco
+        if run == 0 and size == 0:
+            pos += length
+            blockEnds[block] = count
+            block += 1
+            continue
+
+        # le os bits do valor não nulo logo apos o codigo, relendo a janela caso ele não caiba nela
+        if offset + length + size > 56:
+            byte = (pos + length) >> 3
+            offset = (pos + length) & 7
+            window = 0
+            for i in range(7):
+                window = (window << 8) | int(data[byte + i])
+            value = (window >> (56 - offset - size)) & ((1 << size) - 1)
+        else:
+            value = (window >> (56 - offset - length - size)) & ((1 << size) - 1)
+        # ajustando complemento de 2 para numeros negativos
+        if value >> (size - 1):
+            value -= 1 << size
+        pos += length + size
+
+        runs[count] = run
+        sizes[count] = size
+        values[count] = value
+        count += 1
+
+    return pos, block, count
+
+# decodifica total_blocks blocos a partir da posição atual do reader usando o kernel informado (por padrão o kernel em python puro)
+# retorna os arrays runs, sizes, values e blockEnds e avança o reader ate o fim do codigo lido. Quem decodifica varias partes
+# com a mesma tabela pode passar as tabelas de buildDecodeTables ja prontas em tables
+def huffmanDecodeArrays(reader, huffman_codes: dict, total_blocks: int, kernel=None, tables: tuple = None) -> tuple:
+    if tables is None:
+        tables = buildDecodeTables(huffman_codes)
+    if kernel is None:
+        # em python puro listas e bytes são bem mais rapidos de indexar do que arrays de numpy
+        kernel = huffmanDecodeKernel
+        data = reader.raw
+        tables = tuple(table.tolist() for table in tables)
+        newArray = lambda n: [0] * n
+    else:
+        data = reader.data
+        newArray = lambda n: np.zeros(n, dtype=np.int32)
+
+    # a capacidade inicial é uma estimativa (um valor a cada 8 bits de codigo, limitada a 64 valores por bloco) e cresce caso não seja suficiente
+    capacity = max(64, min((reader.length - reader.pos) // 8, total_blocks * 64))
+    runs, sizes, values = newArray(capacity), newArray(capacity), newArray(capacity)
+    blockEnds = newArray(total_blocks)
+
+    pos, block, count = reader.pos, 0, 0
+    while True:
+        pos, block, count = kernel(data, pos, block, count, total_blocks, *tables, runs, sizes, values, blockEnds)
+        if block == total_blocks:
+            break
+        # arrays cheios, dobra a capacidade preservando o que ja foi decodificado
+        grown = [newArray(len(runs) * 2) for _ in range(3)]
+        for new, old in zip(grown, (runs, sizes, values)):
+            new[:count] = old[:count]
+        runs, sizes, values = grown
+
+    reader.pos = pos
+    return (np.asarray(runs[:count], dtype=np.int32), np.asarray(sizes[:count], dtype=np.int32),
+            np.asarray(values[:count], dtype=np.int32), np.asarray(blockEnds, dtype=np.int64))
+
+# codificação RLE de todos os vetores zigzag (N, 64) de uma vez. Para cada valor não nulo gera o simbolo (zeros << 4 | tamanho), onde zeros é a
+# quantidade de zeros antes dele e tamanho a quantidade de bits do valor em complemento de 2, e cada bloco termina com o EOB (simbolo 0)
+# retorna os arrays symbols e values alinhados (valor 0 no EOB) e blockOffsets, com o indice do inicio de cada bloco e o total no final
+def rleEncodeArrays(vectors: np.ndarray) -> tuple:
+    vectors = vectors.reshape(-1, 64)
+    total_blocks = len(vectors)
+    rows, cols = np.nonzero(vectors)
+    nonzero = vectors[rows, cols].astype(np.int32)
+
+    # coluna do valor não nulo anterior dentro do mesmo bloco, -1 no primeiro valor de cada bloco
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = rows[1:] != rows[:-1]
+    previous = np.empty_like(cols)
+    previous[1:] = cols[:-1]
+    previous[first] = -1
+    runs = cols - previous - 1
+    # quantidade de bits do valor em complemento de 2 (bits do modulo + 1 bit de sinal)
+    sizes = np.frexp(np.abs(nonzero))[1] + 1
+
+    # cada bloco ocupa os seus valores mais um EOB
+    blockOffsets = np.zeros(total_blocks + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=total_blocks) + 1, out=blockOffsets[1:])
+    # cada valor fica deslocado pelos EOBs de todos os blocos anteriores
+    positions = np.arange(len(rows)) + rows
+
+    symbols = np.zeros(blockOffsets[-1], dtype=np.int32)
+    values = np.zeros(blockOffsets[-1], dtype=np.int32)
+    symbols[positions] = (runs << 4) | sizes
+    values[positions] = nonzero
+    return symbols, values, blockOffsets
+
+# reconstroi os vetores zigzag de todos os blocos a partir dos arrays produzidos pela decodificação de huffman
+# length limita os vetores aos primeiros coeficientes em zigzag, usado pela decodificação em escala reduzida
+# dtype é o tipo dos vetores, int16 para os coeficientes da transformada inteira (os valores de 15 bits sempre cabem)
+def rleDecodeArrays(runs: np.ndarray, values: np.ndarray, blockEnds: np.ndarray, length: int = 64, dtype = np.int32) -> np.ndarray:
+    total_blocks = len(blockEnds)
+    counts = np.diff(blockEnds, prepend=0)
+    # posição de cada valor dentro do bloco: soma acumulada de (zeros + 1) reiniciada a cada bloco
+    steps = np.cumsum(runs.astype(np.int64) + 1)
+    before = np.concatenate(([0], steps))[blockEnds - counts]
+    positions = steps - np.repeat(before, counts) - 1
+    blocks = np.repeat(np.arange(total_blocks), counts)
+    if length < 64:
+        kept = positions < length
+        blocks, positions, values = blocks[kept], positions[kept], values[kept]
+
+    vectors = np.zeros((total_blocks, length), dtype=dtype)
+    vectors[blocks, positions] = values
+    return vectors
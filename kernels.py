@@ -0,0 +1,41 @@
+import numpy as np
+from numba import jit, types
+from bitstream import BitReader
+import huffman
+import alphacoder
+import color
+
+# versões compiladas com numba dos kernels compartilhados pelos codecs, usadas pelo codec_mt e pelos pools do codecpool
+# compiladas com nogil para que as threads do CodecThreads decodifiquem segmentos ao mesmo tempo. As assinaturas explicitas fazem a
+# compilação acontecer na importação e cache=True grava o codigo compilado em __pycache__, assim apenas a primeira execução apos uma
+# alteração dos kernels compila, as demais (e os processos dos pools) apenas carregam o codigo do disco
+
+# buffer do codigo, somente leitura pois vem de bytes ou de um mmap (arrays graváveis também são aceitos)
+CODE = types.Array(types.uint8, 1, 'C', readonly=True)
+INT32 = types.int32[::1]
+INT64 = types.int64[::1]
+
+# versão compilada do kernel de decodificação de huffman, os argumentos são os de huffmanDecodeArrays com as tabelas de buildDecodeTables
+huffmanDecodeKernel = jit(types.UniTuple(types.int64, 3)(CODE, types.int64, types.int64, types.int64, types.int64, INT32, INT32, INT64, INT64, INT32, INT32,
+                                                         INT32, INT32, INT32, INT32),
+                          nopython=True, nogil=True, cache=True)(huffman.huffmanDecodeKernel)
+# versão compilada do kernel de decodificação do alpha sem perdas
+alphaDecodeKernel = jit(types.int64(CODE, types.int64, types.uint8[::1]), nopython=True, nogil=True, cache=True)(alphacoder.alphaDecodeKernel)
+
+# versão compilada do final da decodificação (ver color.decodePixels), com o alpha sem perdas em uint8 ou o alpha da DCT (e o alpha reduzido
+# pela escala de decodificação) em float32 e os eixos da ampliação das chrominancias de resample
+PLANE = types.float32[:, ::1]
+OUTPUT = types.uint8[:, :, ::1]
+WEIGHTS = types.float32[::1]
+rgbKernel = jit([types.void(PLANE, PLANE, PLANE, alpha, types.float32, INT64, INT64, WEIGHTS, INT64, INT64, WEIGHTS, OUTPUT) for alpha in (PLANE, types.uint8[:, ::1])],
+                nopython=True, nogil=True, cache=True)(color.rgbKernel)
+
+# executa os kernels uma vez sobre um codigo minimo, garantindo que estejam compilados ou carregados do cache antes da primeira imagem
+def warmup():
+    codes = {0: (0, 1), 1: (1, 1)}
+    reader = BitReader(bytes([0]))
+    huffman.huffmanDecodeArrays(reader, codes, 1, huffmanDecodeKernel)
+    reader = BitReader(bytes([0, 0x80]))
+    alphacoder.decodeAlpha(reader, (1, 1), alphaDecodeKernel)
+    plane = np.zeros((8, 8), dtype=np.float32)
+    color.decodePixels(plane, plane, plane, None, 2, 2, 8, 8, kernel=rgbKernel)
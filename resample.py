@@ -0,0 +1,60 @@
+import numpy as np
+
+# reamostragem vetorizada dos planos, usada nas chrominancias pelos codecs e pelas funções de escala de functions.py. As operações são
+# separaveis (primeiro nas linhas e depois nas colunas) e trabalham sobre o plano inteiro, sem loops por pixel
+
+# modos de redução das chrominancias no encode: 'decimate' mantem a primeira amostra de cada celula ssv x ssh (padrão, como subSampling)
+# e 'box' usa a media da celula, com as amostras centradas na celula
+DOWNSAMPLING = ('decimate', 'box')
+# modos de ampliação das chrominancias no decode: 'replicate' repete cada amostra (padrão, como upSampling) e 'bilinear' interpola entre
+# as amostras vizinhas, considerando a posição das amostras gravada no arquivo
+UPSAMPLING = ('replicate', 'bilinear')
+
+# media de cada celula de a x b amostras do plano (em float32), as celulas das bordas podem ser menores e usam apenas as amostras existentes
+# o plano pode ter outras dimensões depois das duas primeiras (como os canais de uma imagem), que são mantidas
+def boxDownsample(plane:np.ndarray, a:int, b:int) -> np.ndarray:
+    # as somas são feitas com fatias de passo a e b (a amostra k de cada celula de todas as celulas de uma vez)
+    rows = plane[::a].astype(np.float32)
+    for k in range(1, a):
+        part = plane[k::a]
+        rows[:len(part)] += part
+    sums = rows[:, ::b].copy()
+    for k in range(1, b):
+        part = rows[:, k::b]
+        sums[:, :part.shape[1]] += part
+    # as celulas completas tem a * b amostras, apenas a ultima linha e a ultima coluna de celulas podem ser menores
+    sums /= np.float32(a * b)
+    if plane.shape[0] % a:
+        sums[-1] *= np.float32(a / (plane.shape[0] % a))
+    if plane.shape[1] % b:
+        sums[:, -1] *= np.float32(b / (plane.shape[1] % b))
+    return sums
+
+# indices das duas amostras vizinhas e peso da segunda para cada uma das size posições ampliadas por factor de um eixo com length amostras
+# com centered as amostras ficam no centro de cada celula (ver boxDownsample), senão na primeira posição dela. Nas bordas a amostra é repetida
+def interpolationAxis(size:int, factor:int, length:int, centered:bool) -> tuple:
+    positions = np.arange(size, dtype=np.float64)
+    positions = (positions + 0.5) / factor - 0.5 if centered else positions / factor
+    positions = np.clip(positions, 0, length - 1)
+    first = np.floor(positions).astype(np.int64)
+    second = np.minimum(first + 1, length - 1)
+    return first, second, (positions - first).astype(np.float32)
+
+# eixo da ampliação por repetição no mesmo formato de interpolationAxis, a segunda amostra tem sempre peso 0
+def replicateAxis(size:int, factor:int) -> tuple:
+    first = np.arange(size, dtype=np.int64) // factor
+    return first, first, np.zeros(size, dtype=np.float32)
+
+# aplica os eixos de ampliação (como os de interpolationAxis) nas linhas e nas colunas do plano, as dimensões depois das duas primeiras são mantidas
+def interpolate(plane:np.ndarray, rowAxis:tuple, colAxis:tuple) -> np.ndarray:
+    (r0, r1, rw), (c0, c1, cw) = rowAxis, colAxis
+    extra = (1,) * (plane.ndim - 2)
+    plane = plane.astype(np.float32, copy=False)
+    rows = plane[r0] + rw.reshape((-1, 1) + extra) * (plane[r1] - plane[r0])
+    return rows[:, c0] + cw.reshape((-1,) + extra) * (rows[:, c1] - rows[:, c0])
+
+# amplia o plano por a nas linhas e b nas colunas com interpolação bilinear, gerando height x width amostras. Apenas as primeiras
+# ceil(height / a) x ceil(width / b) amostras do plano são usadas, o restante (como o padding dos blocos) é ignorado. Assim como em
+# boxDownsample, as dimensões depois das duas primeiras são mantidas
+def bilinearUpsample(plane:np.ndarray, a:int, b:int, height:int, width:int, centered:bool = True) -> np.ndarray:
+    return interpolate(plane, interpolationAxis(height, a, -(-height // a), centered), interpolationAxis(width, b, -(-width // b), centered))
@@ -0,0 +1,95 @@
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# coleta de metricas dos codecs no lugar das mensagens impressas: os codecs são silenciosos e, quando um Stats é passado em stats, registram
+# nele o tempo de cada etapa, contagens (blocos, simbolos, tamanho da tabela de huffman, bits de cada canal, taxa de compressão) e o tamanho
+# dos principais buffers. callback, quando informado, é chamado a cada registro com (tipo, nome, valor), sendo o tipo 'stage', 'count',
+# 'buffer' ou 'memory', permitindo enviar as metricas para outro sistema enquanto a imagem é processada. asDict e toJSON exportam tudo no final
+# memory ativa o modo de perfil de memoria: o tracemalloc (que tambem enxerga os buffers do numpy) é iniciado na primeira etapa e cada
+# etapa registra o pico de memoria alocada acima do inicio dela e a memoria que continua alocada no final. O pico total é medido a partir
+# da primeira etapa, sem contar a imagem de entrada. Somente o processo atual é medido, então com o backend de processos do codec_mt
+# a memoria dos processos do pool e dos blocos compartilhados fica de fora (use o codec.py ou o backend de threads)
+class Stats:
+    def __init__(self, callback = None, memory:bool = False):
+        self.callback = callback
+        # segundos acumulados de cada etapa
+        self.stages = {}
+        # ultimo valor de cada contagem
+        self.counts = {}
+        # maior tamanho em bytes de cada buffer
+        self.buffers = {}
+        # modo de perfil de memoria: pico e memoria liquida (bytes) de cada etapa e pico total
+        self.traceMemory = memory
+        self.memory = {}
+        self.origin = None
+        self.peak = 0
+        self.started = False
+
+    def emit(self, kind:str, name:str, value):
+        if self.callback is not None:
+            self.callback(kind, name, value)
+
+    # memoria alocada atualmente, atualizando o pico total com o pico desde a ultima leitura
+    def tracedMemory(self) -> int:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started = True
+        current, peak = tracemalloc.get_traced_memory()
+        if self.origin is None:
+            self.origin = current
+        self.peak = max(self.peak, peak - self.origin)
+        tracemalloc.reset_peak()
+        return current
+
+    # mede o tempo do bloco with, acumulando quando a mesma etapa é executada mais de uma vez (por exemplo em cada conjunto de faixas)
+    @contextmanager
+    def stage(self, name:str):
+        base = self.tracedMemory() if self.traceMemory else 0
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+            self.emit('stage', name, seconds)
+            if self.traceMemory:
+                peak = tracemalloc.get_traced_memory()[1] - base
+                usage = {'peak': peak, 'net': self.tracedMemory() - base}
+                previous = self.memory.get(name)
+                if previous is not None:
+                    usage = {'peak': max(previous['peak'], usage['peak']), 'net': previous['net'] + usage['net']}
+                self.memory[name] = usage
+                self.emit('memory', name, usage)
+
+    def count(self, name:str, value):
+        self.counts[name] = value
+        self.emit('count', name, value)
+
+    # recebe um array (ou uma lista de arrays) ou diretamente a quantidade de bytes
+    def buffer(self, name:str, value):
+        if isinstance(value, (list, tuple)):
+            nbytes = sum(item.nbytes for item in value if item is not None)
+        else:
+            nbytes = getattr(value, 'nbytes', value)
+        self.buffers[name] = max(self.buffers.get(name, 0), int(nbytes))
+        self.emit('buffer', name, int(nbytes))
+
+    # encerra o tracemalloc quando foi iniciado por este Stats, incluindo no pico total o que foi alocado depois da ultima etapa
+    def stop(self):
+        if self.traceMemory and tracemalloc.is_tracing():
+            self.tracedMemory()
+            if self.started:
+                tracemalloc.stop()
+                self.started = False
+                self.origin = None
+
+    def asDict(self) -> dict:
+        result = {'stages': dict(self.stages), 'counts': dict(self.counts), 'buffers': dict(self.buffers)}
+        if self.traceMemory:
+            result['memory'] = {'peak': self.peak, 'stages': dict(self.memory)}
+        return result
+
+    def toJSON(self, **kwargs) -> str:
+        return json.dumps(self.asDict(), **kwargs)
@@ -0,0 +1,249 @@
+import numpy as np
+from bitstream import packBits, unpackBits, BitReader
+from transform import BLOCKSIZE
+from huffman import huffmanWords, buildEncodeTables, buildDecodeTables, huffmanDecodeArrays, rleEncodeArrays
+from alphacoder import alphaEncodeArrays, decodeAlpha
+
+# organização dos blocos no arquivo em faixas horizontais (MCU strips), compartilhada pelos codecs. Cada faixa cobre 8 * ssv linhas da
+# imagem: ssv linhas de blocos de Y, as mesmas linhas do alpha quando ele passa pela DCT e uma linha de blocos de Cr e de Cb, nesta ordem.
+# Quando o alpha é codificado sem perdas as sequencias das linhas da faixa vem logo apos os seus blocos. Assim o arquivo pode ser escrito
+# e lido faixa a faixa sem precisar de nenhum plano inteiro na memoria. As tabelas de quantização ficam antes da primeira faixa
+
+# quantidade de linhas da imagem cobertas por cada faixa
+def stripHeight(ssv:int) -> int:
+    return BLOCKSIZE * max(ssv, 1)
+
+# recebe os shapes com padding de Y e das chrominancias e retorna a ordem em que os blocos dos planos concatenados (Y, alpha quando
+# codificado pela DCT, Cr e Cb, cada um com os blocos em ordem de linhas) aparecem no arquivo e o indice final de cada faixa nesta ordem
+def stripOrder(yShape:tuple, cShape:tuple, ssv:int, dctAlpha:bool) -> tuple:
+    yRows, yCols = yShape[0] // BLOCKSIZE, yShape[1] // BLOCKSIZE
+    cRows, cCols = cShape[0] // BLOCKSIZE, cShape[1] // BLOCKSIZE
+    # faixa de cada bloco de cada plano
+    yStrips = np.repeat(np.arange(yRows) // max(ssv, 1), yCols)
+    cStrips = np.repeat(np.arange(cRows), cCols)
+    planes = [yStrips, yStrips, cStrips, cStrips] if dctAlpha else [yStrips, cStrips, cStrips]
+    # ordenando pela chave (faixa, plano), a ordenação estavel mantem a ordem dos blocos dentro de cada plano
+    keys = np.concatenate([strips * 4 + index for index, strips in enumerate(planes)])
+    order = np.argsort(keys, kind='stable')
+    stripEnds = np.cumsum(np.bincount(keys // 4, minlength=cRows))
+    return order, stripEnds
+
+# codifica em RLE os blocos ja em zigzag dos planos de um conjunto de faixas ([Y, alpha, Cr, Cb] ou [Y, Cr, Cb]) na ordem do arquivo
+# retorna os simbolos, os valores e o indice final de cada faixa nos simbolos
+def stripSymbols(planes:list, yShape:tuple, cShape:tuple, ssv:int) -> tuple:
+    order, stripEnds = stripOrder(yShape, cShape, ssv, len(planes) == 4)
+    symbols, values, blockOffsets = rleEncodeArrays(np.concatenate(planes)[order])
+    return symbols, values, blockOffsets[stripEnds]
+
+# quantidade de bits de cada plano ([Y, alpha, Cr, Cb] ou [Y, Cr, Cb]) no codigo, a partir dos simbolos das faixas na ordem do arquivo (sem
+# as tabelas de quantização). Cada simbolo ocupa o seu codigo de huffman mais os bits do valor e cada bloco termina no EOB (simbolo 0)
+def planeBits(symbols:np.ndarray, huffman_codes:dict, yShape:tuple, cShape:tuple, ssv:int, dctAlpha:bool) -> list:
+    order, _ = stripOrder(yShape, cShape, ssv, dctAlpha)
+    _, lengths = buildEncodeTables(huffman_codes)
+    bits = lengths[symbols].astype(np.int64) + (symbols & 15)
+    eob = (symbols == 0).astype(np.int64)
+    blockBits = np.bincount(np.cumsum(eob) - eob, weights=bits, minlength=len(order))
+    yBlocks = (yShape[0] // BLOCKSIZE) * (yShape[1] // BLOCKSIZE)
+    cBlocks = (cShape[0] // BLOCKSIZE) * (cShape[1] // BLOCKSIZE)
+    sizes = [yBlocks, yBlocks, cBlocks, cBlocks] if dctAlpha else [yBlocks, cBlocks, cBlocks]
+    # plano de cada bloco na ordem do arquivo
+    planes = np.repeat(np.arange(len(sizes)), sizes)[order]
+    return np.bincount(planes, weights=blockBits, minlength=len(sizes)).astype(np.int64).tolist()
+
+# divide os bits do codigo entre o cabeçalho, cada canal, as tabelas de quantização e o indice de regiões. Os bits restantes das faixas são
+# do alpha sem perdas ou, sem ele, do alinhamento dos segmentos
+def codeBits(symbols:np.ndarray, qtSymbols:np.ndarray, huffman_codes:dict, yShape:tuple, cShape:tuple, ssv:int, dctAlpha:bool, losslessAlpha:bool,
+             headerBits:int, stripsBits:int, totalBits:int) -> dict:
+    names = ['y', 'alpha', 'cr', 'cb'] if dctAlpha else ['y', 'cr', 'cb']
+    bits = dict(zip(names, planeBits(symbols, huffman_codes, yShape, cShape, ssv, dctAlpha)))
+    _, lengths = buildEncodeTables(huffman_codes)
+    bits['tabelas'] = int(lengths[qtSymbols].sum() + (qtSymbols & 15).sum())
+    bits['alpha' if losslessAlpha else 'alinhamento'] = stripsBits - sum(bits.values())
+    bits['cabecalho'] = headerBits
+    bits['indice'] = totalBits - headerBits - stripsBits
+    return bits
+
+# intercala duas sequencias divididas em faixas (first[k] seguido de second[k] para cada faixa k), first e second são tuplas de arrays
+# alinhados e firstEnds/secondEnds o indice final de cada faixa em cada sequencia
+def interleaveStrips(first:tuple, firstEnds:np.ndarray, second:tuple, secondEnds:np.ndarray) -> tuple:
+    firstStarts = np.r_[0, firstEnds[:-1]]
+    secondStarts = np.r_[0, secondEnds[:-1]]
+    # cada elemento é deslocado pela quantidade de elementos da outra sequencia que vem antes dele
+    firstPositions = np.arange(firstEnds[-1]) + np.repeat(secondStarts, firstEnds - firstStarts)
+    secondPositions = np.arange(secondEnds[-1]) + np.repeat(firstEnds, secondEnds - secondStarts)
+    merged = []
+    for a, b in zip(first, second):
+        out = np.empty(len(a) + len(b), dtype=a.dtype)
+        out[firstPositions] = a
+        out[secondPositions] = b
+        merged.append(out)
+    return tuple(merged)
+
+# indica se a faixa strip (indice global na imagem) começa um novo segmento, com restartInterval faixas por segmento (0 desativa)
+def isRestart(strip:int, restartInterval:int) -> bool:
+    return restartInterval > 0 and strip > 0 and strip % restartInterval == 0
+
+# codifica em huffman os simbolos e valores de um conjunto de faixas (symbolEnds é o indice final de cada faixa nos simbolos) e, quando o
+# alpha sem perdas é informado (com as linhas destas faixas), intercala as suas sequencias apos os blocos de cada faixa
+# com restartInterval o codigo é dividido em segmentos de restartInterval faixas, cada segmento começa alinhado em um byte para poder
+# ser decodificado de forma independente. firstStrip é o indice da primeira faixa na imagem
+# retorna a posição em bytes no writer do inicio de cada segmento iniciado neste conjunto e, com positions, a posição em bits no writer do
+# inicio de cada bloco (na ordem do arquivo) e das sequencias do alpha de cada faixa (None sem alpha sem perdas), usadas por regionEntries
+def encodeStrips(symbols:np.ndarray, values:np.ndarray, symbolEnds:np.ndarray, huffman_codes:dict, alpha:np.ndarray, ssv:int, writer,
+                 restartInterval:int = 0, firstStrip:int = 0, positions:bool = False) -> tuple:
+    words, lengths = huffmanWords(symbols, values, huffman_codes)
+    wordEnds = symbolEnds
+    alphaStarts = np.zeros(len(symbolEnds), dtype=np.int64)
+    if alpha is not None:
+        alphaWords, alphaLengths, alphaEnds = alphaEncodeArrays(alpha, stripHeight(ssv))
+        words, lengths = interleaveStrips((words, lengths), symbolEnds, (alphaWords, alphaLengths), alphaEnds)
+        wordEnds = symbolEnds + alphaEnds
+        alphaStarts = np.r_[0, alphaEnds[:-1]]
+
+    # as palavras são empacotadas de uma vez entre cada ponto de reinicio
+    restarts = [k for k in range(len(symbolEnds)) if isRestart(firstStrip + k, restartInterval)]
+    bounds = [0] + [int(wordEnds[k - 1]) if k > 0 else 0 for k in restarts] + [len(words)]
+    offsets, segmentBits = [], []
+    for i in range(len(bounds) - 1):
+        if i > 0:
+            writer.alignToByte()
+            offsets.append(len(writer) // 8)
+        segmentBits.append(len(writer))
+        writer.writeBytes(*packBits(words[bounds[i]:bounds[i + 1]], lengths[bounds[i]:bounds[i + 1]]))
+    if not positions:
+        return offsets, None, None
+
+    # posição de cada palavra: inicio do seu segmento mais os tamanhos das palavras anteriores do mesmo segmento
+    starts = np.r_[0, np.cumsum(lengths, dtype=np.int64)[:-1]]
+    segment = np.searchsorted(bounds[1:-1], np.arange(len(words)), side='right')
+    wordBits = np.asarray(segmentBits, dtype=np.int64)[segment] + starts - starts[np.asarray(bounds[:-1])[segment]]
+    # cada bloco termina com um EOB, as palavras dos blocos de cada faixa estão deslocadas pelas palavras do alpha das faixas anteriores
+    blockStarts = np.r_[0, np.flatnonzero(symbols == 0)[:-1] + 1]
+    blockStarts = blockStarts + alphaStarts[np.searchsorted(symbolEnds, blockStarts, side='right')]
+    alphaBits = wordBits[symbolEnds + alphaStarts] if alpha is not None else None
+    return offsets, wordBits[blockStarts], alphaBits
+
+# decodifica as faixas a partir da posição atual do reader, blockCounts é a quantidade de blocos de cada faixa (incluindo as tabelas de
+# quantização na primeira). Sem alpha sem perdas os blocos entre cada ponto de reinicio são lidos de uma vez, caso contrario cada faixa é
+# seguida das suas linhas do alpha (alphaShape é o shape do plano destas faixas). Retorna runs, sizes, values e blockEnds como
+# huffmanDecodeArrays e o plano alpha (ou None). tables permite reaproveitar as tabelas de decodificação entre chamadas (ver buildDecodeTables)
+# restartInterval e firstStrip são os mesmos usados em encodeStrips, o reader é alinhado no inicio de cada segmento
+def decodeStrips(reader, huffman_codes:dict, blockCounts:np.ndarray, ssv:int, alphaShape:tuple = None, huffmanKernel=None, alphaKernel=None,
+                 tables:tuple = None, restartInterval:int = 0, firstStrip:int = 0) -> tuple:
+    if tables is None:
+        tables = buildDecodeTables(huffman_codes)
+    rows = stripHeight(ssv)
+    strips = len(blockCounts)
+    # faixas que iniciam cada grupo de blocos decodificado de uma vez
+    if alphaShape is None:
+        starts = [0] + [k for k in range(1, strips) if isRestart(firstStrip + k, restartInterval)]
+    else:
+        starts = list(range(strips))
+    starts.append(strips)
+
+    parts, alphaParts = [], []
+    for first, last in zip(starts[:-1], starts[1:]):
+        if isRestart(firstStrip + first, restartInterval):
+            reader.alignToByte()
+        parts.append(huffmanDecodeArrays(reader, huffman_codes, int(np.sum(blockCounts[first:last])), huffmanKernel, tables))
+        if alphaShape is not None:
+            alphaParts.append(decodeAlpha(reader, (min(rows, alphaShape[0] - first * rows), alphaShape[1]), alphaKernel))
+
+    runs, sizes, values, blockEnds = concatenateParts(parts)
+    return runs, sizes, values, blockEnds, np.concatenate(alphaParts) if alphaShape is not None else None
+
+# junta os resultados de varias chamadas de huffmanDecodeArrays (ou decodeStrips, ignorando o alpha) em sequencia, os indices finais
+# dos blocos de cada parte são relativos ao inicio da parte
+def concatenateParts(parts:list) -> tuple:
+    if len(parts) == 1:
+        return parts[0][:4]
+    offsets = np.cumsum([0] + [len(part[0]) for part in parts[:-1]])
+    runs, sizes, values = (np.concatenate([part[i] for part in parts]) for i in range(3))
+    blockEnds = np.concatenate([part[3] + offset for part, offset in zip(parts, offsets)])
+    return runs, sizes, values, blockEnds
+
+# divide as faixas da imagem nos segmentos independentes, retornando a primeira e a ultima faixa (exclusiva) de cada segmento
+def segmentRanges(totalStrips:int, restartInterval:int) -> list:
+    return [(first, min(first + restartInterval, totalStrips)) for first in range(0, totalStrips, restartInterval)]
+
+# decodifica um unico segmento a partir da sua posição em bytes no codigo (data ja com os bytes de folga do BitReader), os demais parametros
+# são os de decodeStrips para as faixas do segmento. Usado pelos decodificadores que processam os segmentos em paralelo
+def decodeSegment(data:bytes, offset:int, huffman_codes:dict, blockCounts:np.ndarray, ssv:int, alphaShape:tuple, restartInterval:int, firstStrip:int,
+                  huffmanKernel=None, alphaKernel=None, tables:tuple = None) -> tuple:
+    reader = BitReader(data, offset * 8, padded=True)
+    return decodeStrips(reader, huffman_codes, blockCounts, ssv, alphaShape, huffmanKernel, alphaKernel, tables, restartInterval, firstStrip)
+
+# indice de regiões: para cada faixa a posição em bits do bloco de cada interval colunas de blocos de cada linha de blocos da faixa (as linhas
+# de Y, do alpha pela DCT, de Cr e de Cb, nesta ordem) seguida da posição das sequencias do alpha sem perdas. Como o DC não é diferencial
+# cada bloco pode ser decodificado de forma independente, permitindo decodificar apenas os blocos de uma região da imagem (ver decodeRegion)
+
+# quantidade de linhas de blocos de Y de cada faixa e de entradas do indice de cada faixa
+def regionLayout(yShape:tuple, cShape:tuple, ssv:int, dctAlpha:bool, losslessAlpha:bool, interval:int) -> tuple:
+    yRows, yCols = yShape[0] // BLOCKSIZE, yShape[1] // BLOCKSIZE
+    cRows, cCols = cShape[0] // BLOCKSIZE, cShape[1] // BLOCKSIZE
+    strips = np.arange(cRows)
+    rows = np.minimum((strips + 1) * max(ssv, 1), yRows) - strips * max(ssv, 1)
+    entries = rows * (2 if dctAlpha else 1) * -(-yCols // interval) + 2 * -(-cCols // interval) + (1 if losslessAlpha else 0)
+    return rows, entries
+
+# seleciona as entradas do indice das faixas de um conjunto a partir das posições retornadas por encodeStrips (sem as tabelas de
+# quantização), yShape e cShape são os shapes com padding do conjunto. Retorna uma lista com as entradas de cada faixa
+def regionEntries(blockBits:np.ndarray, alphaBits:np.ndarray, yShape:tuple, cShape:tuple, ssv:int, dctAlpha:bool, interval:int) -> list:
+    yRows, yCols = yShape[0] // BLOCKSIZE, yShape[1] // BLOCKSIZE
+    cRows, cCols = cShape[0] // BLOCKSIZE, cShape[1] // BLOCKSIZE
+    # posição no arquivo de cada bloco dos planos concatenados
+    order, _ = stripOrder(yShape, cShape, ssv, dctAlpha)
+    filePositions = np.empty_like(order)
+    filePositions[order] = np.arange(len(order))
+    ySize, cSize = yRows * yCols, cRows * cCols
+    cStart = ySize * (2 if dctAlpha else 1)
+
+    entries = []
+    for strip in range(cRows):
+        rows = np.arange(strip * max(ssv, 1), min((strip + 1) * max(ssv, 1), yRows))
+        yBlocks = (rows[:, None] * yCols + np.arange(0, yCols, interval)).ravel()
+        cBlocks = strip * cCols + np.arange(0, cCols, interval)
+        planes = [yBlocks, yBlocks + ySize] if dctAlpha else [yBlocks]
+        stripEntries = blockBits[filePositions[np.concatenate(planes + [cBlocks + cStart, cBlocks + cStart + cSize])]]
+        if alphaBits is not None:
+            stripEntries = np.r_[stripEntries, alphaBits[strip]]
+        entries.append(stripEntries)
+    return entries
+
+# escreve o indice no final do codigo: o intervalo (16 bits), a quantidade de bits das posições iniciais das faixas e das posições
+# relativas das entradas (6 bits cada), a posição inicial de cada faixa, as posições de cada entrada relativas ao inicio da sua faixa e,
+# depois de alinhar, a posição em bytes do inicio do indice (32 bits) como ultimos 4 bytes do codigo
+def encodeRegionIndex(entries:list, interval:int, writer):
+    writer.alignToByte()
+    start = len(writer) // 8
+    bases = np.array([stripEntries[0] for stripEntries in entries], dtype=np.uint64)
+    relative = np.concatenate([stripEntries - stripEntries[0] for stripEntries in entries]).astype(np.uint64)
+    baseBits = max(int(bases.max()).bit_length(), 1)
+    relativeBits = max(int(relative.max()).bit_length(), 1)
+    writer.write(interval, 16)
+    writer.write(baseBits, 6)
+    writer.write(relativeBits, 6)
+    writer.writeBytes(*packBits(bases, np.full(len(bases), baseBits, dtype=np.uint64)))
+    writer.writeBytes(*packBits(relative, np.full(len(relative), relativeBits, dtype=np.uint64)))
+    writer.alignToByte()
+    writer.write(start, 32)
+
+# le o indice de um codigo que começa na posição em bits codeStart do reader, start é a posição em bytes do indice no codigo e os demais
+# parametros são os de regionLayout. Retorna o intervalo, a quantidade de linhas de blocos de Y de cada faixa e uma função que recebe a
+# faixa e os indices das entradas dentro da faixa e retorna as suas posições em bits no reader
+def decodeRegionIndex(reader, codeStart:int, start:int, yShape:tuple, cShape:tuple, ssv:int, dctAlpha:bool, losslessAlpha:bool) -> tuple:
+    reader.pos = codeStart + start * 8
+    interval = reader.read(16)
+    baseBits = reader.read(6)
+    relativeBits = reader.read(6)
+    rows, entries = regionLayout(yShape, cShape, ssv, dctAlpha, losslessAlpha, interval)
+    entryStarts = np.r_[0, np.cumsum(entries)[:-1]]
+    basesStart = reader.pos
+    relativeStart = basesStart + len(entries) * baseBits
+
+    def lookup(strip:int, indices:np.ndarray) -> np.ndarray:
+        base = unpackBits(reader.data, np.array([basesStart + strip * baseBits]), baseBits)[0]
+        relative = unpackBits(reader.data, relativeStart + (entryStarts[strip] + np.asarray(indices, dtype=np.int64)) * relativeBits, relativeBits)
+        return (relative + base).astype(np.int64) + codeStart
+
+    return interval, rows, lookup
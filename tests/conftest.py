@@ -0,0 +1,5 @@
+import sys
+import os
+
+# permite importar os modulos do codec rodando o pytest da raiz do repositorio ou de dentro da pasta tests
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
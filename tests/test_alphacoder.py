@@ -0,0 +1,82 @@
+import os
+import numpy as np
+import pytest
+import codec
+import codec_mt
+import kernels
+from alphacoder import MAX_ALPHA_RUN, alphaEncodeArrays, decodeAlpha
+from bitstream import BitWriter, BitReader, packBits
+from strips import stripHeight
+
+# o alpha sem perdas (alphaMode = 'lossless', padrão) deve voltar exatamente igual, inclusive com sequencias maiores que MAX_ALPHA_RUN
+# (divididas em varias palavras) e sequencias que atravessam o limite entre duas faixas (interrompidas no inicio de cada faixa)
+
+# altura e largura das mascaras, com ssv = 3 a primeira faixa tem 24 x 3000 pixels, uma sequencia maior que MAX_ALPHA_RUN
+HEIGHT, WIDTH, SSV = 40, 3000, 3
+
+# mascaras de teste com HEIGHT x WIDTH pixels
+def masks() -> dict:
+    yy, xx = np.mgrid[0:HEIGHT, 0:WIDTH]
+    return {
+        'opaca': np.full((HEIGHT, WIDTH), 255, dtype=np.uint8),
+        'transparente': np.zeros((HEIGHT, WIDTH), dtype=np.uint8),
+        # faixa transparente das linhas 10 a 30, atravessando os limites das faixas de 24 linhas (e de 16 linhas com ssv = 2)
+        'faixa': np.where((yy >= 10) & (yy < 30), 0, 255).astype(np.uint8),
+        'circulo': np.where((yy - 20) ** 2 + (xx - 1500) ** 2 < 400, 255, 0).astype(np.uint8),
+        'gradiente': (xx * 255 // (WIDTH - 1)).astype(np.uint8),
+        'ruido': np.random.default_rng(9).integers(0, 256, (HEIGHT, WIDTH)).astype(np.uint8),
+    }
+
+# codifica o plano com alphaEncodeArrays e decodifica com o kernel informado (None para o kernel em python puro)
+def alphaRoundtrip(alpha:np.ndarray, rows:int, kernel) -> np.ndarray:
+    words, lengths, _ = alphaEncodeArrays(alpha, rows)
+    writer = BitWriter()
+    writer.writeBytes(*packBits(words, lengths))
+    reader = BitReader(writer.getBytes())
+    decoded = decodeAlpha(reader, alpha.shape, kernel)
+    assert reader.pos == int(lengths.sum())
+    return decoded
+
+@pytest.mark.parametrize('name', list(masks()))
+@pytest.mark.parametrize('kernel', [None, kernels.alphaDecodeKernel])
+def test_alpha_coder(name, kernel):
+    alpha = masks()[name]
+    assert np.array_equal(alphaRoundtrip(alpha, stripHeight(SSV), kernel), alpha)
+
+# as sequencias são divididas em palavras de no maximo MAX_ALPHA_RUN pixels e interrompidas no inicio de cada faixa
+def test_long_runs():
+    rows = stripHeight(SSV)
+    words, lengths, stripEnds = alphaEncodeArrays(masks()['opaca'], rows)
+    runs = [rows * WIDTH, (HEIGHT - rows) * WIDTH]
+    assert runs[0] > MAX_ALPHA_RUN
+    assert len(words) == sum(-(-run // MAX_ALPHA_RUN) for run in runs)
+    assert list(stripEnds) == [-(-runs[0] // MAX_ALPHA_RUN), len(words)]
+
+@pytest.mark.parametrize('name', list(masks()))
+@pytest.mark.parametrize('ssv', [SSV, 2])
+@pytest.mark.parametrize('restartInterval', [0, 1])
+def test_alpha_exact(name, ssv, restartInterval, tmp_path):
+    alpha = masks()[name]
+    yy, xx = np.mgrid[0:HEIGHT, 0:WIDTH]
+    image = np.dstack([(xx % 256).astype(np.uint8), (yy * 6).astype(np.uint8), np.full((HEIGHT, WIDTH), 90, dtype=np.uint8), alpha])
+    target = os.path.join(tmp_path, 'alpha')
+    encoded = codec.encode(image, ssv=ssv, restartInterval=restartInterval, outputname=target)
+    assert codec_mt.encode(image, ssv=ssv, restartInterval=restartInterval, outputname=target + '_mt', backend='thread') == encoded
+    assert np.array_equal(codec.decode(target + '.gpeg')[:, :, 3], alpha)
+    assert np.array_equal(codec_mt.decode(target + '.gpeg', backend='thread')[:, :, 3], alpha)
+    streamed = np.concatenate([rows for _, rows in codec.decodeStream(target + '.gpeg', stripsPerChunk=1)])
+    assert np.array_equal(streamed[:, :, 3], alpha)
+
+# nas mascaras tipicas (sequencias de 0 e 255) o alpha sem perdas de compress/deCompress volta exato e custa bem menos que o alpha da DCT,
+# que continua disponivel com alphaMode = 'dct'
+@pytest.mark.parametrize('name', ['opaca', 'transparente', 'faixa', 'circulo'])
+def test_alpha_size(name):
+    alpha = masks()[name]
+    yy, xx = np.mgrid[0:HEIGHT, 0:WIDTH]
+    image = np.dstack([(xx % 256).astype(np.uint8), (yy * 6).astype(np.uint8), np.full((HEIGHT, WIDTH), 90, dtype=np.uint8), alpha])
+    compressed = lambda pixels, alphaMode: codec.compress(*codec.subSampling(2, 2, codec.toYCrCb(pixels)), codec.QTY, codec.QTC, 2, 2, alphaMode)
+    rgb = len(compressed(image[:, :, :3], 'lossless'))
+    lossless, dct = compressed(image, 'lossless'), compressed(image, 'dct')
+    assert np.array_equal(codec.deCompress(lossless)[3], alpha)
+    assert codec.deCompress(dct)[3] is not None
+    assert len(lossless) - rgb < (len(dct) - rgb) / 4
@@ -0,0 +1,101 @@
+import io
+import numpy as np
+import pytest
+import bitstream
+from bitstream import BitWriter, BitReader, packBits, unpackBits
+
+# o codigo é escrito e lido em bytes empacotados: os bits saem do mais para o menos significativo, na mesma ordem da antiga string de
+# '0' e '1', e o BitReader le de volta exatamente os campos escritos pelo BitWriter, por packBits ou por writeBytes em qualquer alinhamento
+
+# campos (valor, bits) aleatorios de 0 a 57 bits, incluindo campos de tamanho 0
+def randomFields(count:int, seed:int) -> list:
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(0, 58, count)
+    return [(int(rng.integers(0, 1 << int(n), dtype=np.uint64)) if n else 0, int(n)) for n in lengths]
+
+# os mesmos campos como a string de '0' e '1' usada antes do bitstream, completada com zeros ate o fim do ultimo byte
+def bitString(fields:list) -> str:
+    bits = ''.join(format(value, f'0{n}b') for value, n in fields if n)
+    return bits + '0' * (-len(bits) % 8)
+
+def toBytes(bits:str) -> bytes:
+    return bytes(int(bits[i:i + 8], 2) for i in range(0, len(bits), 8))
+
+@pytest.mark.parametrize('seed', range(5))
+def test_write_read(seed):
+    fields = randomFields(500, seed)
+    writer = BitWriter()
+    for value, n in fields:
+        writer.write(value, n)
+    assert len(writer) == sum(n for _, n in fields)
+    assert writer.getBytes() == toBytes(bitString(fields))
+    reader = BitReader(writer.getBytes())
+    for value, n in fields:
+        assert reader.peek(n) == value
+        assert reader.read(n) == value
+    assert reader.pos == len(writer)
+
+# writeBytes copia os bits de outro buffer a partir de qualquer posição, alinhada ou não
+@pytest.mark.parametrize('offset', range(8))
+@pytest.mark.parametrize('nbits', [0, 5, 8, 13, 64, 1001])
+def test_write_bytes(offset, nbits):
+    fields = randomFields(200, nbits)
+    source = BitWriter()
+    for value, n in fields:
+        source.write(value, n)
+    data = source.getBytes()
+    writer = BitWriter()
+    writer.write(0b1011011, offset)
+    writer.writeBytes(data, nbits)
+    writer.write(0b101, 3)
+    bits = format(0b1011011 & ((1 << offset) - 1), f'0{offset}b') if offset else ''
+    expected = bits + bitString(fields)[:nbits] + '101'
+    assert len(writer) == len(expected)
+    assert writer.getBytes() == toBytes(expected + '0' * (-len(expected) % 8))
+
+def test_align():
+    writer = BitWriter()
+    writer.write(1, 3)
+    writer.alignToByte()
+    writer.write(0, 2)
+    writer.alignToByte(fill=1)
+    writer.alignToByte()
+    assert writer.getBytes() == bytes([0b00100000, 0b00111111])
+    reader = BitReader(writer.getBytes(), pos=3)
+    reader.alignToByte()
+    assert reader.pos == 8 and reader.read(8) == 0b00111111
+    reader.alignToByte()
+    assert reader.pos == 16
+
+# packBits gera os mesmos bytes que escrever as palavras uma a uma e unpackBits le de volta os campos de tamanho fixo
+@pytest.mark.parametrize('seed', range(3))
+def test_pack_bits(seed):
+    fields = [(value, n) for value, n in randomFields(1000, seed) if n]
+    words = np.array([value for value, _ in fields], dtype=np.uint64)
+    lengths = np.array([n for _, n in fields], dtype=np.uint64)
+    data, nbits = packBits(words, lengths)
+    assert nbits == int(lengths.sum())
+    assert data == toBytes(bitString(fields))
+    assert packBits(np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.uint64)) == (b'', 0)
+    width = 11
+    positions = np.arange(0, nbits - width, 37)
+    expected = [int(bitString(fields)[p:p + width], 2) for p in positions]
+    assert list(unpackBits(BitReader(data).data, positions, width)) == expected
+
+# com um arquivo o buffer é descarregado nele ao passar de SPILL_SIZE e o arquivo termina com os mesmos bytes do BitWriter em memoria
+def test_spill(monkeypatch):
+    monkeypatch.setattr(bitstream, 'SPILL_SIZE', 64)
+    fields = randomFields(2000, 11)
+    chunk = bytes(range(1, 10))
+    file, memory = io.BytesIO(), BitWriter()
+    writer = BitWriter(file)
+    for index, (value, n) in enumerate(fields):
+        writer.write(value, n)
+        memory.write(value, n)
+        if index % 100 == 0:
+            writer.writeBytes(chunk, 69)
+            memory.writeBytes(chunk, 69)
+    assert writer.written > 0 and len(writer.buffer) < 64 + 8
+    assert len(writer) == len(memory)
+    assert writer.finish() == len(file.getvalue())
+    assert file.getvalue() == memory.getBytes()
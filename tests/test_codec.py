@@ -0,0 +1,201 @@
+import os
+import numpy as np
+import pytest
+from PIL import Image
+import codec
+import codec_mt
+from stats import Stats
+
+# testes de ida e volta do codec.py e do codec_mt.py: as imagens decodificadas tem o shape original e PSNR acima de um piso fixo, e os
+# dois codecs geram exatamente os mesmos bytes
+# uso: python -m pytest tests
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+# imagens do repositorio e o PSNR minimo (dB) de cada uma com a qualidade padrão
+IMAGES = {'imgs/lena.bmp': 30, 'imgs/bora-bill.bmp': 37, 'imgs/Arara-Azul-png.bmp': 28}
+# tamanhos (altura, largura) que não são multiplos dos blocos nem das celulas da subamostragem
+ODD_SIZES = [(1, 1), (37, 53), (9, 200)]
+# PSNR minimo (dB) dos tamanhos acima com factor = 8. Com a qualidade padrão um pixel isolado divide o bloco com o padding de zeros e
+# fica longe do original (cerca de 7 dB em 1x1), então esses tamanhos são medidos com mais qualidade
+ODD_FACTOR = 8
+ODD_PSNR = 30
+
+# imagem suave com canais diferentes entre si, HxWxC em uint8
+def gradientImage(height:int, width:int, channels:int = 3) -> np.ndarray:
+    yy, xx = np.mgrid[0:height, 0:width]
+    image = np.stack([128 + 60 * np.sin(xx / 7 + k) * np.cos(yy / 5) for k in range(channels)], axis=-1)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+def psnr(original:np.ndarray, decoded:np.ndarray) -> float:
+    mse = np.mean((original.astype(np.float64) - decoded.astype(np.float64)) ** 2)
+    return float('inf') if mse == 0 else float(10 * np.log10(255 ** 2 / mse))
+
+# codifica com codec e codec_mt (threads) e decodifica com os dois, retornando os bytes e as duas imagens decodificadas
+def roundtrip(image:np.ndarray, directory, **options) -> tuple:
+    target = os.path.join(directory, 'codec')
+    encoded = codec.encode(image, outputname=target, **options)
+    threaded = codec_mt.encode(image, outputname=target + '_mt', backend='thread', **options)
+    return encoded, threaded, codec.decode(target + '.gpeg'), codec_mt.decode(target + '_mt.gpeg', backend='thread')
+
+@pytest.mark.parametrize('path', IMAGES)
+def test_images(path, tmp_path):
+    image = np.asarray(Image.open(os.path.join(ROOT, path)).convert('RGB'))
+    encoded, threaded, decoded, decodedMt = roundtrip(image, tmp_path)
+    assert encoded == threaded
+    assert decoded.shape == image.shape
+    assert np.array_equal(decoded, decodedMt)
+    assert psnr(image, decoded) > IMAGES[path]
+
+@pytest.mark.parametrize('shape', ODD_SIZES)
+@pytest.mark.parametrize('channels', [3, 4])
+@pytest.mark.parametrize('ssv, ssh', [(2, 2), (2, 1), (1, 1), (3, 2)])
+@pytest.mark.parametrize('transform', codec.TRANSFORMS)
+def test_odd_sizes(shape, channels, ssv, ssh, transform, tmp_path):
+    image = gradientImage(*shape, channels)
+    encoded, threaded, decoded, decodedMt = roundtrip(image, tmp_path, ssv=ssv, ssh=ssh, factor=ODD_FACTOR, transform=transform)
+    assert encoded == threaded
+    assert decoded.shape == image.shape
+    assert np.array_equal(decoded, decodedMt)
+    assert psnr(image, decoded) > ODD_PSNR
+
+@pytest.mark.parametrize('alphaMode', ['lossless', 'dct'])
+@pytest.mark.parametrize('restartInterval, regionIndex', [(0, 0), (2, 3)])
+@pytest.mark.parametrize('downsampling', ['decimate', 'box'])
+def test_options(alphaMode, restartInterval, regionIndex, downsampling, tmp_path):
+    image = gradientImage(45, 77, 4)
+    encoded, threaded, decoded, decodedMt = roundtrip(image, tmp_path, alphaMode=alphaMode, restartInterval=restartInterval,
+                                                      regionIndex=regionIndex, downsampling=downsampling)
+    assert encoded == threaded
+    assert np.array_equal(decoded, decodedMt)
+    assert psnr(image, decoded) > 28
+
+# o backend de processos (padrão do codec_mt) gera o mesmo arquivo e a mesma imagem que o codec
+def test_process_backend(tmp_path):
+    image = np.asarray(Image.open(os.path.join(ROOT, 'imgs/lena.bmp')).convert('RGB'))
+    target = os.path.join(tmp_path, 'codec')
+    encoded = codec.encode(image, outputname=target, restartInterval=4)
+    assert codec_mt.encode(image, outputname=target + '_mt', restartInterval=4) == encoded
+    assert np.array_equal(codec_mt.decode(target + '_mt.gpeg', workers=2), codec.decode(target + '.gpeg'))
+
+@pytest.mark.parametrize('scale', [0.5, 0.25, 0.125])
+def test_scaled_decode(scale, tmp_path):
+    image = np.asarray(Image.open(os.path.join(ROOT, 'imgs/lena.bmp')).convert('RGB'))
+    target = os.path.join(tmp_path, 'codec')
+    codec.encode(image, outputname=target)
+    decoded = codec.decode(target + '.gpeg', scale=scale)
+    assert decoded.shape == codec.imageShape(target + '.gpeg', scale)
+    assert np.array_equal(decoded, codec_mt.decode(target + '.gpeg', scale=scale, backend='thread'))
+
+def test_invalid_options(tmp_path):
+    image = gradientImage(8, 8)
+    with pytest.raises(ValueError):
+        codec.encode(image, outputname=os.path.join(tmp_path, 'codec'), alphaMode='png')
+    with pytest.raises(ValueError):
+        codec_mt.encode(image, outputname=os.path.join(tmp_path, 'codec'), transform='fixed')
+
+# encodeStream grava o mesmo arquivo que encode para qualquer quantidade de faixas por conjunto, com e sem alpha
+@pytest.mark.parametrize('stripsPerChunk', [1, 2, 3, 100])
+@pytest.mark.parametrize('channels, alphaMode', [(3, 'lossless'), (4, 'lossless'), (4, 'dct')])
+@pytest.mark.parametrize('options', [{}, {'restartInterval': 2, 'regionIndex': 3}, {'ssv': 3, 'ssh': 1, 'downsampling': 'box', 'transform': 'integer'}])
+def test_encode_stream(stripsPerChunk, channels, alphaMode, options, tmp_path):
+    image = gradientImage(77, 45, channels)
+    target = os.path.join(tmp_path, 'codec')
+    codec.encode(image, outputname=target, alphaMode=alphaMode, **options)
+    codec.encodeStream(image, outputname=target + '_stream', alphaMode=alphaMode, stripsPerChunk=stripsPerChunk, **options)
+    with open(target + '.gpeg', 'rb') as file, open(target + '_stream.gpeg', 'rb') as stream:
+        assert file.read() == stream.read()
+
+# as origens lidas sob demanda (.npy com mmap) e as imagens do PIL geram o mesmo arquivo que o array
+@pytest.mark.parametrize('channels', [3, 4])
+def test_encode_stream_sources(channels, tmp_path):
+    image = gradientImage(50, 61, channels)
+    target = os.path.join(tmp_path, 'codec')
+    np.save(target + '.npy', image)
+    codec.encode(image, outputname=target)
+    for source in (target + '.npy', Image.fromarray(image)):
+        codec.encodeStream(source, outputname=target + '_stream', stripsPerChunk=2)
+        with open(target + '.gpeg', 'rb') as file, open(target + '_stream.gpeg', 'rb') as stream:
+            assert file.read() == stream.read()
+
+# encodeStream le a origem apenas em conjuntos de stripsPerChunk faixas (duas vezes, uma para contar os simbolos e outra para codificar) e o
+# pico de memoria acompanha o tamanho dos conjuntos e não o da imagem: com 8 vezes mais linhas o pico fica bem abaixo do dobro e de 1/4 da imagem
+def test_encode_stream_memory(tmp_path, monkeypatch):
+    reads = []
+    openSource = codec.openSource
+    def recorded(source):
+        shape, readRows = openSource(source)
+        def read(start, end):
+            reads.append((start, end))
+            return readRows(start, end)
+        return shape, read
+    monkeypatch.setattr(codec, 'openSource', recorded)
+    peaks = {}
+    for height in (512, 4096):
+        yy, xx = np.mgrid[0:height, 0:512]
+        image = np.stack([(xx * 7 + yy) % 256, (yy * 3) % 256, (xx ^ yy) % 256], axis=-1).astype(np.uint8)
+        np.save(os.path.join(tmp_path, 'image.npy'), image)
+        reads.clear()
+        stats = Stats(memory=True)
+        codec.encodeStream(os.path.join(tmp_path, 'image.npy'), outputname=os.path.join(tmp_path, 'stream'), stripsPerChunk=2, stats=stats)
+        stats.stop()
+        peaks[height] = stats.peak
+        assert max(end - start for start, end in reads) <= 2 * 16
+        assert sum(end - start for start, end in reads) == 2 * height
+    assert peaks[4096] < image.nbytes / 4
+    assert peaks[4096] < 2 * peaks[512]
+
+# regiões (inclusive parciais, de um pixel e fora da imagem) decodificadas por decodeRegion são identicas ao recorte de decode, com e sem
+# o indice de regiões e nas duas ampliações das chrominancias
+@pytest.mark.parametrize('channels, alphaMode', [(3, 'lossless'), (4, 'lossless'), (4, 'dct')])
+@pytest.mark.parametrize('ssv, ssh', [(2, 2), (1, 1), (3, 2)])
+@pytest.mark.parametrize('downsampling', ['decimate', 'box'])
+@pytest.mark.parametrize('regionIndex', [0, 1, 3])
+@pytest.mark.parametrize('upsampling', ['replicate', 'bilinear'])
+def test_decode_region(channels, alphaMode, ssv, ssh, downsampling, regionIndex, upsampling, tmp_path):
+    image = gradientImage(61, 83, channels)
+    target = os.path.join(tmp_path, 'codec') + '.gpeg'
+    codec.encode(image, ssv=ssv, ssh=ssh, alphaMode=alphaMode, downsampling=downsampling, regionIndex=regionIndex, outputname=target[:-5])
+    full = codec.decode(target, upsampling=upsampling)
+    for x, y, w, h in [(0, 0, 83, 61), (5, 7, 20, 13), (17, 16, 1, 1), (40, 30, 50, 50), (79, 0, 4, 61), (-3, -3, 10, 10)]:
+        region = codec.decodeRegion(target, x, y, w, h, upsampling=upsampling)
+        assert np.array_equal(region, full[max(y, 0):y + h, max(x, 0):x + w])
+
+# com o indice apenas os blocos que cobrem a região são decodificados: em 4:2:0 a região de 16 x 16 pixels em (40, 40) ocupa as faixas
+# 2 e 3, cada uma com 2 linhas de 2 blocos de Y e 1 linha de 2 blocos de Cr e de Cb (inclusive as amostras vizinhas da interpolação),
+# alem das 2 tabelas de quantização. O custo depende apenas da região: na imagem 16 vezes maior são decodificados os mesmos blocos
+@pytest.mark.parametrize('upsampling', ['replicate', 'bilinear'])
+@pytest.mark.parametrize('shape', [(128, 256), (512, 1024)])
+def test_decode_region_blocks(upsampling, shape, tmp_path, monkeypatch):
+    target = os.path.join(tmp_path, 'codec')
+    codec.encode(gradientImage(*shape), regionIndex=1, downsampling='box', outputname=target)
+    decoded = []
+    def counted(reader, huffman_codes, count, *args, function=codec.huffmanDecodeArrays):
+        decoded.append(count)
+        return function(reader, huffman_codes, count, *args)
+    monkeypatch.setattr(codec, 'huffmanDecodeArrays', counted)
+    region = codec.decodeRegion(target + '.gpeg', 40, 40, 16, 16, upsampling=upsampling)
+    assert sum(decoded) == 2 + 2 * (2 * 2 + 2 * 2)
+    monkeypatch.undo()
+    assert np.array_equal(region, codec.decode(target + '.gpeg', upsampling=upsampling)[40:56, 40:56])
+
+# compress (a partir dos planos de toYCrCb e subSampling) usa planos em float32 como encode e gera o mesmo codigo nos dois codecs
+@pytest.mark.parametrize('channels, alphaMode', [(3, 'lossless'), (4, 'lossless'), (4, 'dct')])
+@pytest.mark.parametrize('transform', codec.TRANSFORMS)
+def test_compress(channels, alphaMode, transform, tmp_path):
+    image = gradientImage(37, 53, channels)
+    encoded = codec.encode(image, alphaMode=alphaMode, transform=transform, outputname=os.path.join(tmp_path, 'codec'))
+    y, cr, cb, alpha = codec.subSampling(2, 2, codec.toYCrCb(image))
+    for plane in codec.padChannels(y, cr, cb, alpha):
+        assert plane is None or plane.dtype == np.float32
+    assert codec.compress(y, cr, cb, alpha, codec.QTY, codec.QTC, 2, 2, alphaMode, transform=transform) == encoded
+    assert codec_mt.compress(y, cr, cb, alpha, codec.QTY, codec.QTC, 2, 2, alphaMode, backend='thread', transform=transform) == encoded
+
+# upSampling repete cada amostra das chrominancias, inclusive quando o tamanho não é multiplo dos fatores
+@pytest.mark.parametrize('shape', ODD_SIZES)
+@pytest.mark.parametrize('ssv, ssh', [(2, 2), (2, 1), (1, 1), (3, 2)])
+def test_upsampling(shape, ssv, ssh):
+    y, cr, cb, alpha = codec.subSampling(ssv, ssh, codec.toYCrCb(gradientImage(*shape, 4)))
+    result = codec.upSampling(y, cr, cb, alpha, ssv, ssh)
+    for channel, plane in ((1, cr), (2, cb)):
+        assert np.array_equal(result[:, :, channel], np.repeat(np.repeat(plane, ssv, axis=0), ssh, axis=1)[:shape[0], :shape[1]])
+    assert np.array_equal(result[:, :, 0], y) and np.array_equal(result[:, :, 3], alpha)
@@ -0,0 +1,82 @@
+import os
+import numpy as np
+import pytest
+import codec
+import codec_mt
+from codecpool import CodecThreads
+from transform import BLOCKSIZE, DCT_MATRIX, SAMPLE_BITS, QUANTIZE_BITS, DEQUANTIZE_BITS, aanForward, aanInverse, quantizeTable, dequantizeTable, \
+    forwardDCT, inverseDCT
+
+# transformada inteira (transform = 'integer'): os coeficientes em int16 ficam a no maximo um passo de quantização dos da transformada em
+# ponto flutuante, sem estouro do int32 das contas nem do int16 dos coeficientes nos planos extremos, e a decodificação é deterministica
+
+# tabelas de quantização testadas, qt = 1 gera os maiores coeficientes
+TABLES = {'um': np.ones((BLOCKSIZE, BLOCKSIZE)), 'luminancia': codec.QTY, 'chrominancia': codec.QTC}
+
+# planos de 64 x 64 amostras ja normalizadas (-128 a 127): constantes, xadrez, listras, ruido e, para cada coeficiente, o bloco de -128
+# e 127 com o sinal da sua função base, que maximiza o modulo dele
+def extremePlanes() -> dict:
+    yy, xx = np.mgrid[0:64, 0:64]
+    planes = {
+        'minimo': np.full((64, 64), -128),
+        'maximo': np.full((64, 64), 127),
+        'xadrez': np.where((yy + xx) % 2, 127, -128),
+        'listras': np.where(xx % 2, 127, -128),
+        'ruido': np.random.default_rng(5).choice([-128, 127], (64, 64)),
+    }
+    for u in range(BLOCKSIZE):
+        for v in range(BLOCKSIZE):
+            planes[f'base{u}{v}'] = np.tile(np.where(np.outer(DCT_MATRIX[u], DCT_MATRIX[v]) > 0, 127, -128), (8, 8))
+    return {name: plane.astype(np.float32) for name, plane in planes.items()}
+
+# forwardDCTInteger com as mesmas operações em int64 e sem a conversão para int16, shape (u, v, linha de blocos, coluna de blocos)
+def referenceForward(channel:np.ndarray, qt:np.ndarray) -> np.ndarray:
+    h, w = channel.shape
+    samples = np.rint(channel * (1 << SAMPLE_BITS)).astype(np.int64).reshape(h // 8, 8, w // 8, 8).transpose(3, 1, 0, 2)
+    coefs = np.stack(aanForward(np.stack(aanForward(samples)).transpose(1, 0, 2, 3)))
+    return (coefs * quantizeTable(qt).astype(np.int64)[:, :, None, None] + (1 << (QUANTIZE_BITS - 1))) >> QUANTIZE_BITS
+
+# inverseDCTInteger com as mesmas operações em int64, retorna as amostras com SAMPLE_BITS bits fracionarios
+def referenceInverse(blocks:np.ndarray, qt:np.ndarray, shape:tuple) -> np.ndarray:
+    h, w = shape
+    coefs = blocks.reshape(h // 8, w // 8, 8, 8).transpose(2, 3, 0, 1).astype(np.int64) * dequantizeTable(qt).astype(np.int64)[:, :, None, None]
+    pixels = np.stack(aanInverse(np.stack(aanInverse(coefs)).transpose(1, 0, 2, 3)))
+    shift = DEQUANTIZE_BITS + 3 - SAMPLE_BITS
+    return ((pixels + (1 << (shift - 1))) >> shift).transpose(2, 1, 3, 0).reshape(h, w)
+
+@pytest.mark.parametrize('table', TABLES)
+def test_forward_integer(table):
+    qt = TABLES[table]
+    for name, plane in extremePlanes().items():
+        coefs = forwardDCT(plane, qt, integer=True)
+        assert coefs.dtype == np.int16
+        # sem estouro: o resultado em int32/int16 é igual ao das mesmas contas em int64
+        reference = referenceForward(plane, qt)
+        assert np.array_equal(coefs, reference.transpose(2, 3, 0, 1).reshape(-1, 8, 8)), name
+        assert np.abs(coefs.astype(np.int64) - forwardDCT(plane, qt)).max() <= 1, name
+
+@pytest.mark.parametrize('table', TABLES)
+def test_inverse_integer(table):
+    qt = TABLES[table]
+    for name, plane in extremePlanes().items():
+        coefs = forwardDCT(plane, qt, integer=True)
+        samples = inverseDCT(coefs, qt, plane.shape, integer=True)
+        assert samples.dtype == np.float32
+        assert np.array_equal(samples * (1 << SAMPLE_BITS), referenceInverse(coefs, qt, plane.shape)), name
+        # com as tabelas do codec a inversa inteira fica a menos de meio nivel da inversa em ponto flutuante, com qt = 1 (coeficientes
+        # muito maiores) o erro da AAN rapida chega a alguns niveis, como o da inversa rapida da libjpeg
+        if table != 'um':
+            assert np.abs(samples - inverseDCT(coefs.astype(np.int32), qt, plane.shape)).max() < 0.5, name
+
+# a decodificação inteira da o mesmo resultado em execuções repetidas, com threads, com o codec_mt e nas escalas reduzidas
+@pytest.mark.parametrize('scale', [1, 0.5, 0.125])
+def test_integer_decode_deterministic(scale, tmp_path):
+    image = np.random.default_rng(7).integers(0, 256, (45, 77, 4)).astype(np.uint8)
+    target = os.path.join(tmp_path, 'integer')
+    codec.encode(image, alphaMode='dct', transform='integer', restartInterval=1, outputname=target)
+    first = codec.decode(target + '.gpeg', scale=scale)
+    for _ in range(3):
+        assert np.array_equal(codec.decode(target + '.gpeg', scale=scale), first)
+    with CodecThreads(2) as pool:
+        assert np.array_equal(codec.decode(target + '.gpeg', scale=scale, pool=pool), first)
+    assert np.array_equal(codec_mt.decode(target + '.gpeg', scale=scale, backend='thread'), first)
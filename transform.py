@@ -0,0 +1,210 @@
+import numpy as np
+
+# transformadas compartilhadas pelos codecs, aplicadas de uma só vez sobre todos os blocos de um canal
+
+# como os blocos de quantização tem tamanho fixo define-se uma constante com o tamanho do lado
+BLOCKSIZE = 8
+
+# matriz da DCT ortonormal de tamanho n, a DCT de um bloco X é C @ X @ C.T e a inversa C.T @ Y @ C
+def dctMatrix(n:int) -> np.ndarray:
+    k = np.arange(n)
+    matrix = np.sqrt(2 / n) * np.cos((2 * k[None, :] + 1) * k[:, None] * np.pi / (2 * n))
+    matrix[0, :] = np.sqrt(1 / n)
+    return matrix.astype(np.float32)
+
+# matriz da DCT ortonormal 8x8 (a mesma usada por cv2.dct)
+DCT_MATRIX = dctMatrix(BLOCKSIZE)
+
+# ordem de varredura zig-zag de um bloco 8x8 como indices do bloco achatado: os coeficientes são percorridos por diagonais (linha + coluna)
+# e o sentido alterna entre as diagonais, nas diagonais impares descendo pelas linhas e nas pares subindo
+_i, _j = np.divmod(np.arange(BLOCKSIZE * BLOCKSIZE), BLOCKSIZE)
+ZIGZAG = np.argsort((_i + _j) * BLOCKSIZE + np.where((_i + _j) % 2 == 1, _i, _j), kind='stable')
+# permutação inversa, leva o vetor zigzag de volta para o bloco achatado
+INVERSE_ZIGZAG = np.argsort(ZIGZAG)
+
+# aplica a DCT e a quantização em todos os blocos 8x8 de um canal ja com padding, retornando os coeficientes quantizados
+# no formato (quantidade de blocos, 8, 8) com os blocos em ordem de linhas, assim como o reshape usado antes da transformada
+# integer usa a transformada inteira (ver forwardDCTInteger), com os coeficientes em int16
+def forwardDCT(channel:np.ndarray, qt:np.ndarray, integer:bool = False) -> np.ndarray:
+    if integer:
+        return forwardDCTInteger(channel, qt)
+    h, w = channel.shape
+    # transformada das linhas: cada grupo de 8 pixels consecutivos de uma linha é uma linha de um bloco, basta uma multiplicação de matrizes
+    rows = channel.astype(np.float32, copy=False).reshape(-1, BLOCKSIZE) @ DCT_MATRIX.T
+    # transformada das colunas ao longo do eixo das linhas de cada bloco, resultado com shape (u, linha de blocos, coluna de blocos, v)
+    coefs = np.tensordot(DCT_MATRIX, rows.reshape(h // BLOCKSIZE, BLOCKSIZE, w // BLOCKSIZE, BLOCKSIZE), axes=(1, 1))
+    # reorganizando para (bloco, u, v) e quantizando no mesmo passo, multiplicando pelo inverso da tabela
+    blocks = coefs.transpose(1, 2, 0, 3).reshape(-1, BLOCKSIZE, BLOCKSIZE)
+    blocks *= (1 / np.asarray(qt, dtype=np.float32))
+    return np.rint(blocks).astype(np.int32)
+
+# desquantiza e aplica a transformada inversa em todos os blocos de um canal, reorganizando os blocos na matriz do canal com o shape informado
+# integer usa a inversa inteira (ver inverseDCTInteger)
+def inverseDCT(blocks:np.ndarray, qt:np.ndarray, shape:tuple, integer:bool = False) -> np.ndarray:
+    if integer:
+        return inverseDCTInteger(blocks, qt, shape)
+    h, w = shape
+    # desquantizando todos os blocos de uma vez
+    coefs = blocks.reshape(h // BLOCKSIZE, w // BLOCKSIZE, BLOCKSIZE, BLOCKSIZE).astype(np.float32)
+    coefs *= np.asarray(qt, dtype=np.float32)
+    # inversa ao longo de u, resultado com shape (x, linha de blocos, coluna de blocos, v)
+    cols = np.tensordot(DCT_MATRIX.T, coefs, axes=(1, 2))
+    # inversa ao longo de v com uma unica multiplicação de matrizes e reorganização para a matriz do canal
+    channel = (cols.reshape(-1, BLOCKSIZE) @ DCT_MATRIX).reshape(BLOCKSIZE, h // BLOCKSIZE, w // BLOCKSIZE, BLOCKSIZE)
+    return channel.transpose(1, 0, 2, 3).reshape(h, w)
+
+# transformada inteira (transform = 'integer'): DCT e inversa rapidas de Arai, Agui e Nakajima (AAN, como as da libjpeg) em ponto fixo, com
+# apenas somas, multiplicações por constantes inteiras e deslocamentos. A AAN gera os coeficientes multiplicados por 8 * AAN_SCALE[u] * AAN_SCALE[v],
+# escalas que são incorporadas nas tabelas de quantização (e de desquantização na inversa), então a quantização é uma unica multiplicação
+# inteira por coeficiente. Os coeficientes quantizados ficam em int16 e a inversa é exata, com o mesmo resultado em qualquer maquina
+# transformadas disponiveis no encode, gravadas no cabeçalho
+TRANSFORMS = ('float', 'integer')
+AAN_SCALE = np.array([1.0] + [np.cos(k * np.pi / 16) * np.sqrt(2) for k in range(1, BLOCKSIZE)])
+# bits fracionarios das amostras na entrada da DCT e na saida da inversa (as amostras do encode vem da conversão de cor em float32)
+SAMPLE_BITS = 2
+# bits fracionarios das constantes das multiplicações da DCT e da inversa
+FORWARD_BITS = 13
+INVERSE_BITS = 9
+# bits fracionarios do inverso da tabela de quantização e da tabela de desquantização
+QUANTIZE_BITS = 20
+DEQUANTIZE_BITS = 7
+
+# constante c em ponto fixo com bits fracionarios e a multiplicação arredondada de x por ela
+fixed = lambda c, bits: int(round(c * (1 << bits)))
+multiply = lambda x, c, bits: (x * fixed(c, bits) + (1 << (bits - 1))) >> bits
+
+# DCT AAN de 8 pontos ao longo do primeiro eixo de d, retorna a lista das 8 saidas multiplicadas por 8 * AAN_SCALE
+def aanForward(d:np.ndarray) -> list:
+    bits = FORWARD_BITS
+    tmp0, tmp7, tmp1, tmp6 = d[0] + d[7], d[0] - d[7], d[1] + d[6], d[1] - d[6]
+    tmp2, tmp5, tmp3, tmp4 = d[2] + d[5], d[2] - d[5], d[3] + d[4], d[3] - d[4]
+    # parte par
+    tmp10, tmp13, tmp11, tmp12 = tmp0 + tmp3, tmp0 - tmp3, tmp1 + tmp2, tmp1 - tmp2
+    z1 = multiply(tmp12 + tmp13, 0.707106781, bits)
+    out = [tmp10 + tmp11, None, tmp13 + z1, None, tmp10 - tmp11, None, tmp13 - z1, None]
+    # parte impar
+    tmp10, tmp11, tmp12 = tmp4 + tmp5, tmp5 + tmp6, tmp6 + tmp7
+    z5 = multiply(tmp10 - tmp12, 0.382683433, bits)
+    z2 = multiply(tmp10, 0.541196100, bits) + z5
+    z4 = multiply(tmp12, 1.306562965, bits) + z5
+    z3 = multiply(tmp11, 0.707106781, bits)
+    z11, z13 = tmp7 + z3, tmp7 - z3
+    out[1], out[3], out[5], out[7] = z11 + z4, z13 - z2, z13 + z2, z11 - z4
+    return out
+
+# inversa AAN de 8 pontos ao longo do primeiro eixo de d (coeficientes ja multiplicados por AAN_SCALE), retorna as 8 saidas multiplicadas por 8
+def aanInverse(d:np.ndarray) -> list:
+    bits = INVERSE_BITS
+    # parte par
+    tmp10, tmp11, tmp13 = d[0] + d[4], d[0] - d[4], d[2] + d[6]
+    tmp12 = multiply(d[2] - d[6], 1.414213562, bits) - tmp13
+    tmp0, tmp3, tmp1, tmp2 = tmp10 + tmp13, tmp10 - tmp13, tmp11 + tmp12, tmp11 - tmp12
+    # parte impar
+    z13, z10, z11, z12 = d[5] + d[3], d[5] - d[3], d[1] + d[7], d[1] - d[7]
+    tmp7 = z11 + z13
+    tmp11 = multiply(z11 - z13, 1.414213562, bits)
+    z5 = multiply(z10 + z12, 1.847759065, bits)
+    tmp10 = multiply(z12, 1.082392200, bits) - z5
+    tmp12 = multiply(z10, -2.613125930, bits) + z5
+    tmp6 = tmp12 - tmp7
+    tmp5 = tmp11 - tmp6
+    tmp4 = tmp10 + tmp5
+    return [tmp0 + tmp7, tmp1 + tmp6, tmp2 + tmp5, tmp3 - tmp4, tmp3 + tmp4, tmp2 - tmp5, tmp1 - tmp6, tmp0 - tmp7]
+
+# inverso da tabela de quantização com as escalas da AAN e das amostras incorporadas, com QUANTIZE_BITS bits fracionarios
+def quantizeTable(qt:np.ndarray) -> np.ndarray:
+    divisor = np.asarray(qt, dtype=np.float64) * np.outer(AAN_SCALE, AAN_SCALE) * (BLOCKSIZE << SAMPLE_BITS)
+    return np.round((1 << QUANTIZE_BITS) / divisor).astype(np.int32)
+
+# tabela de desquantização com as escalas da AAN incorporadas, com DEQUANTIZE_BITS bits fracionarios
+def dequantizeTable(qt:np.ndarray) -> np.ndarray:
+    return np.round(np.asarray(qt, dtype=np.float64) * np.outer(AAN_SCALE, AAN_SCALE) * (1 << DEQUANTIZE_BITS)).astype(np.int32)
+
+# versão inteira de forwardDCT: as amostras são arredondadas para SAMPLE_BITS bits fracionarios e a quantização é uma multiplicação
+# arredondada pelo inverso da tabela. Todas as operações são em int32: o modulo de cada coeficiente dividido pela tabela é no maximo
+# 2 ** 10, então o produto cabe em 2 ** 30
+def forwardDCTInteger(channel:np.ndarray, qt:np.ndarray) -> np.ndarray:
+    h, w = channel.shape
+    samples = np.rint(channel * np.float32(1 << SAMPLE_BITS)).astype(np.int32).reshape(h // BLOCKSIZE, BLOCKSIZE, w // BLOCKSIZE, BLOCKSIZE)
+    # linhas (eixo 3) e depois colunas (eixo 1) de cada bloco, com cada posição do bloco em um array continuo de todos os blocos
+    # resultado com shape (u, v, linha de blocos, coluna de blocos)
+    rows = np.stack(aanForward(np.ascontiguousarray(samples.transpose(3, 1, 0, 2))))
+    coefs = np.stack(aanForward(rows.transpose(1, 0, 2, 3)))
+    coefs *= quantizeTable(qt)[:, :, None, None]
+    coefs += 1 << (QUANTIZE_BITS - 1)
+    coefs >>= QUANTIZE_BITS
+    return coefs.astype(np.int16).transpose(2, 3, 0, 1).reshape(-1, BLOCKSIZE, BLOCKSIZE)
+
+# versão inteira de inverseDCT, as amostras reconstruidas tem SAMPLE_BITS bits fracionarios e são retornadas em float32 (valores exatos)
+def inverseDCTInteger(blocks:np.ndarray, qt:np.ndarray, shape:tuple) -> np.ndarray:
+    h, w = shape
+    # coeficientes com shape (u, v, linha de blocos, coluna de blocos), cada posição do bloco em um array continuo de todos os blocos
+    coefs = blocks.reshape(h // BLOCKSIZE, w // BLOCKSIZE, BLOCKSIZE, BLOCKSIZE).transpose(2, 3, 0, 1).astype(np.int32)
+    coefs *= dequantizeTable(qt)[:, :, None, None]
+    # ao longo de u e depois de v, resultado com shape (coluna, linha, linha de blocos, coluna de blocos)
+    cols = np.stack(aanInverse(coefs))
+    pixels = np.stack(aanInverse(cols.transpose(1, 0, 2, 3)))
+    shift = DEQUANTIZE_BITS + 3 - SAMPLE_BITS
+    pixels += 1 << (shift - 1)
+    pixels >>= shift
+    channel = pixels.transpose(2, 1, 3, 0).reshape(h, w).astype(np.float32)
+    channel *= np.float32(1 / (1 << SAMPLE_BITS))
+    return channel
+
+# gera os vetores zigzag de todos os blocos de uma vez, recebe um bloco (8, 8) ou um conjunto de blocos (N, 8, 8) e retorna (64,) ou (N, 64)
+def zigzagVector(blocks:np.ndarray) -> np.ndarray:
+    return blocks.reshape(blocks.shape[:-2] + (BLOCKSIZE * BLOCKSIZE,))[..., ZIGZAG]
+
+# operação inversa de zigzagVector, recebe um vetor (64,) ou um conjunto de vetores (N, 64) e retorna os blocos (8, 8) ou (N, 8, 8)
+def zigzagReconstruct(vectors:np.ndarray) -> np.ndarray:
+    return vectors[..., INVERSE_ZIGZAG].reshape(vectors.shape[:-1] + (BLOCKSIZE, BLOCKSIZE))
+
+# tamanhos de bloco da transformada inversa reduzida para as escalas de decodificação 1/8, 1/4, 1/2 e 1
+SCALED_SIZES = (1, 2, 4, 8)
+
+# converte a escala de decodificação no tamanho k dos blocos gerados pela transformada inversa reduzida
+def scaledBlockSize(scale:float) -> int:
+    size = scale * BLOCKSIZE
+    if size not in SCALED_SIZES:
+        raise ValueError(f'Escala de decodificação não suportada: {scale}')
+    return int(size)
+
+# quantidade de coeficientes do inicio do vetor zigzag que contem o canto k x k de baixa frequencia do bloco
+def zigzagPrefix(size:int) -> int:
+    return int(INVERSE_ZIGZAG.reshape(BLOCKSIZE, BLOCKSIZE)[:size, :size].max()) + 1
+
+# transformada inversa reduzida: usa apenas o canto size x size dos coeficientes de cada bloco (recebidos como vetores zigzag com pelo menos
+# zigzagPrefix(size) coeficientes) e gera blocos de size x size pixels, reorganizados na matriz do canal com o shape (ja reduzido) informado
+# com a DCT ortonormal a inversa de tamanho size dos coeficientes escalados por size / 8 preserva a media de cada bloco, com size = 1 o
+# resultado é apenas o DC de cada bloco e nenhum coeficiente AC é desquantizado
+# integer usa as inversas inteiras, nas escalas reduzidas com as matrizes da DCT em ponto fixo (FORWARD_BITS bits fracionarios)
+def inverseDCTScaled(vectors:np.ndarray, qt:np.ndarray, shape:tuple, size:int, integer:bool = False) -> np.ndarray:
+    if size == BLOCKSIZE:
+        return inverseDCT(zigzagReconstruct(vectors), qt, shape, integer)
+    h, w = shape
+    corner = INVERSE_ZIGZAG.reshape(BLOCKSIZE, BLOCKSIZE)[:size, :size]
+    if integer:
+        # o fator size / 8 é aplicado no deslocamento final junto com os bits fracionarios das duas matrizes
+        coefs = vectors[:, corner].reshape(h // size, w // size, size, size) * np.asarray(qt, dtype=np.int64)[:size, :size] * size
+        matrix = np.round(dctMatrix(size).astype(np.float64) * (1 << FORWARD_BITS)).astype(np.int64)
+        cols = np.tensordot(matrix.T, coefs, axes=(1, 2))
+        channel = (cols.reshape(-1, size) @ matrix).reshape(size, h // size, w // size, size)
+        shift = 2 * FORWARD_BITS + 3 - SAMPLE_BITS
+        channel = (channel + (1 << (shift - 1))) >> shift
+        return (channel.transpose(1, 0, 2, 3).reshape(h, w) * np.float32(1 / (1 << SAMPLE_BITS))).astype(np.float32)
+    coefs = vectors[:, corner].reshape(h // size, w // size, size, size).astype(np.float32)
+    coefs *= np.asarray(qt, dtype=np.float32)[:size, :size] * (size / BLOCKSIZE)
+    matrix = dctMatrix(size)
+    cols = np.tensordot(matrix.T, coefs, axes=(1, 2))
+    channel = (cols.reshape(-1, size) @ matrix).reshape(size, h // size, w // size, size)
+    return channel.transpose(1, 0, 2, 3).reshape(h, w)
+
+# reduz um plano (como o alpha sem perdas) para size / 8 da resolução com a media arredondada de cada celula de 8 / size pixels,
+# repetindo as ultimas linhas e colunas quando o plano não é multiplo da celula
+def downscalePlane(plane:np.ndarray, size:int) -> np.ndarray:
+    if size == BLOCKSIZE:
+        return plane
+    cell = BLOCKSIZE // size
+    h, w = -(-plane.shape[0] // cell), -(-plane.shape[1] // cell)
+    padded = np.pad(plane.astype(np.float32), ((0, h * cell - plane.shape[0]), (0, w * cell - plane.shape[1])), mode='edge')
+    return np.round(padded.reshape(h, cell, w, cell).mean(axis=(1, 3)))